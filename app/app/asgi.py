@@ -2,15 +2,19 @@
 ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
-
-For more information on this file, see
-https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+Serve it with an ASGI server, e.g. ``uvicorn app.asgi:application``.
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from core.asgi import ASGIHandler
+from core.db.pool import warm_pools
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+django.setup(set_prefix=False)
 
-application = get_asgi_application()
+application = ASGIHandler()
+# open the pooled database connections before serving the first request
+warm_pools()
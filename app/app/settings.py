@@ -37,15 +37,21 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'simple_history',
     'rest_framework',
     'rest_framework.authtoken',
-    'core',
-    'user'
+    'core.apps.CoreConfig',
+    'user.apps.UserConfig',
+    'recipe.apps.RecipeConfig',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.ShardRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,16 +84,88 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# DB_POOL shares a bounded pool of open connections between the threads
+# of a process (core.db.backends.postgresql): requests check one out and
+# hand it back when they finish, so CONN_MAX_AGE stays 0. Without the
+# pool each thread keeps its own connection for CONN_MAX_AGE seconds.
+DB_POOL = bool(int(os.environ.get('DB_POOL', 1)))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': ('core.db.backends.postgresql' if DB_POOL
+                   else 'django.db.backends.postgresql'),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE',
+                                           0 if DB_POOL else 60)),
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 4)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+            # seconds to wait for a free connection
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # seconds before a connection is replaced by a fresh one
+            'MAX_AGE': float(os.environ.get('DB_POOL_MAX_AGE', 1800)),
+            # idle seconds after which a connection is pinged on checkout
+            'CHECK_AFTER': float(os.environ.get('DB_POOL_CHECK_AFTER', 1)),
+        },
     }
 }
 
+# Read replicas of the default database, e.g. DB_REPLICA_HOSTS=db-r1,db-r2.
+# core.db.routers.ReplicaRouter sends the reads of safe requests to one of
+# them; a client that wrote is pinned to the primary for
+# REPLICA_PIN_SECONDS with a cookie or, with REPLICA_PIN_STORE = 'cache',
+# a cache entry keyed by its credentials (requires SHARED_CACHE).
+DATABASES.update({
+    f'replica{index}': dict(DATABASES['default'], HOST=host,
+                            TEST={'MIRROR': 'default'})
+    for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), 1
+    )
+})
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+
+# Shards holding the tags, ingredients and recipes of the users assigned
+# to them (User.shard), e.g. DB_SHARD_HOSTS=db-s1,db-s2 adds shard1 and
+# shard2. Only append: each shard allocates ids from the range
+# index * SHARD_ID_SPAN on so rows keep their ids when a user moves.
+# New users are spread over NEW_USER_SHARDS.
+DATABASES.update({
+    f'shard{index}': dict(DATABASES['default'], HOST=host)
+    for index, host in enumerate(
+        filter(None, os.environ.get('DB_SHARD_HOSTS', '').split(',')), 1
+    )
+})
+SHARD_DATABASES = ['default'] + [alias for alias in DATABASES
+                                 if alias.startswith('shard')]
+NEW_USER_SHARDS = list(filter(None, os.environ.get(
+    'NEW_USER_SHARDS', '').split(','))) or SHARD_DATABASES
+SHARD_ID_SPAN = int(os.environ.get('SHARD_ID_SPAN', 10 ** 8))
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_PIN_STORE = os.environ.get('REPLICA_PIN_STORE', 'cookie')
+REPLICA_PIN_COOKIE = 'primary_pin'
+DATABASE_ROUTERS = ['core.db.routers.ShardRouter',
+                    'core.db.routers.ReplicaRouter']
+
+# Memcached servers shared by every server process and management
+# command, e.g. CACHE_HOSTS=cache:11211. Without them each process keeps
+# its own in-memory cache and never sees the writes of the others.
+CACHE_HOSTS = list(filter(None, os.environ.get('CACHE_HOSTS', '').split(',')))
+if CACHE_HOSTS:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_HOSTS,
+        }
+    }
+# Whether the default cache is shared, required by the list cache,
+# conditional GETs, the token cache and REPLICA_PIN_STORE = 'cache'.
+# Only set it without CACHE_HOSTS when a single process serves the API.
+SHARED_CACHE = bool(int(os.environ.get('SHARED_CACHE',
+                                       int(bool(CACHE_HOSTS)))))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -127,3 +205,93 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('PAGE_SIZE', 100)),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'core.renderers.MessagePackRenderer',
+    ),
+}
+
+# Worker threads running views under ASGI (app.asgi); the event loop
+# handles the client connections
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16))
+
+# Per request query count, database, serializer and total time collected
+# by core.middleware.MetricsMiddleware and served at /metrics; scrapers
+# send METRICS_TOKEN as a bearer token, without one /metrics is closed.
+# SERVER_TIMING_HEADER sends the timings of each response to the client
+METRICS_ENABLED = bool(int(os.environ.get('METRICS_ENABLED', 1)))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+SERVER_TIMING_HEADER = bool(int(os.environ.get('SERVER_TIMING_HEADER', 0)))
+
+# Responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY',
+                                                5))
+
+# Upper bound for the `page_size` query parameter
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 1000))
+
+# Render list responses from values() rows (recipe.fast_serializers)
+FAST_LIST_SERIALIZATION = bool(int(os.environ.get('FAST_LIST_SERIALIZATION',
+                                                  1)))
+
+# Seconds a user's tag/ingredient list stays cached between writes
+LIST_CACHE_TIMEOUT = int(os.environ.get('LIST_CACHE_TIMEOUT', 300))
+
+# Text search configuration of the stored recipe search vectors
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'english')
+
+# Recipe image variants generated after each upload
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+THUMBNAIL_QUALITY = 80
+# Size of the background thread pool, 0 generates during the request
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Chunked recipe image uploads, kept on the MEDIA_ROOT filesystem so
+# finished files are moved into place instead of copied
+CHUNKED_UPLOAD_ROOT = os.path.join(MEDIA_ROOT, 'uploads/partial')
+MAX_IMAGE_UPLOAD_SIZE = int(os.environ.get('MAX_IMAGE_UPLOAD_SIZE',
+                                           20 * 1024 * 1024))
+ALLOWED_IMAGE_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+# Hours before an unfinished upload is deleted by `manage.py expire_uploads`
+UPLOAD_EXPIRY_HOURS = int(os.environ.get('UPLOAD_EXPIRY_HOURS', 24))
+
+# How /media/ is served: 'direct' streams from Python, 'x-accel-redirect'
+# (nginx) and 'x-sendfile' (Apache, lighttpd) hand the file to the proxy
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'direct')
+# Internal nginx location aliased to MEDIA_ROOT
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 86400))
+
+# simple_history retention enforced by `manage.py prune_history`: the
+# newest VERSIONS of each object and everything newer than DAYS are kept
+HISTORY_RETENTION = {
+    'VERSIONS': int(os.environ.get('HISTORY_KEEP_VERSIONS', 10)),
+    'DAYS': int(os.environ.get('HISTORY_KEEP_DAYS', 30)),
+}
+
+# Upper bounds of the price ranges of the recipe stats, changing them
+# needs `manage.py rebuild_recipe_stats`
+RECIPE_STATS_PRICE_BUCKETS = (5, 10, 20, 50)
+
+# Bulk endpoints: items accepted per request and rows per INSERT/UPDATE
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 500))
+
+# Token to user resolutions cached by CachedTokenAuthentication for TTL
+# seconds (0 disables), in process and optionally in the shared cache.
+# Revocation is only seen by every process through SHARED_CACHE, without
+# it nothing is cached
+TOKEN_AUTH_CACHE = {
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL',
+                              300 if SHARED_CACHE else 0)),
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    'SHARED': bool(int(os.environ.get('TOKEN_AUTH_CACHE_SHARED', 0))),
+}
@@ -0,0 +1,24 @@
+"""
+Settings running the test suite on local SQLite databases, without the
+Postgres service:
+
+    python manage.py test --settings=app.test_settings
+
+`replica` is a separate database instead of a test mirror of `default`,
+so tests can tell which one served a read. Routing to it is off unless a
+test enables it through REPLICA_DATABASES. `shard1` is a second shard
+new users are only placed on when a test asks for it.
+"""
+from app.settings import *  # noqa: F401,F403
+from app.settings import BASE_DIR
+
+DATABASES = {
+    alias: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(BASE_DIR / f'{alias}.sqlite3'),
+    }
+    for alias in ('default', 'replica', 'shard1')
+}
+REPLICA_DATABASES = []
+SHARD_DATABASES = ['default', 'shard1']
+NEW_USER_SHARDS = ['default']
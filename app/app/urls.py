@@ -14,12 +14,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, re_path, include
 from django.conf import settings
 
+from core.views import serve_media, metrics_view
+
 urlpatterns = [
                   path('admin/', admin.site.urls),
                   path('api/user/', include('user.urls')),
                   path('api/recipe/', include('recipe.urls')),
-              ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+                  path('metrics', metrics_view, name='metrics'),
+                  re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'),
+                          serve_media, name='media'),
+              ]
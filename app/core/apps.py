@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_migrate
+
+
+def reserve_shard_ids(sender, using, **kwargs):
+    """Give the tables of a migrated shard their own id range"""
+    if using in settings.SHARD_DATABASES:
+        from .db.shards import reserve_id_range
+        reserve_id_range(using)
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        post_migrate.connect(reserve_shard_ids, sender=self)
@@ -0,0 +1,171 @@
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+# Request bodies larger than this are spooled to disk while being read
+BODY_MEMORY_SIZE = 1024 * 1024
+STREAM_END = object()
+
+
+class ASGIHandler:
+    """
+    ASGI application serving the project from an event loop.
+
+    Django 2.1 handles requests synchronously only, so the event loop
+    owns the sockets and hands every request to a pool of ASGI_THREADS
+    worker threads. The request body is read and the response written
+    asynchronously: slow clients, keep-alive connections and large
+    downloads wait on the loop instead of holding a worker. A worker is
+    busy only while the view runs. For the read endpoints that is
+    almost all ORM time.
+
+    Each worker thread keeps its own database connection. The
+    request_started/request_finished signals of a request fire on the
+    worker that ran its view, so CONN_MAX_AGE is honoured as it is under
+    WSGI. Streamed responses are closed by the same worker call that
+    pulls their last chunk.
+    """
+
+    def __init__(self, executor=None):
+        self.handler = WSGIHandler()
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported ASGI scope type {scope["type"]}')
+
+        body = await self.read_body(receive)
+        if body is None:
+            # the client went away before sending the whole request
+            return
+        loop = asyncio.get_event_loop()
+        environ = self.get_environ(scope, body)
+        try:
+            status, headers, response = await loop.run_in_executor(
+                self.executor, self.run, environ
+            )
+            try:
+                await send({'type': 'http.response.start',
+                            'status': status, 'headers': headers})
+                await self.send_body(loop, response, send)
+            finally:
+                if response.streaming and not response.closed:
+                    # the client went away before the last chunk
+                    await loop.run_in_executor(self.executor, response.close)
+        finally:
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Return the request body in a file, None on disconnect"""
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_SIZE,
+                                             mode='w+b')
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    async def send_body(self, loop, response, send):
+        if not response.streaming:
+            await send({'type': 'http.response.body',
+                        'body': response.content})
+            return
+        # streamed content may read files or the database: pull chunks
+        # on the workers and only write them from the loop
+        chunks = iter(response)
+        while True:
+            chunk = await loop.run_in_executor(
+                self.executor, self.next_chunk, response, chunks
+            )
+            if chunk is STREAM_END:
+                break
+            await send({'type': 'http.response.body', 'body': chunk,
+                        'more_body': True})
+        await send({'type': 'http.response.body'})
+
+    def next_chunk(self, response, chunks):
+        """Pull the next chunk, closing the response after the last one"""
+        chunk = next(chunks, STREAM_END)
+        if chunk is STREAM_END:
+            # request_finished must fire on the thread that read the
+            # content, not on whichever worker a separate call lands on
+            response.close()
+        return chunk
+
+    def run(self, environ):
+        """Run the Django request cycle, called on a worker thread"""
+        started = []
+
+        def start_response(status, headers):
+            started.append((status, headers))
+
+        response = self.handler(environ, start_response)
+        if not response.streaming:
+            # sends request_finished while still on the view's thread
+            response.close()
+        status, headers = started[0]
+        return (
+            int(status.split(' ', 1)[0]),
+            [(name.lower().encode('latin1'), value.encode('latin1'))
+             for name, value in headers],
+            response,
+        )
+
+    def get_environ(self, scope, body):
+        """Translate an ASGI HTTP scope into a WSGI environ"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        # WSGI carries the raw path bytes decoded as latin-1
+        path = scope['path'].encode('utf-8').decode('latin1')
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': path,
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': str(server[0]),
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', ()):
+            name = name.decode('latin1').upper().replace('-', '_')
+            value = value.decode('latin1')
+            if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = name
+            else:
+                key = f'HTTP_{name}'
+            if key in environ:
+                value = f'{environ[key]},{value}'
+            environ[key] = value
+        return environ
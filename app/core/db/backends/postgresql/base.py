@@ -0,0 +1,103 @@
+"""
+PostgreSQL backend checking connections out of a process wide pool.
+
+Django opens a connection per thread and, with CONN_MAX_AGE = 0, closes
+it when the request finishes. Here "opening" takes a connection from a
+core.db.pool.ConnectionPool and "closing" rolls back whatever it left
+open and hands it back, so a request pays for a new connection only
+when the pool has none idle. Configure the pool with the POOL key of
+the database settings: MIN_SIZE, MAX_SIZE, TIMEOUT, MAX_AGE and
+CHECK_AFTER (seconds a connection may sit idle before it is pinged on
+checkout).
+"""
+import functools
+
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+from core.db.pool import ConnectionPool, close_pools, get_pool
+
+Database = base.Database
+
+
+def ping(connection):
+    """Return whether the connection answers a query"""
+    if connection.closed:
+        return False
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not connection.autocommit:
+            connection.rollback()
+    except Database.Error:
+        return False
+    return True
+
+
+def reset(connection):
+    """Roll back an open transaction, False if the connection is broken"""
+    if connection.closed:
+        return False
+    try:
+        if connection.get_transaction_status() != \
+                extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+    except Database.Error:
+        return False
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # idle pooled connections would block DROP DATABASE
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    pool = None
+
+    def get_pool(self, conn_params):
+        """Return the pool of connections opened with conn_params"""
+        options = {name.lower(): value
+                   for name, value in self.settings_dict.get('POOL',
+                                                             {}).items()}
+        # a test database or changed settings get their own pool
+        key = (self.alias, repr(sorted(conn_params.items())),
+               repr(sorted(options.items())))
+        return get_pool(key, lambda: ConnectionPool(
+            functools.partial(Database.connect, **conn_params),
+            check=ping, reset=reset, **options
+        ))
+
+    def warm_pool(self):
+        # the pool connects with psycopg2 directly, outside of the
+        # wrapping Django does for its own connects
+        with self.wrap_database_errors:
+            self.get_pool(self.get_connection_params()).warm()
+
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            # short lived connections creating and dropping test databases
+            return super().get_new_connection(conn_params)
+        self.pool = self.get_pool(conn_params)
+        connection = self.pool.acquire()
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get('isolation_level',
+                                           connection.isolation_level)
+        if connection.isolation_level != self.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.pool is None:
+            return super()._close()
+        if self.connection is not None:
+            # a connection closed inside atomic() stays referenced until
+            # the block exits, it must not be handed to another thread
+            reusable = not (self.errors_occurred or self.in_atomic_block)
+            with self.wrap_database_errors:
+                self.pool.release(self.connection, reusable)
@@ -0,0 +1,174 @@
+import collections
+import logging
+import os
+import threading
+import time
+
+from django.db import connections
+from django.db.utils import DatabaseError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """No pooled connection became free within the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of open DB-API connections shared by the threads of a
+    process.
+
+    At most max_size connections exist at once, idle or checked out, and
+    acquire() waits up to timeout seconds for one to be released before
+    raising PoolTimeout. The most recently released connection is
+    reused first so surplus ones stay idle and age out. A connection
+    idle for more than check_after seconds must pass `check` before it
+    is handed out, one opened more than max_age seconds ago is closed
+    instead of reused. `reset` rolls back what a released connection
+    left open and returns False when it is not fit for reuse.
+    """
+
+    def __init__(self, connect, check=None, reset=None, min_size=0,
+                 max_size=10, timeout=10, max_age=None, check_after=0):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check_after = check_after
+        self.available = threading.Condition()
+        # (connection, released at) of the idle connections
+        self.idle = collections.deque()
+        self.opened_at = {}
+        self.size = 0
+
+    def acquire(self):
+        """Return a healthy connection, opening one if none is idle"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = self.checkout(deadline)
+            if entry is None:
+                return self.open()
+            connection, released_at = entry
+            if self.usable(connection, released_at):
+                return connection
+            self.discard(connection)
+
+    def checkout(self, deadline):
+        """Pop an idle entry or reserve a slot to open one, None"""
+        with self.available:
+            while not self.idle:
+                if self.size < self.max_size:
+                    self.size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f'All {self.max_size} pooled connections stayed in '
+                        f'use for {self.timeout} seconds'
+                    )
+                self.available.wait(remaining)
+            return self.idle.pop()
+
+    def open(self):
+        """Open a connection in a slot reserved by checkout()"""
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self.available:
+                self.size -= 1
+                self.available.notify()
+            raise
+        self.opened_at[id(connection)] = time.monotonic()
+        return connection
+
+    def usable(self, connection, released_at):
+        now = time.monotonic()
+        if self.max_age is not None and \
+                now - self.opened_at[id(connection)] > self.max_age:
+            return False
+        if self.check is None or now - released_at < self.check_after:
+            return True
+        return self.check(connection)
+
+    def release(self, connection, reusable=True):
+        """Hand a checked out connection back to the pool"""
+        if reusable and self.reset is not None:
+            reusable = self.reset(connection)
+        if not reusable:
+            self.discard(connection)
+            return
+        with self.available:
+            self.idle.append((connection, time.monotonic()))
+            self.available.notify()
+
+    def discard(self, connection):
+        """Close a checked out connection and free its slot"""
+        self.opened_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.available:
+            self.size -= 1
+            self.available.notify()
+
+    def warm(self):
+        """Open connections until the pool holds min_size of them"""
+        while True:
+            with self.available:
+                if self.size >= min(self.min_size, self.max_size):
+                    return
+                self.size += 1
+            self.release(self.open())
+
+    def close(self):
+        """Close the idle connections, checked out ones stay open"""
+        with self.available:
+            idle, self.idle = self.idle, collections.deque()
+            self.size -= len(idle)
+            self.available.notify_all()
+        for connection, _ in idle:
+            self.opened_at.pop(id(connection), None)
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+def get_pool(key, create):
+    """Return the pool of this process registered under key"""
+    key = (os.getpid(), key)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = create()
+    return pool
+
+
+def close_pools():
+    """Close the idle connections of every pool of this process"""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for (owner, _), pool in _pools.items() if owner == pid]
+    for pool in pools:
+        pool.close()
+
+
+def warm_pools():
+    """Open MIN_SIZE connections of each pooled database ahead of traffic"""
+    for connection in connections.all():
+        warm_pool = getattr(connection, 'warm_pool', None)
+        if warm_pool is None:
+            continue
+        try:
+            warm_pool()
+        except DatabaseError as exc:
+            logger.warning('Could not pre-warm the %s connection pool: %s',
+                           connection.alias, exc)
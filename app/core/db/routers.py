@@ -0,0 +1,215 @@
+import time
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_replica = ContextVar('replica', default=None)
+# a shard alias, or a callable returning the user whose shard to use
+_shard = ContextVar('shard', default=None)
+
+# Models holding the rows of a single user, their M2M tables included
+SHARDED_MODELS = {
+    'core.tag', 'core.ingredient', 'core.recipe',
+    'core.recipeimagevariant', 'core.recipeimageupload', 'core.recipestat',
+    'core.historicalingredient', 'core.historicalrecipe',
+}
+
+
+class ShardMoving(APIException):
+    """The user's data is being moved to another shard"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Your data is being moved, try again in a moment.'
+    default_code = 'shard_moving'
+    # sent as Retry-After
+    wait = 1
+
+
+@contextmanager
+def reads_from(alias):
+    """Route the reads of the block to alias, None for the primary"""
+    token = _replica.set(alias)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+def replica_may_lag(changed_at):
+    """
+    Whether reads may come from a replica that misses a change made at
+    changed_at (in nanoseconds), REPLICA_PIN_SECONDS being the lag
+    allowed for.
+    """
+    return _replica.get() is not None and \
+        time.time_ns() - changed_at < settings.REPLICA_PIN_SECONDS * 10 ** 9
+
+
+def is_sharded(model):
+    opts = model._meta
+    if opts.auto_created:
+        return is_sharded(opts.auto_created)
+    return opts.label_lower in SHARDED_MODELS
+
+
+def pick_shard(email):
+    """Return the shard a new user with email is placed on"""
+    shards = settings.NEW_USER_SHARDS
+    return shards[zlib.crc32(email.lower().encode()) % len(shards)]
+
+
+def user_shard(user):
+    """Return the database alias holding the rows of user"""
+    if not user.shard:
+        # users from before sharding keep their rows on the default
+        return DEFAULT_DB_ALIAS
+    if user.shard not in settings.SHARD_DATABASES:
+        raise ImproperlyConfigured(
+            f'User {user.pk} is on shard {user.shard!r}, which is missing '
+            f'from SHARD_DATABASES'
+        )
+    return user.shard
+
+
+def refresh_shard(user):
+    """
+    Reload shard and shard_moving of user from the default database.
+
+    Users kept in the token cache can be minutes old, routing must
+    follow a move as soon as it starts.
+    """
+    shard = type(user)._default_manager.using(DEFAULT_DB_ALIAS) \
+        .filter(pk=user.pk).values_list('shard', 'shard_moving').first()
+    if shard is not None:
+        user.shard, user.shard_moving = shard
+
+
+@contextmanager
+def using_shard(shard):
+    """
+    Route the user owned models to shard during the block.
+
+    shard is an alias or a callable returning the user, resolved on the
+    first query.
+    """
+    token = _shard.set(shard)
+    try:
+        yield
+    finally:
+        _shard.reset(token)
+
+
+def current_user():
+    """Return the user the current shard context belongs to, if any"""
+    shard = _shard.get()
+    if callable(shard):
+        user = shard()
+        if user is not None and user.is_authenticated:
+            return user
+    return None
+
+
+def current_shard():
+    shard = _shard.get()
+    if not callable(shard):
+        return shard
+    user = current_user()
+    return None if user is None else user_shard(user)
+
+
+class ShardRouter:
+    """
+    Keep the rows of each user on the database named by User.shard.
+
+    Users, tokens, sessions and the other global tables stay on the
+    default database. The user owned models listed in SHARDED_MODELS go
+    to the shard of, in order: the instance they are loaded from or
+    related to, the current `using_shard` block (set per request by
+    core.middleware.ShardRoutingMiddleware), the user of the instance.
+    Without any of these they use the default database. Writes of a
+    user whose data is being moved raise ShardMoving.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not is_sharded(model):
+            return self.global_db(hints, _replica.get())
+        alias = self.shard_for(hints)
+        if alias == DEFAULT_DB_ALIAS and _replica.get():
+            return _replica.get()
+        return alias
+
+    def db_for_write(self, model, **hints):
+        if not is_sharded(model):
+            return self.global_db(hints, None)
+        user = current_user()
+        if user is not None and user.shard_moving:
+            raise ShardMoving()
+        alias = self.shard_for(hints)
+        if alias in settings.REPLICA_DATABASES:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        sharded = is_sharded(type(obj1)), is_sharded(type(obj2))
+        if all(sharded):
+            return obj1._state.db == obj2._state.db
+        if any(sharded):
+            # any shard may reference the users on the default database
+            return True
+        return None
+
+    def global_db(self, hints, replica):
+        """Alias of a global model related to an instance on a shard"""
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(type(instance)) and \
+                instance._state.db in settings.SHARD_DATABASES:
+            return replica or DEFAULT_DB_ALIAS
+        return None
+
+    def shard_for(self, hints):
+        instance = hints.get('instance')
+        if instance is not None:
+            if is_sharded(type(instance)) and instance._state.db:
+                return instance._state.db
+            if instance._meta.label == settings.AUTH_USER_MODEL:
+                return user_shard(instance)
+        shard = current_shard()
+        if shard is not None:
+            return shard
+        if instance is not None and getattr(instance, 'user_id', None):
+            return user_shard(instance.user)
+        return DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica picked for the current request.
+
+    core.middleware.ReplicaRoutingMiddleware picks one of
+    REPLICA_DATABASES for safe requests of clients that have not written
+    recently. Writes, unsafe requests and code running outside a request
+    such as management commands use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and \
+                instance._state.db in settings.REPLICA_DATABASES:
+            # objects read from a replica are saved to the primary
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,122 @@
+"""
+Maintenance of the shards holding the rows of each user.
+
+Shard number i (its position in SHARD_DATABASES) allocates ids from
+i * SHARD_ID_SPAN on, so the rows of a user keep their ids when they are
+copied to another shard.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, models, transaction
+
+from core.utils import bulk_update
+
+from .routers import is_sharded
+
+
+def sharded_models():
+    """Return the sharded models, referenced models first"""
+    found = [model for model in apps.get_models(include_auto_created=True)
+             if is_sharded(model)]
+    return sorted(found, key=lambda model: any(
+        field.is_relation and is_sharded(field.related_model)
+        for field in model._meta.concrete_fields
+    ))
+
+
+def owner_lookup(model):
+    """Return the lookup filtering the rows of model by their user's id"""
+    if any(field.name == 'user' for field in model._meta.concrete_fields):
+        return 'user_id'
+    for field in model._meta.concrete_fields:
+        if field.is_relation and is_sharded(field.related_model):
+            return f'{field.name}__{owner_lookup(field.related_model)}'
+    raise LookupError(f'{model._meta.label} has no owner')
+
+
+def user_rows(model, alias, user_id):
+    """Return the rows of user on alias as {pk: {attname: value}}"""
+    fields = [field.attname for field in model._meta.concrete_fields]
+    queryset = model._base_manager.using(alias) \
+        .filter(**{owner_lookup(model): user_id})
+    return {row[model._meta.pk.attname]: row
+            for row in queryset.values(*fields).iterator()}
+
+
+def sync_user_rows(user_id, source, target):
+    """
+    Make the rows of a user on target equal to those on source.
+
+    Rows are compared as a whole, so a second run only writes what
+    changed since the first. Returns the number of rows written.
+    """
+    written = 0
+    with transaction.atomic(using=target):
+        diffs = []
+        for model in sharded_models():
+            rows = user_rows(model, source, user_id)
+            existing = user_rows(model, target, user_id)
+            diffs.append((model, rows, existing))
+        # rows gone from source may be referenced by other gone rows
+        for model, rows, existing in reversed(diffs):
+            extra = [pk for pk in existing if pk not in rows]
+            if extra:
+                model._base_manager.using(target).filter(pk__in=extra) \
+                    ._raw_delete(target)
+                written += len(extra)
+        for model, rows, existing in diffs:
+            missing = [model(**row) for pk, row in rows.items()
+                       if pk not in existing]
+            changed = [model(**row) for pk, row in rows.items()
+                       if pk in existing and existing[pk] != row]
+            model._base_manager.using(target).bulk_create(
+                missing, batch_size=settings.BULK_BATCH_SIZE
+            )
+            bulk_update(model._base_manager.using(target), changed,
+                        [field.name for field in model._meta.concrete_fields
+                         if not field.primary_key],
+                        batch_size=settings.BULK_BATCH_SIZE)
+            written += len(missing) + len(changed)
+    return written
+
+
+def delete_user_rows(user_id, alias):
+    """Delete the rows of a user from alias without signals"""
+    with transaction.atomic(using=alias):
+        for model in reversed(sharded_models()):
+            model._base_manager.using(alias) \
+                .filter(**{owner_lookup(model): user_id})._raw_delete(alias)
+
+
+def reserve_id_range(alias):
+    """Move the id sequences of the sharded tables of alias to its range"""
+    index = settings.SHARD_DATABASES.index(alias)
+    if not index:
+        return
+    start = index * settings.SHARD_ID_SPAN
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            pk = model._meta.pk
+            if not isinstance(pk, models.AutoField):
+                continue
+            table = model._meta.db_table
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_get_serial_sequence(%s, %s)',
+                               [table, pk.column])
+                sequence, = cursor.fetchone()
+                cursor.execute('SELECT nextval(%s)', [sequence])
+                if cursor.fetchone()[0] < start:
+                    cursor.execute('SELECT setval(%s, %s, false)',
+                                   [sequence, start])
+            elif connection.vendor == 'sqlite':
+                # AUTOINCREMENT tables continue after sqlite_sequence.seq
+                cursor.execute('SELECT seq FROM sqlite_sequence '
+                               'WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) '
+                                   'VALUES (%s, %s)', [table, start - 1])
+                elif row[0] < start - 1:
+                    cursor.execute('UPDATE sqlite_sequence SET seq = %s '
+                                   'WHERE name = %s', [start - 1, table])
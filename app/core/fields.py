@@ -0,0 +1,36 @@
+import json
+
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+
+
+class IntegerArrayField(ArrayField):
+    """
+    Integer array column that degrades to JSON text outside Postgres
+
+    Array lookups (`contains`, `overlap`) only work on Postgres; other
+    backends can store and load the values but must filter differently.
+    """
+
+    def __init__(self, base_field=None, **kwargs):
+        super().__init__(models.IntegerField(), **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        del kwargs['base_field']
+        return name, path, args, kwargs
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return super().db_type(connection)
+        return 'text'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if connection.vendor == 'postgresql' or value is None:
+            return super().get_db_prep_value(value, connection, prepared)
+        return json.dumps(list(value))
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.utils import load_backend
+
+MODES = (
+    # a new connection per request, CONN_MAX_AGE = 0 without the pool
+    ('connect', 'django.db.backends.postgresql', 0),
+    # one connection kept open by the thread
+    ('persistent', 'django.db.backends.postgresql', 600),
+    # checked out of and released to the pool around each request
+    ('pooled', 'core.db.backends.postgresql', 0),
+)
+
+
+class Command(BaseCommand):
+    """Measure what getting a database connection costs a request."""
+    help = 'Benchmark connection setup with and without the pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Run `SELECT 1` as a request would in each connection mode"""
+        alias = options['database']
+        if connections[alias].vendor != 'postgresql':
+            raise CommandError('Connection pooling requires PostgreSQL')
+        settings_dict = connections[alias].settings_dict
+        self.stdout.write(f'{"mode":<12}{"setup ms":>10}{"p99 ms":>9}'
+                          f'{"request ms":>12}')
+        for mode, engine, max_age in MODES:
+            connection = load_backend(engine).DatabaseWrapper(
+                dict(settings_dict, ENGINE=engine, CONN_MAX_AGE=max_age),
+                alias
+            )
+            try:
+                setup, total = self.measure(connection, mode,
+                                            options['requests'])
+            finally:
+                connection.close()
+                if getattr(connection, 'pool', None) is not None:
+                    connection.pool.close()
+            setup.sort()
+            self.stdout.write(
+                f'{mode:<12}{sum(setup) / len(setup) * 1e3:>10.3f}'
+                f'{setup[int(len(setup) * 0.99)] * 1e3:>9.3f}'
+                f'{sum(total) / len(total) * 1e3:>12.3f}'
+            )
+
+    def measure(self, connection, mode, requests):
+        """Return the setup and total seconds of every request"""
+        # the first connection of every mode is opened beforehand
+        connection.ensure_connection()
+        if mode != 'persistent':
+            connection.close()
+        setup, total = [], []
+        for _ in range(requests):
+            start = time.perf_counter()
+            if mode == 'persistent':
+                # what Django checks at the start of every request
+                connection.close_if_unusable_or_obsolete()
+            connection.ensure_connection()
+            ready = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            if mode != 'persistent':
+                connection.close()
+            end = time.perf_counter()
+            setup.append(ready - start)
+            total.append(end - start)
+        return setup, total
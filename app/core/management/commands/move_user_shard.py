@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+
+from core.db.routers import user_shard
+from core.db.shards import delete_user_rows, sync_user_rows
+
+
+class Command(BaseCommand):
+    """Django command to move the rows of a user to another shard."""
+    help = ('Copy the tags, ingredients and recipes of a user to another '
+            'shard, switch the user over and delete the old rows')
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('shard', choices=settings.SHARD_DATABASES)
+        parser.add_argument('--drain', type=float, default=2,
+                            help='seconds writes are blocked before the '
+                                 'final copy, longer than any request')
+
+    def handle(self, *args, **options):
+        """
+        handles the move: a bulk copy while the user keeps writing, then
+        a short write freeze copying only what changed meanwhile
+        """
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f'No user {options["email"]}')
+        source, target = user_shard(user), options['shard']
+        if source == target:
+            raise CommandError(f'{user.email} is on {target} already')
+
+        copied = sync_user_rows(user.pk, source, target)
+        self.stdout.write(f'Copied {copied} rows to {target}')
+
+        # writes now fail with 503 and Retry-After, cached token
+        # resolutions read the flag from the database on every hit
+        user.shard_moving = True
+        user.save(update_fields=['shard_moving'])
+        try:
+            time.sleep(options['drain'])
+            copied = sync_user_rows(user.pk, source, target)
+            self.stdout.write(f'Copied {copied} changed rows to {target}')
+            user.shard = target
+        finally:
+            user.shard_moving = False
+            user.save(update_fields=['shard', 'shard_moving'])
+
+        delete_user_rows(user.pk, source)
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {user.email} from {source} to {target}'
+        ))
@@ -0,0 +1,208 @@
+import re
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.models import Recipe, Ingredient
+
+BOUND_END_RE = re.compile(r"TO \('(\d{4})-(\d{2})-(\d{2})")
+
+HISTORY_TABLES = (
+    Recipe.history.model._meta.db_table,
+    Ingredient.history.model._meta.db_table,
+)
+
+
+def month_start(day, months=0):
+    """Return the first day of the month `months` after day"""
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    """
+    Django command to maintain monthly history table partitions.
+
+    Must run on a schedule (e.g. daily) once the tables are converted:
+    rows past the last monthly partition go to the DEFAULT partition,
+    and moving them out again rewrites them.
+    """
+    help = ('Range partition history tables by history_date, create '
+            'upcoming monthly partitions and drop expired ones; run it '
+            'daily once converted')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='turn unpartitioned tables into '
+                                 'partitioned ones (one-off)')
+        parser.add_argument('--months-ahead', type=int, default=3)
+        parser.add_argument('--drop-older-than', type=int, default=None,
+                            help='drop monthly partitions ending more than '
+                                 'this many days ago')
+        parser.add_argument('--database', action='append',
+                            help='shard to maintain, default all')
+
+    def handle(self, *args, **options):
+        """handles converting, extending and dropping partitions"""
+        for alias in options['database'] or settings.SHARD_DATABASES:
+            self.connection = connections[alias]
+            if self.connection.vendor != 'postgresql':
+                raise CommandError('Partitioning requires PostgreSQL')
+            # without a DEFAULT partition every history insert, and with
+            # it every Recipe/Ingredient save, fails once the partitions
+            # run out
+            if self.connection.pg_version < 110000:
+                raise CommandError('Partitioning requires PostgreSQL 11 '
+                                   'or later for the DEFAULT partition')
+            self.partition(alias, options)
+
+    def partition(self, alias, options):
+        today = timezone.now().date()
+        for table in HISTORY_TABLES:
+            with transaction.atomic(using=alias):
+                if not self.is_partitioned(table):
+                    if not options['convert']:
+                        raise CommandError(
+                            f'{table} is not partitioned, run with --convert'
+                        )
+                    self.convert(table)
+                self.create_default_partition(table)
+
+                legacy_end = self.legacy_end(table)
+                for months in range(options['months_ahead'] + 1):
+                    start = month_start(today, months)
+                    if legacy_end is None or start >= legacy_end:
+                        self.create_partition(table, start)
+                if options['drop_older_than'] is not None:
+                    cutoff = today - timedelta(
+                        days=options['drop_older_than']
+                    )
+                    self.drop_partitions(table, cutoff)
+
+    def is_partitioned(self, table):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM pg_partitioned_table p '
+                'JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s',
+                [table]
+            )
+            return cursor.fetchone() is not None
+
+    def convert(self, table):
+        """
+        Swap table for a partitioned one. The old table becomes the
+        partition holding every row up to the end of its newest month.
+
+        LIKE does not copy the primary key, it is recreated including
+        the partition key as partitioned tables require.
+        """
+        legacy = f'{table}_legacy'
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+            cursor.execute(f'SELECT max(history_date) FROM {table}')
+            newest = cursor.fetchone()[0] or timezone.now()
+            boundary = month_start(newest.date(), 1)
+
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+            cursor.execute(
+                f'CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS '
+                f'INCLUDING CONSTRAINTS) PARTITION BY RANGE (history_date)'
+            )
+            cursor.execute(f'ALTER TABLE {table} '
+                           f'ADD PRIMARY KEY (history_id, history_date)')
+            # the keys move to the parent, attaching clones them back
+            cursor.execute(
+                "SELECT conname, contype, pg_get_constraintdef(oid) "
+                "FROM pg_constraint WHERE conrelid = %s::regclass "
+                "AND contype IN ('p', 'f')", [legacy]
+            )
+            for name, kind, definition in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE {legacy} DROP CONSTRAINT {name}')
+                if kind == 'f':
+                    cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT '
+                                   f'{name} {definition}')
+            cursor.execute(
+                f'ALTER TABLE {table} ATTACH PARTITION {legacy} '
+                f'FOR VALUES FROM (MINVALUE) TO (%s)', [boundary]
+            )
+        self.stdout.write(f'Converted {table}, existing rows kept in {legacy}')
+
+    def legacy_end(self, table):
+        """Return the upper bound of the converted table's partition"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_class c '
+                'WHERE c.relname = %s', [f'{table}_legacy']
+            )
+            row = cursor.fetchone()
+        match = row and BOUND_END_RE.search(row[0] or '')
+        if not match:
+            return None
+        return date(*map(int, match.groups()))
+
+    def create_default_partition(self, table):
+        """Catch the rows no monthly partition covers"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE IF NOT EXISTS {table}_default '
+                           f'PARTITION OF {table} DEFAULT')
+
+    def create_partition(self, table, start):
+        """
+        Create the partition of the month from start, moving in the rows
+        the DEFAULT partition took while it was missing
+        """
+        name = f'{table}_p{start:%Y_%m}'
+        default = f'{table}_default'
+        bounds = [start, month_start(start, 1)]
+        in_month = 'history_date >= %s AND history_date < %s'
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [name])
+            exists = cursor.fetchone()[0] is not None
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {default} '
+                           f'WHERE {in_month})', bounds)
+            stray = not exists and cursor.fetchone()[0]
+            if stray:
+                cursor.execute(f'ALTER TABLE {table} '
+                               f'DETACH PARTITION {default}')
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} '
+                f'FOR VALUES FROM (%s) TO (%s)', bounds
+            )
+            if stray:
+                cursor.execute(f'INSERT INTO {name} SELECT * FROM {default} '
+                               f'WHERE {in_month}', bounds)
+                cursor.execute(f'DELETE FROM {default} WHERE {in_month}',
+                               bounds)
+                cursor.execute(f'ALTER TABLE {table} '
+                               f'ATTACH PARTITION {default} DEFAULT')
+                self.stdout.write(f'Moved rows from {default} to {name}')
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name}_id_date '
+                f'ON {name} (id, history_date DESC, history_id DESC)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name}_user_history '
+                f'ON {name} (user_id, history_id)'
+            )
+
+    def drop_partitions(self, table, cutoff):
+        """Drop monthly partitions whose whole range is before cutoff"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT c.relname FROM pg_inherits i '
+                'JOIN pg_class c ON c.oid = i.inhrelid '
+                'JOIN pg_class p ON p.oid = i.inhparent '
+                'WHERE p.relname = %s', [table]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+            for name in names:
+                suffix = name[len(table) + 2:]
+                if not name.startswith(f'{table}_p') or len(suffix) != 7:
+                    continue
+                year, month = map(int, suffix.split('_'))
+                if month_start(date(year, month, 1), 1) <= cutoff:
+                    cursor.execute(f'DROP TABLE {name}')
+                    self.stdout.write(f'Dropped {name}')
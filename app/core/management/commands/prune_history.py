@@ -0,0 +1,102 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from core.db.routers import using_shard
+from core.models import Recipe, Ingredient
+
+HISTORY_MODELS = {
+    'recipe': Recipe,
+    'ingredient': Ingredient,
+}
+
+
+class Command(BaseCommand):
+    """Django command to enforce the history retention policy."""
+    help = 'Delete historical versions outside HISTORY_RETENTION'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=sorted(HISTORY_MODELS),
+                            action='append',
+                            help='history to prune, default all')
+        parser.add_argument('--keep-versions', type=int,
+                            default=settings.HISTORY_RETENTION['VERSIONS'])
+        parser.add_argument('--keep-days', type=int,
+                            default=settings.HISTORY_RETENTION['DAYS'])
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='objects scanned and rows deleted per batch')
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='resume after this object id, shards '
+                                 'allocate ids from increasing ranges')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        """handles pruning each history table in object id order"""
+        cutoff = timezone.now() - timedelta(days=options['keep_days'])
+        for name in options['model'] or sorted(HISTORY_MODELS):
+            history = HISTORY_MODELS[name].history.model
+            deleted = 0
+            for alias in settings.SHARD_DATABASES:
+                with using_shard(alias):
+                    deleted += self.prune(history, cutoff, options)
+            verb = 'Would delete' if options['dry_run'] else 'Deleted'
+            self.stdout.write(self.style.SUCCESS(
+                f'{verb} {deleted} {name} history rows'
+            ))
+
+    def prune(self, history, cutoff, options):
+        """
+        Delete versions past keep_versions that are older than cutoff.
+
+        Objects are visited in id batches and every batch commits on its
+        own, so locks stay short and an interrupted run resumes with
+        --start-after at the last reported id.
+        """
+        keep = options['keep_versions']
+        batch_size = options['batch_size']
+        last_id = options['start_after']
+        deleted = 0
+
+        while True:
+            object_ids = list(
+                history.objects.filter(id__gt=last_id)
+                .order_by('id').values_list('id', flat=True)
+                .distinct()[:batch_size]
+            )
+            if not object_ids:
+                return deleted
+
+            expired = self.expired_versions(history, object_ids, keep,
+                                            cutoff)
+            for start in range(0, len(expired), batch_size):
+                batch = expired[start:start + batch_size]
+                if not options['dry_run']:
+                    history.objects.filter(history_id__in=batch).delete()
+                deleted += len(batch)
+
+            last_id = object_ids[-1]
+            self.stdout.write(f'{history._meta.model_name}: '
+                              f'processed up to id {last_id}')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+    def expired_versions(self, history, object_ids, keep, cutoff):
+        """Return history ids beyond the newest `keep` and before cutoff"""
+        rows = history.objects.filter(id__in=object_ids) \
+            .order_by('id', '-history_date', '-history_id') \
+            .values_list('id', 'history_id', 'history_date')
+
+        expired = []
+        current, position = None, 0
+        for object_id, history_id, history_date in rows.iterator():
+            if object_id != current:
+                current, position = object_id, 0
+            position += 1
+            if position > keep and history_date < cutoff:
+                expired.append(history_id)
+        return expired
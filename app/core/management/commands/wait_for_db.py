@@ -1 +1 @@
-import timefrom django.db import connectionsfrom django.db.utils import OperationalErrorfrom django.core.management import BaseCommandclass Command(BaseCommand):    """Django command to pause execution until database is available."""    def handle(self, *args, **options):        """handles database connection waiting"""        self.stdout.write('Waiting for database...')        db_conn = None        while not db_conn:            try:                db_conn = connections['default']            except OperationalError:                self.stdout.write('Database unavailable, waiting 1 sec...')                time.sleep(1)        self.stdout.write(self.style.SUCCESS('Database is available!'))
\ No newline at end of file
+import timefrom django.db import connections, DEFAULT_DB_ALIASfrom django.db.utils import OperationalErrorfrom django.core.management import BaseCommand, CommandErrorclass Command(BaseCommand):    """Django command to pause execution until database is available."""    def add_arguments(self, parser):        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)        parser.add_argument('--timeout', type=float, default=60,                            help='seconds to wait before giving up')        parser.add_argument('--delay', type=float, default=0.1,                            help='first retry delay, doubled after every '                                 'failed attempt')        parser.add_argument('--max-delay', type=float, default=5)    def handle(self, *args, **options):        """handles database connection waiting"""        self.stdout.write('Waiting for database...')        connection = connections[options['database']]        deadline = time.monotonic() + options['timeout']        delay = options['delay']        while True:            try:                self.probe(connection)                break            except OperationalError as exc:                if time.monotonic() + delay > deadline:                    raise CommandError(                        f'Database unavailable after '                        f'{options["timeout"]:g} sec: {exc}'                    )                self.stdout.write(                    f'Database unavailable, waiting {delay:g} sec...'                )                time.sleep(delay)                delay = min(delay * 2, options['max_delay'])        self.stdout.write(self.style.SUCCESS('Database is available!'))    def probe(self, connection):        """Run a query, the server may accept connections before that"""        try:            with connection.cursor() as cursor:                cursor.execute('SELECT 1')        except OperationalError:            # start the next attempt from a new connection            if connection.connection is not None and \                    not connection.is_usable():                connection.close()            raise
\ No newline at end of file
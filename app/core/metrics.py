@@ -0,0 +1,163 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework.serializers import ListSerializer, LIST_SERIALIZER_KWARGS
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Query count and time spent per phase of the current request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.durations = {'db': 0.0, 'serializer': 0.0}
+
+    def add(self, name, duration):
+        self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - start)
+
+
+def start_request():
+    """Start collecting timings for the current request"""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's `name`"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram keyed by label values"""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = \
+                    [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        """Yield the exposition lines of the histogram"""
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        with self.lock:
+            series = [(labels, list(counts), total)
+                      for labels, (counts, total) in self.series.items()]
+        for label_values, counts, total in sorted(series):
+            labels = format_labels(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                bucket_labels = format_labels(
+                    [*zip(self.labels, label_values), ('le', bound)]
+                )
+                yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+            yield f'{self.name}_sum{labels} {total}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+def format_labels(pairs):
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in pairs
+    ]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Total time of a request',
+    ('view', 'method', 'status'), DURATION_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries',
+    ('view',), DURATION_BUCKETS
+)
+REQUEST_SERIALIZER_DURATION = Histogram(
+    'http_request_serializer_duration_seconds',
+    'Time spent serializing response data', ('view',), DURATION_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_queries', 'Database queries per request', ('view',),
+    QUERY_BUCKETS
+)
+HISTOGRAMS = (REQUEST_DURATION, REQUEST_DB_DURATION,
+              REQUEST_SERIALIZER_DURATION, REQUEST_QUERIES)
+
+
+def observe_request(view, method, status, total, timings):
+    REQUEST_DURATION.observe(total, view, method, status)
+    REQUEST_DB_DURATION.observe(timings.durations['db'], view)
+    REQUEST_SERIALIZER_DURATION.observe(timings.durations['serializer'],
+                                        view)
+    REQUEST_QUERIES.observe(timings.queries, view)
+
+
+class TimedListSerializer(ListSerializer):
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Count the time spent rendering `data` as serializer time"""
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if hasattr(getattr(cls, 'Meta', None), 'list_serializer_class'):
+            return super().many_init(*args, **kwargs)
+        allow_empty = kwargs.pop('allow_empty', None)
+        list_kwargs = {'child': cls(*args, **kwargs)}
+        if allow_empty is not None:
+            list_kwargs['allow_empty'] = allow_empty
+        list_kwargs.update({key: value for key, value in kwargs.items()
+                            if key in LIST_SERIALIZER_KWARGS})
+        return TimedListSerializer(*args, **list_kwargs)
@@ -0,0 +1,234 @@
+import gzip
+import hashlib
+import random
+import time
+from contextlib import ExitStack
+
+import brotli
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from . import metrics
+from .db.routers import reads_from, using_shard
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/msgpack',
+                      'application/javascript', 'application/xml')
+
+# Preferred first when the client weighs encodings equally
+ENCODINGS = ('br', 'gzip')
+
+
+def accepted_encodings(header):
+    """Return the encodings of an Accept-Encoding header with their q"""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """Return the best supported encoding of header, None for identity"""
+    accepted = accepted_encodings(header)
+    best, best_quality = None, 0.0
+    for coding in ENCODINGS:
+        quality = accepted.get(coding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(content, coding):
+    if coding == 'br':
+        return brotli.compress(content, mode=brotli.MODE_TEXT,
+                               quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_LEVEL,
+                         mtime=0)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress text responses with brotli or gzip as the client prefers.
+
+    Responses below COMPRESSION_MIN_SIZE bytes are sent as they are:
+    for tiny payloads the encoding overhead outweighs the saved bytes.
+    Streaming and partial responses (media files) are never touched.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.status_code == 206:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        content = compress(response.content, coding)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        # The encoded body differs, so a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
+
+
+def view_name(view_func, request):
+    """Return a metrics label like `RecipeViewSet.list` for a view"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    # viewsets map methods to actions, plain API views handle methods
+    actions = getattr(view_func, 'actions', None) or {}
+    method = request.method.lower()
+    return f'{cls.__name__}.{actions.get(method, method)}'
+
+
+class MetricsMiddleware:
+    """
+    Measure the total, database and serializer time of every request.
+
+    Queries are counted and timed with a database execute wrapper and
+    serializer time is reported by `metrics.TimedSerializerMixin`. The
+    numbers are sent back in a Server-Timing header and aggregated per
+    view into the histograms served at /metrics.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = metrics.start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timings.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        total = time.perf_counter() - start
+
+        view = getattr(request, 'metrics_view', 'unmatched')
+        metrics.observe_request(view, request.method,
+                                str(response.status_code), total, timings)
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={timings.durations["db"] * 1e3:.2f};'
+                f'desc="{timings.queries} queries"',
+                f'serializer;dur={timings.durations["serializer"] * 1e3:.2f}',
+                f'total;dur={total * 1e3:.2f}',
+            ))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_name(view_func, request)
+
+
+def replica_pin_key(request):
+    """Cache key pinning the client of request, None when anonymous"""
+    credential = request.META.get('HTTP_AUTHORIZATION') or \
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return 'replica-pin:' + hashlib.sha256(credential.encode()).hexdigest()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Read from a random replica during safe requests.
+
+    A successful unsafe request pins its client to the primary for
+    REPLICA_PIN_SECONDS so that it reads its own writes while the
+    replicas catch up. With REPLICA_PIN_STORE = 'cookie' the pin is a
+    cookie, with 'cache' it is kept in the cache under a hash of the
+    client's credentials, for API clients that do not keep cookies. The
+    'cache' store needs SHARED_CACHE: a pin other processes cannot see
+    sends the client's next read to a lagging replica.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        if settings.REPLICA_PIN_STORE == 'cache' and \
+                not settings.SHARED_CACHE:
+            raise ImproperlyConfigured(
+                "REPLICA_PIN_STORE = 'cache' requires SHARED_CACHE"
+            )
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replica = None
+        if request.method in SAFE_METHODS and not self.pinned(request):
+            replica = random.choice(settings.REPLICA_DATABASES)
+        with reads_from(replica):
+            response = self.get_response(request)
+        if request.method not in SAFE_METHODS and \
+                response.status_code < 400:
+            self.pin(request, response)
+        return response
+
+    def pinned(self, request):
+        if settings.REPLICA_PIN_STORE == 'cache':
+            key = replica_pin_key(request)
+            return key is not None and cache.get(key) is not None
+        return settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+    def pin(self, request, response):
+        if settings.REPLICA_PIN_STORE == 'cache':
+            key = replica_pin_key(request)
+            if key is not None:
+                cache.set(key, 1, settings.REPLICA_PIN_SECONDS)
+            return
+        response.set_cookie(settings.REPLICA_PIN_COOKIE, '1',
+                            max_age=settings.REPLICA_PIN_SECONDS,
+                            httponly=True, samesite='Lax')
+
+
+class ShardRoutingMiddleware:
+    """
+    Route the user owned models of a request to the shard of its user.
+
+    The user is resolved on the first query of a sharded model, so token
+    authentication by the view has happened by then.
+    """
+
+    def __init__(self, get_response):
+        if len(settings.SHARD_DATABASES) <= 1:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with using_shard(lambda: getattr(request, 'user', None)):
+            return self.get_response(request)
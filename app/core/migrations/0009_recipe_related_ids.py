@@ -0,0 +1,66 @@
+# Generated by Django 2.1.15 on 2026-10-18 20:04
+
+import core.fields
+from django.db import migrations
+
+GIN_INDEXES = (
+    ('core_recipe_tag_ids_gin', 'tag_ids'),
+    ('core_recipe_ingredient_ids_gin', 'ingredient_ids'),
+)
+
+
+def populate_related_ids(apps, schema_editor):
+    Recipe = apps.get_model('core', 'Recipe')
+    related = {}
+    links = (
+        (Recipe.tags.through, 'tag_id', 0),
+        (Recipe.ingredients.through, 'ingredient_id', 1),
+    )
+    for through, column, index in links:
+        rows = through.objects.order_by(column) \
+            .values_list('recipe_id', column)
+        for recipe_id, related_id in rows.iterator():
+            related.setdefault(recipe_id, ([], []))[index].append(related_id)
+
+    for pk, (tag_ids, ingredient_ids) in related.items():
+        Recipe.objects.filter(pk=pk).update(tag_ids=tag_ids,
+                                            ingredient_ids=ingredient_ids)
+
+
+def create_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in GIN_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON core_recipe USING gin ({column})'
+        )
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in GIN_INDEXES:
+        schema_editor.execute(f'DROP INDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=core.fields.IntegerArrayField(blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_ids',
+            field=core.fields.IntegerArrayField(blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.RunPython(populate_related_ids,
+                             migrations.RunPython.noop),
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 2.1.15 on 2026-10-18 20:07
+
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+import django.contrib.postgres.search
+from django.db import migrations
+
+POPULATE_SQL = """
+UPDATE core_recipe r SET search_vector =
+    setweight(to_tsvector(%(config)s, r.title), 'A') ||
+    setweight(to_tsvector(%(config)s, coalesce((
+        SELECT string_agg(t.name, ' ') FROM core_tag t
+        JOIN core_recipe_tags rt ON rt.tag_id = t.id
+        WHERE rt.recipe_id = r.id), '')), 'B') ||
+    setweight(to_tsvector(%(config)s, coalesce((
+        SELECT string_agg(i.name, ' ') FROM core_ingredient i
+        JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id
+        WHERE ri.recipe_id = r.id), '')), 'C')
+"""
+
+INDEXES = (
+    ('core_recipe_search_vector_gin', 'search_vector'),
+    ('core_recipe_title_trgm_gin', 'title gin_trgm_ops'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(POPULATE_SQL,
+                          {'config': settings.SEARCH_CONFIG})
+    for name, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {name} ON core_recipe USING gin ({column})'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(f'DROP INDEX {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_related_ids'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
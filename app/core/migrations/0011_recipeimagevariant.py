@@ -0,0 +1,32 @@
+# Generated by Django 2.1.15 on 2026-10-18 20:08
+
+import core.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=10)),
+                ('image', models.ImageField(upload_to=core.models.recipe_image_variant_file_path)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_variants', to='core.Recipe')),
+            ],
+            options={
+                'ordering': ('format', 'width'),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipeimagevariant',
+            unique_together={('recipe', 'width', 'format')},
+        ),
+    ]
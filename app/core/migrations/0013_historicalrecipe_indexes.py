@@ -0,0 +1,24 @@
+# Generated by Django 2.1.15 on 2026-10-18 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipeimageupload'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            ['CREATE INDEX core_historicalrecipe_id_date_idx '
+             'ON core_historicalrecipe (id, history_date DESC, '
+             'history_id DESC)'],
+            ['DROP INDEX core_historicalrecipe_id_date_idx'],
+        ),
+        migrations.RunSQL(
+            ['CREATE INDEX core_historicalrecipe_user_history_idx '
+             'ON core_historicalrecipe (user_id, history_id)'],
+            ['DROP INDEX core_historicalrecipe_user_history_idx'],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.1.15 on 2026-10-18 21:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_user_shard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('total', 'All recipes'), ('tag', 'Recipes with a tag'), ('ingredient', 'Recipes with an ingredient'), ('price', 'Recipes in a price range')], max_length=10)),
+                ('key', models.IntegerField(default=0)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('time_minutes', models.BigIntegerField(default=0)),
+                ('price', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipestat',
+            unique_together={('user', 'kind', 'key')},
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.1.15 on 2026-10-18 21:24
+
+from django.db import migrations, models
+
+
+def count_and_index(model):
+    """
+    Count the existing assignments and index the assigned rows of each
+    user for ?assigned_only (Django 2.1 has no partial Index)
+    """
+    return [
+        migrations.RunSQL(
+            [f'UPDATE core_{model} SET recipe_count = ('
+             f'SELECT COUNT(*) FROM core_recipe_{model}s '
+             f'WHERE core_recipe_{model}s.{model}_id = core_{model}.id)'],
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            [f'CREATE INDEX core_{model}_user_assigned_idx '
+             f'ON core_{model} (user_id, name) WHERE recipe_count > 0'],
+            [f'DROP INDEX core_{model}_user_assigned_idx'],
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipestat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        *count_and_index('tag'),
+        *count_and_index('ingredient'),
+    ]
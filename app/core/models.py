@@ -1,11 +1,21 @@
-from django.db import models
+from django.db import models, connections, router, transaction, \
+    IntegrityError
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 import uuid
 import os
+from collections import defaultdict
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 
 from simple_history.models import HistoricalRecords
 
+from .db.routers import pick_shard
+from .fields import IntegerArrayField
+from .utils import bulk_update
+
 from django.conf import settings
 
 
@@ -19,6 +29,14 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads/recipe/', filename)
 
 
+def recipe_image_variant_file_path(instance, filename):
+    """Generate file path for a resized recipe image"""
+    ext = filename.split('.')[-1]
+    filename = f'{uuid.uuid4()}-{instance.width}.{ext}'
+
+    return os.path.join('uploads/recipe/variants/', filename)
+
+
 class UserManager(BaseUserManager):
 
     def create_user(self, email, password=None, **extra_fields):
@@ -50,46 +68,339 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # database alias holding the user's tags, ingredients and recipes
+    shard = models.CharField(max_length=100, blank=True)
+    # set while `move_user_shard` copies the user's rows, blocks writes
+    shard_moving = models.BooleanField(default=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    def save(self, *args, **kwargs):
+        if not self.shard:
+            self.shard = pick_shard(self.email)
+        super().save(*args, **kwargs)
+
+
+class SyncedFieldsMixin:
+    """Keep updates of a stale instance off the columns in synced_fields"""
+    # Columns only written by the manager sync methods
+    synced_fields = ()
 
-class Tag(models.Model):
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and \
+                not kwargs.get('force_insert') and \
+                kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and
+                field.attname not in deferred and
+                field.name not in self.synced_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class RecipeAttrManager(models.Manager):
+    """Manager of the models recipes are tagged with"""
+
+    def adjust_recipe_counts(self, deltas):
+        """Add deltas, {pk: change}, to recipe_count atomically"""
+        by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(pk)
+        # one UPDATE per distinct change, usually just +1 or -1
+        for delta, pks in by_delta.items():
+            self.filter(pk__in=pks) \
+                .update(recipe_count=F('recipe_count') + delta)
+
+    def sync_recipe_counts(self, pks=None):
+        """Recount recipe_count from the through table, of pks or all"""
+        relation = self.model.recipe_set
+        column = relation.field.m2m_reverse_field_name()
+        counts = relation.through.objects.filter(**{column: OuterRef('pk')}) \
+            .values(column).annotate(count=Count('*')).values('count')
+        rows = self.all() if pks is None else self.filter(pk__in=set(pks))
+        return rows.update(recipe_count=Coalesce(
+            Subquery(counts, output_field=models.IntegerField()), Value(0)
+        ))
+
+
+class Tag(SyncedFieldsMixin, models.Model):
     """User tag model"""
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_constraint=False
     )
     name = models.CharField(max_length=255)
+    # recipes the tag is assigned to, maintained by recipe.signals
+    recipe_count = models.IntegerField(default=0, editable=False)
+
+    objects = RecipeAttrManager()
+
+    synced_fields = ('recipe_count',)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name'],
+                         name='core_tag_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(SyncedFieldsMixin, models.Model):
     name = models.CharField(max_length=200)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE)
-    history = HistoricalRecords()
+        on_delete=models.CASCADE,
+        db_constraint=False)
+    # recipes using the ingredient, maintained by recipe.signals
+    recipe_count = models.IntegerField(default=0, editable=False)
+    history = HistoricalRecords(excluded_fields=['recipe_count'],
+                                user_db_constraint=False,
+                                use_base_model_db=True)
+
+    objects = RecipeAttrManager()
+
+    synced_fields = ('recipe_count',)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name'],
+                         name='core_ingredient_user_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeManager(models.Manager):
+
+    def sync_related_ids(self, recipe_ids):
+        """Rebuild the denormalized tag/ingredient id arrays of recipes"""
+        recipe_ids = set(recipe_ids)
+        related = {pk: ([], []) for pk in recipe_ids}
+        links = (
+            (self.model.tags.through, 'tag_id', 0),
+            (self.model.ingredients.through, 'ingredient_id', 1),
+        )
+        for through, column, index in links:
+            rows = through.objects.using(self.db) \
+                .filter(recipe_id__in=recipe_ids) \
+                .order_by(column).values_list('recipe_id', column)
+            for recipe_id, related_id in rows:
+                related[recipe_id][index].append(related_id)
+
+        bulk_update(self.all(), [
+            self.model(pk=pk, tag_ids=tag_ids, ingredient_ids=ingredient_ids)
+            for pk, (tag_ids, ingredient_ids) in related.items()
+        ], ['tag_ids', 'ingredient_ids'], batch_size=settings.BULK_BATCH_SIZE)
+
+    def sync_search_vectors(self, recipe_ids):
+        """Rebuild the stored full text search vectors of recipes"""
+        if connections[self.db].vendor != 'postgresql':
+            return
+
+        config = settings.SEARCH_CONFIG
+        self.filter(pk__in=set(recipe_ids)).update(search_vector=(
+            SearchVector('title', weight='A', config=config) +
+            SearchVector(self._joined_names(self.model.tags.through,
+                                            'tag__name'),
+                         weight='B', config=config) +
+            SearchVector(self._joined_names(self.model.ingredients.through,
+                                            'ingredient__name'),
+                         weight='C', config=config)
+        ))
+
+    def _joined_names(self, through, column):
+        """Return the related names of the outer recipe joined by spaces"""
+        names = through.objects.filter(recipe_id=OuterRef('pk')) \
+            .values('recipe_id').annotate(names=StringAgg(column, ' ')) \
+            .values('names')
+        return Coalesce(Subquery(names, output_field=models.TextField()),
+                        Value(''))
+
+
+class Recipe(SyncedFieldsMixin, models.Model):
     title = models.CharField(max_length=100)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
-                             on_delete=models.CASCADE)
+                             on_delete=models.CASCADE, db_constraint=False)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
-    history = HistoricalRecords()
+    tag_ids = IntegerArrayField(default=list, blank=True, editable=False)
+    ingredient_ids = IntegerArrayField(default=list, blank=True,
+                                       editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    history = HistoricalRecords(
+        excluded_fields=['tag_ids', 'ingredient_ids', 'search_vector'],
+        user_db_constraint=False, use_base_model_db=True
+    )
+
+    objects = RecipeManager()
+
+    synced_fields = ('tag_ids', 'ingredient_ids', 'search_vector')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'],
+                         name='core_recipe_user_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class RecipeImageVariant(models.Model):
+    """Resized and re-encoded copy of a recipe image"""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE,
+                               related_name='image_variants')
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    image = models.ImageField(upload_to=recipe_image_variant_file_path)
+
+    class Meta:
+        ordering = ('format', 'width')
+        unique_together = ('recipe', 'width', 'format')
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.format} {self.width}w'
+
+
+class RecipeImageUpload(models.Model):
+    """Resumable upload of a recipe image received in chunks"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE,
+                               related_name='image_uploads')
+    size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    format = models.CharField(max_length=10, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def path(self):
+        """Local file the received chunks are appended to"""
+        return os.path.join(settings.CHUNKED_UPLOAD_ROOT, f'{self.id}.part')
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.offset}/{self.size}'
+
+
+class RecipeStatManager(models.Manager):
+
+    def add(self, deltas):
+        """
+        Add deltas, {(user_id, kind, key): (recipes, minutes, price)}, to
+        the running totals with atomic increments.
+
+        Rows are only created for added recipes: a removal without a row
+        belongs to rows deleted along with their user. On PostgreSQL this
+        takes at most two queries however many rows change.
+        """
+        using = self._db or router.db_for_write(self.model)
+        if connections[using].vendor == 'postgresql':
+            return self._add_postgresql(deltas, using)
+        for (user_id, kind, key), (count, minutes, price) in deltas.items():
+            rows = self.using(using).filter(user_id=user_id, kind=kind,
+                                            key=key)
+            increments = {
+                'recipe_count': F('recipe_count') + count,
+                'time_minutes': F('time_minutes') + minutes,
+                'price': F('price') + price,
+            }
+            if rows.update(**increments) or count <= 0:
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    self.db_manager(using).create(
+                        user_id=user_id, kind=kind, key=key,
+                        recipe_count=count, time_minutes=minutes, price=price
+                    )
+            except IntegrityError:
+                # created by a concurrent request meanwhile
+                rows.update(**increments)
+
+    def _add_postgresql(self, deltas, using):
+        """Upsert the additions and update the removals, a query each"""
+        connection = connections[using]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        columns = ('user_id', 'kind', 'key', 'recipe_count', 'time_minutes',
+                   'price')
+        # sorted so concurrent writers lock rows in the same order
+        rows = sorted((*key, *delta) for key, delta in deltas.items())
+        added = [row for row in rows if row[3] > 0]
+        removed = [row for row in rows if row[3] <= 0]
+        names = ', '.join(map(qn, columns))
+        totals = [qn(column) for column in columns[3:]]
+        with connection.cursor() as cursor:
+            if added:
+                values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(added))
+                cursor.execute(
+                    f'INSERT INTO {table} ({names}) VALUES {values} '
+                    f'ON CONFLICT ({", ".join(map(qn, columns[:3]))}) '
+                    f'DO UPDATE SET ' + ', '.join(
+                        f'{total} = {table}.{total} + EXCLUDED.{total}'
+                        for total in totals
+                    ),
+                    [value for row in added for value in row]
+                )
+            if removed:
+                values = ', '.join(
+                    ['(%s, %s, %s, %s, %s, %s::numeric)'] * len(removed)
+                )
+                cursor.execute(
+                    f'UPDATE {table} SET ' + ', '.join(
+                        f'{total} = {table}.{total} + delta.{total}'
+                        for total in totals
+                    ) + f' FROM (VALUES {values}) AS delta ({names}) '
+                    f'WHERE ' + ' AND '.join(
+                        f'{table}.{qn(column)} = delta.{qn(column)}'
+                        for column in columns[:3]
+                    ),
+                    [value for row in removed for value in row]
+                )
+
+
+class RecipeStat(models.Model):
+    """
+    Running totals of the recipes of a user: overall, per tag, per
+    ingredient and per price range (see recipe.stats)
+    """
+    TOTAL = 'total'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    PRICE = 'price'
+    KINDS = (
+        (TOTAL, 'All recipes'),
+        (TAG, 'Recipes with a tag'),
+        (INGREDIENT, 'Recipes with an ingredient'),
+        (PRICE, 'Recipes in a price range'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE, db_constraint=False)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    # tag or ingredient id, price range index, 0 for the total
+    key = models.IntegerField(default=0)
+    recipe_count = models.IntegerField(default=0)
+    # sums over the recipes counted, for the averages
+    time_minutes = models.BigIntegerField(default=0)
+    price = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = RecipeStatManager()
+
+    class Meta:
+        unique_together = ('user', 'kind', 'key')
+
+    def __str__(self):
+        return f'{self.user_id} {self.kind} {self.key}: {self.recipe_count}'
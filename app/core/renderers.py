@@ -0,0 +1,56 @@
+import re
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# Floats orjson writes unlike json: exponents ('1e16' for '1e+16', '1e-7'
+# for '1e-07') and small values without one ('0.00001' for '1e-05'). Text
+# in strings may match too, which only costs the fallback.
+FLOAT_MISMATCH_RE = re.compile(rb'\de[-\d]|(?:^|[:,\[])-?0\.0000')
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson.
+
+    Output matches `JSONRenderer` with the default compact, unicode
+    settings: values orjson does not handle the same way (datetimes,
+    Decimals, lazy strings, querysets...) go through DRF's encoder,
+    U+2028/U+2029 are escaped like DRF does and output with floats
+    orjson formats differently is rendered by `JSONRenderer`, as is
+    indented output.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        content = orjson.dumps(data, default=self.encoder_class().default,
+                               option=self.options)
+        if FLOAT_MISMATCH_RE.search(content):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        # line terminators in JavaScript, escaped for JSONP and <script>
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028') \
+            .replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render data as MessagePack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default,
+                             use_bin_type=True)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import tempfile
+from concurrent.futures import Executor, Future
+
+from django.core.signals import request_started, request_finished
+from django.db import close_old_connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.asgi import ASGIHandler, STREAM_END
+from core.models import Tag
+from recipe.tests.test_utils import create_sample_user, create_sample_tag, \
+    sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+
+
+class InlineExecutor(Executor):
+    """Run work on the calling thread so it sees the test transaction"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+
+class RecordingExecutor(InlineExecutor):
+    """Run work inline and record the result of every call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.calls.append(None)
+        future = super().submit(fn, *args, **kwargs)
+        self.calls[-1] = future.result()
+        return future
+
+
+class ASGIHandlerTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.token = Token.objects.create(user=self.user)
+        self.application = ASGIHandler(InlineExecutor())
+
+    def request(self, method, path, query_string=b'', body=b'',
+                headers=(), messages=None):
+        """Call the application and return the sent response messages"""
+        scope = {
+            'type': 'http', 'method': method, 'path': path,
+            'query_string': query_string, 'http_version': '1.1',
+            'scheme': 'http', 'server': ('testserver', 80),
+            'client': ('127.0.0.1', 5000),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+                *headers,
+            ],
+        }
+        incoming = list(messages or [
+            {'type': 'http.request', 'body': body, 'more_body': False}
+        ])
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        # like django.test.Client, keep the test transaction's connection
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            asyncio.run(self.application(scope, receive, send))
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+        return sent
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_read_matches_wsgi(self):
+        """Test the recipe list renders as it does through WSGI"""
+        sample_recipe(self.user, title='Soup')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        expected = client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        start, body = self.request('GET', RECIPE_URL,
+                                   query_string=b'fields=id,title')
+
+        self.assertEqual(start['status'], 200)
+        headers = dict(start['headers'])
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        self.assertIn(b'server-timing', headers)
+        self.assertEqual(body['body'], expected.content)
+
+    def test_request_body_in_chunks(self):
+        """Test a body sent in several messages reaches the view"""
+        payload = json.dumps({'name': 'Vegan'}).encode()
+        start, body = self.request(
+            'POST', TAG_URL, headers=[(b'content-type', b'application/json'),
+                                      (b'content-length',
+                                       str(len(payload)).encode())],
+            messages=[
+                {'type': 'http.request', 'body': payload[:5],
+                 'more_body': True},
+                {'type': 'http.request', 'body': payload[5:]},
+            ]
+        )
+
+        self.assertEqual(start['status'], 201)
+        self.assertTrue(Tag.objects.filter(user=self.user,
+                                           name='Vegan').exists())
+
+    @override_settings(SHARED_CACHE=True)
+    def test_conditional_get(self):
+        create_sample_tag(self.user)
+        start, _ = self.request('GET', TAG_URL)
+        etag = dict(start['headers'])[b'etag']
+
+        start, body = self.request('GET', TAG_URL,
+                                   headers=[(b'if-none-match', etag)])
+
+        self.assertEqual(start['status'], 304)
+
+    def test_streamed_response_closed_with_last_chunk(self):
+        """Test request_finished fires in the call pulling the last chunk"""
+        executor = RecordingExecutor()
+        self.application = ASGIHandler(executor)
+        finished = []
+
+        def receiver(**kwargs):
+            finished.append(len(executor.calls))
+
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with open(os.path.join(media_root.name, 'image.jpg'), 'wb') as f:
+            f.write(b'0123456789')
+        request_finished.connect(receiver)
+        try:
+            with self.settings(MEDIA_ROOT=media_root.name,
+                               MEDIA_SERVE_MODE='direct'):
+                sent = self.request(
+                    'GET', reverse('media', args=['image.jpg']),
+                    headers=[(b'range', b'bytes=2-5')]
+                )
+        finally:
+            request_finished.disconnect(receiver)
+
+        self.assertEqual(sent[0]['status'], 206)
+        self.assertEqual(b''.join(m.get('body', b'') for m in sent[1:]),
+                         b'2345')
+        self.assertEqual(finished, [len(executor.calls)])
+        self.assertIs(executor.calls[-1], STREAM_END)
+
+    def test_client_disconnect(self):
+        """Test nothing is sent to a client that went away"""
+        sent = self.request('GET', RECIPE_URL,
+                            messages=[{'type': 'http.disconnect'}])
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        incoming = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+    def test_asgi_module(self):
+        from app.asgi import application
+        self.assertIsInstance(application, ASGIHandler)
@@ -1 +1 @@
-from unittest.mock import patchfrom django.db.utils import OperationalErrorfrom django.core.management import call_commandfrom django.test import TestCaseclass CallCommandsTestCase(TestCase):    """Testing Call Commands"""    def test_wait_for_db_ready(self):        """Test wait for database is available"""        with patch('django.db.utils.ConnectionHandler.__getitem__') as getitem:            getitem.return_value = True            call_command('wait_for_db')            self.assertEqual(getitem.call_count, 1)    @patch('time.sleep', return_value=None)    def test_wait_for_db(self, ts):        """Test waiting for database"""        with patch('django.db.utils.ConnectionHandler.__getitem__') as getitem:            getitem.side_effect = [OperationalError] * 5 + [True]            call_command('wait_for_db')            self.assertEqual(getitem.call_count, 6)
\ No newline at end of file
+import jsonimport osimport tempfilefrom datetime import timedeltafrom io import StringIOfrom unittest import skipIf, skipUnlessfrom unittest.mock import patchfrom django.contrib.auth import get_user_modelfrom django.db import connectionfrom django.db.utils import OperationalErrorfrom django.core.management import call_command, CommandErrorfrom django.test import TestCasefrom django.test.utils import CaptureQueriesContextfrom django.utils import timezonefrom core.models import Recipe, Tagclass CallCommandsTestCase(TestCase):    """Testing Call Commands"""    def test_wait_for_db_ready(self):        """Test wait for database runs a probe query"""        with CaptureQueriesContext(connection) as queries:            call_command('wait_for_db', stdout=StringIO())        self.assertEqual([query['sql'] for query in queries], ['SELECT 1'])    @patch('time.sleep', return_value=None)    def test_wait_for_db(self, ts):        """Test waiting for database with exponential backoff"""        with patch('django.db.backends.base.base.BaseDatabaseWrapper.'                   'ensure_connection') as ensure_connection:            ensure_connection.side_effect = [OperationalError] * 5 + [None]            call_command('wait_for_db', stdout=StringIO())            self.assertEqual(ensure_connection.call_count, 6)        self.assertEqual([call[0][0] for call in ts.call_args_list],                         [0.1, 0.2, 0.4, 0.8, 1.6])    @patch('time.sleep', return_value=None)    def test_wait_for_db_timeout(self, ts):        """Test waiting for database gives up after the timeout"""        with patch('django.db.backends.base.base.BaseDatabaseWrapper.'                   'ensure_connection', side_effect=OperationalError):            with self.assertRaises(CommandError):                call_command('wait_for_db', timeout=0, stdout=StringIO())    def test_explain_queries(self):        """Test query plans are printed for every endpoint"""        out = StringIO()        call_command('explain_queries', recipes=20, tags=5, ingredients=5,                     per_recipe=2, stdout=out)        output = out.getvalue()        self.assertEqual(Recipe.objects.count(), 20)        for name in ('recipe list', 'tag list', 'ingredient list',                     'recipe detail'):            self.assertIn(f'== {name}', output)class HistoryRetentionTestCase(TestCase):    """Testing history pruning and partitioning commands"""    def setUp(self):        self.user = get_user_model().objects.create_user(            email='test@example.com', password='password'        )        self.recipe = Recipe.objects.create(            title='v0', user=self.user, time_minutes=5, price=5.00        )        for version in range(1, 6):            self.recipe.title = f'v{version}'            self.recipe.save()        old = timezone.now() - timedelta(days=60)        history = self.recipe.history.order_by('history_id')        Recipe.history.filter(            history_id__in=list(history.values_list('history_id',                                                    flat=True)[:4])        ).update(history_date=old)    def test_prune_history_keeps_recent_and_latest(self):        """Test only old versions past the newest N are deleted"""        call_command('prune_history', keep_versions=3, keep_days=30,                     batch_size=1, stdout=StringIO())        titles = set(self.recipe.history.values_list('title', flat=True))        self.assertEqual(titles, {'v3', 'v4', 'v5'})    def test_prune_history_dry_run_and_resume(self):        """Test dry runs and already processed ids delete nothing"""        call_command('prune_history', keep_versions=1, keep_days=30,                     dry_run=True, stdout=StringIO())        call_command('prune_history', keep_versions=1, keep_days=30,                     start_after=self.recipe.id, stdout=StringIO())        self.assertEqual(self.recipe.history.count(), 6)    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')    def test_partition_history(self):        """Test converted history tables keep rows and take new ones"""        call_command('partition_history', convert=True, months_ahead=1,                     drop_older_than=0, stdout=StringIO())        self.recipe.title = 'partitioned'        self.recipe.save()        self.assertEqual(self.recipe.history.count(), 7)        table = Recipe.history.model._meta.db_table        with connection.cursor() as cursor:            cursor.execute(                'SELECT a.attname FROM pg_index i JOIN pg_attribute a '                'ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) '                'WHERE i.indrelid = %s::regclass AND i.indisprimary',                [table]            )            self.assertEqual({row[0] for row in cursor.fetchall()},                             {'history_id', 'history_date'})    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')    def test_partition_history_moves_default_rows(self):        """Test rows past the partitions are kept and moved in later"""        call_command('partition_history', convert=True, months_ahead=0,                     stdout=StringIO())        later = timezone.now() + timedelta(days=70)        Recipe.history.filter(title='v5').update(history_date=later)        table = Recipe.history.model._meta.db_table        call_command('partition_history', months_ahead=3, stdout=StringIO())        with connection.cursor() as cursor:            cursor.execute(f'SELECT title FROM {table}_p{later:%Y_%m}')            self.assertEqual(cursor.fetchall(), [('v5',)])            cursor.execute(f'SELECT count(*) FROM {table}_default')            self.assertEqual(cursor.fetchone(), (0,))    @skipIf(connection.vendor == 'postgresql', 'PostgreSQL supported')    def test_partition_history_requires_postgres(self):        with self.assertRaises(CommandError):            call_command('partition_history', stdout=StringIO())class LoadToolsTestCase(TestCase):    """Testing the seed_data and bench_api commands"""    def test_seed_data(self):        """Test users are seeded with linked recipes and history"""        call_command('seed_data', users=2, recipes=5, tags=3, ingredients=3,                     per_recipe=2, versions=2, prefix='load',                     stdout=StringIO())        users = get_user_model().objects.filter(email__startswith='load-')        self.assertEqual(users.count(), 2)        self.assertTrue(users[0].check_password('password'))        self.assertEqual(Recipe.objects.count(), 10)        self.assertEqual(Tag.objects.filter(user=users[0]).count(), 3)        self.assertEqual(Recipe.history.count(), 20)        recipe = Recipe.objects.first()        self.assertEqual(sorted(recipe.tag_ids),                         sorted(recipe.tags.values_list('id', flat=True)))        with self.assertRaises(CommandError):            call_command('seed_data', users=1, prefix='load',                         stdout=StringIO())    def test_bench_api(self):        """Test every endpoint is reported and the data is removed"""        out = StringIO()        with tempfile.TemporaryDirectory() as directory:            path = os.path.join(directory, 'baseline.json')            call_command('bench_api', requests=2, recipes=4, concurrency=1,                         save_baseline=path, stdout=out)            with open(path) as baseline_file:                baseline = json.load(baseline_file)        self.assertIn('recipe list', baseline)        self.assertIn('user token', baseline)        for result in baseline.values():            self.assertEqual(result['requests'], 2)            self.assertEqual(result['errors'], 0)        self.assertIn('p95 ms', out.getvalue())        self.assertFalse(get_user_model().objects.exists())    def test_bench_api_regression(self):        """Test results worse than the baseline fail the command"""        baseline = {'tag list': {'p95': 1e-6, 'throughput': 1e9,                                 'queries': 0}}        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:            json.dump(baseline, file)            file.flush()            with self.assertRaisesMessage(CommandError, 'tag list'):                call_command('bench_api', requests=2, recipes=4,                             concurrency=1, endpoints=['tag list'],                             baseline=file.name, stdout=StringIO())
\ No newline at end of file
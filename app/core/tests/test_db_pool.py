@@ -0,0 +1,183 @@
+import threading
+from io import StringIO
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+import psycopg2
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.db.utils import OperationalError, load_backend
+from django.test import SimpleTestCase, TestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout, warm_pools
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCases(SimpleTestCase):
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        self.opened.append(FakeConnection())
+        return self.opened[-1]
+
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(self.connect)
+        first = pool.acquire()
+        pool.release(first)
+
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_size_is_bounded(self):
+        """Test checkouts beyond max_size wait and then time out"""
+        pool = ConnectionPool(self.connect, max_size=1, timeout=0.01)
+        first = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+        pool.timeout = 5
+        threading.Timer(0.05, pool.release, (first,)).start()
+        self.assertIs(pool.acquire(), first)
+
+    def test_health_check_on_checkout(self):
+        """Test connections failing the check are replaced"""
+        pool = ConnectionPool(self.connect, check=lambda conn: False,
+                              check_after=0)
+        first = pool.acquire()
+        pool.release(first)
+
+        second = pool.acquire()
+
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_broken_and_old_connections_are_closed(self):
+        pool = ConnectionPool(self.connect, reset=lambda conn: False)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.size, 0)
+
+        pool = ConnectionPool(self.connect, max_age=0)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIsNot(pool.acquire(), first)
+        self.assertTrue(first.closed)
+
+    def test_failed_connect_frees_slot(self):
+        def connect():
+            raise OperationalError('refused')
+        pool = ConnectionPool(connect, max_size=1, timeout=0)
+        with self.assertRaises(OperationalError):
+            pool.acquire()
+
+        pool.connect = self.connect
+        self.assertIs(pool.acquire(), self.opened[0])
+
+    def test_warm_and_close(self):
+        pool = ConnectionPool(self.connect, min_size=3)
+        pool.warm()
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(len(pool.idle), 3)
+
+        checked_out = pool.acquire()
+        pool.close()
+
+        self.assertEqual(pool.size, 1)
+        self.assertEqual([conn.closed for conn in self.opened],
+                         [True, True, False])
+        self.assertIs(checked_out, self.opened[2])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+class PooledBackendTestCases(TestCase):
+
+    def setUp(self):
+        backend = load_backend('core.db.backends.postgresql')
+        self.wrapper = backend.DatabaseWrapper(
+            dict(connection.settings_dict, POOL={'CHECK_AFTER': 0}),
+            connection.alias
+        )
+
+    def tearDown(self):
+        self.wrapper.close()
+        if self.wrapper.pool is not None:
+            self.wrapper.pool.close()
+
+    def test_close_returns_connection(self):
+        """Test a closed wrapper reconnects to the same session"""
+        self.wrapper.ensure_connection()
+        raw = self.wrapper.connection
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            pid = cursor.fetchone()[0]
+        self.wrapper.close()
+
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            self.assertEqual(cursor.fetchone()[0], pid)
+        self.assertIs(self.wrapper.connection, raw)
+
+    def test_open_transaction_is_rolled_back(self):
+        self.wrapper.ensure_connection()
+        raw = self.wrapper.connection
+        self.wrapper.set_autocommit(False)
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('CREATE TEMPORARY TABLE pooled (id int)')
+        self.wrapper.close()
+
+        self.wrapper.ensure_connection()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('pooled')")
+            self.assertIsNone(cursor.fetchone()[0])
+        self.assertIs(self.wrapper.connection, raw)
+
+    def test_dead_connection_is_replaced(self):
+        self.wrapper.ensure_connection()
+        raw = self.wrapper.connection
+        self.wrapper.close()
+        raw.close()
+
+        with self.wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIsNot(self.wrapper.connection, raw)
+
+    def test_unreachable_database_is_logged_while_warming(self):
+        """Test a failed psycopg2 connect does not escape warm_pools"""
+        self.wrapper.settings_dict['POOL'] = {'MIN_SIZE': 1,
+                                              'CHECK_AFTER': 1}
+        connect = patch('psycopg2.connect',
+                        side_effect=psycopg2.OperationalError('refused'))
+        all_connections = patch('core.db.pool.connections.all',
+                                return_value=[self.wrapper])
+
+        with connect, all_connections, \
+                self.assertLogs('core.db.pool', 'WARNING') as logs:
+            warm_pools()
+
+        self.assertIn('refused', logs.output[0])
+
+    def test_benchmark_connections(self):
+        out = StringIO()
+        call_command('benchmark_connections', requests=5, stdout=out)
+        for mode in ('connect', 'persistent', 'pooled'):
+            self.assertIn(f'\n{mode} ', out.getvalue())
+
+
+@skipIf(connection.vendor == 'postgresql', 'PostgreSQL supported')
+class BenchmarkConnectionsTestCase(TestCase):
+
+    def test_requires_postgres(self):
+        with self.assertRaises(CommandError):
+            call_command('benchmark_connections', stdout=StringIO())
@@ -0,0 +1,106 @@
+import os
+import tempfile
+
+from django.http import FileResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+CONTENT = bytes(range(256)) * 4
+
+
+class MediaServeTestCase(TestCase):
+    """Test serving files below MEDIA_ROOT"""
+
+    def setUp(self):
+        self.media_root = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root.name,
+            CHUNKED_UPLOAD_ROOT=os.path.join(self.media_root.name, 'partial'),
+            MEDIA_SERVE_MODE='direct',
+        )
+        self.settings_override.enable()
+        os.makedirs(os.path.join(self.media_root.name, 'partial'))
+        for name in ('image.jpg', 'partial/upload.part'):
+            with open(os.path.join(self.media_root.name, name), 'wb') as f:
+                f.write(CONTENT)
+        self.url = reverse('media', args=['image.jpg'])
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media_root.cleanup()
+
+    def test_serve_file_with_validators(self):
+        """Test files are sent as a FileResponse with validators"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIsInstance(res, FileResponse)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(CONTENT)))
+        self.assertTrue(res['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', res)
+
+    def test_if_none_match_not_modified(self):
+        """Test a matching If-None-Match returns 304"""
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_byte_range(self):
+        """Test a single byte range returns partial content"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertNotIsInstance(res, FileResponse)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(res['Content-Range'],
+                         f'bytes 10-19/{len(CONTENT)}')
+
+        res = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(res.streaming_content), CONTENT[-5:])
+
+        res = self.client.head(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res['Content-Length'], '10')
+        self.assertEqual(res['Content-Range'],
+                         f'bytes 10-19/{len(CONTENT)}')
+        self.assertEqual(b''.join(res.streaming_content), b'')
+
+    def test_unsatisfiable_range(self):
+        res = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_stale_if_range_returns_full_file(self):
+        """Test ranges are ignored when If-Range no longer matches"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=10-19',
+                              HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), CONTENT)
+
+    def test_hidden_and_missing_files(self):
+        """Test partial uploads, traversal and missing files are 404"""
+        for path in ('partial/upload.part', '../etc/passwd', 'missing.jpg'):
+            res = self.client.get(reverse('media', args=[path]))
+            self.assertEqual(res.status_code, 404)
+
+    def test_proxy_modes(self):
+        """Test proxy modes hand the file off without streaming it"""
+        with self.settings(MEDIA_SERVE_MODE='x-accel-redirect',
+                           MEDIA_ACCEL_PREFIX='/protected/'):
+            res = self.client.get(self.url)
+            self.assertEqual(res['X-Accel-Redirect'], '/protected/image.jpg')
+            self.assertEqual(res.content, b'')
+
+        with self.settings(MEDIA_SERVE_MODE='x-sendfile'):
+            res = self.client.get(self.url)
+            self.assertEqual(
+                res['X-Sendfile'],
+                os.path.join(self.media_root.name, 'image.jpg')
+            )
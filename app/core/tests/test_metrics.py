@@ -0,0 +1,130 @@
+import re
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import Histogram
+from recipe.tests.test_utils import create_sample_user, create_sample_tag, \
+    sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+METRICS_URL = reverse('metrics')
+
+SERVER_TIMING_RE = re.compile(
+    r'^db;dur=(?P<db>[\d.]+);desc="(?P<queries>\d+) queries", '
+    r'serializer;dur=(?P<serializer>[\d.]+), total;dur=(?P<total>[\d.]+)$'
+)
+
+
+def sample_value(content, line_prefix):
+    """Return the value of the metrics line starting with line_prefix"""
+    for line in content.decode().splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+
+@override_settings(METRICS_TOKEN='secret', SERVER_TIMING_HEADER=True)
+class MetricsTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient(HTTP_AUTHORIZATION='Bearer secret')
+        self.client.force_authenticate(self.user)
+        recipe = sample_recipe(self.user)
+        recipe.tags.add(create_sample_tag(self.user))
+
+    def get_timings(self, response):
+        match = SERVER_TIMING_RE.match(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        return match.groupdict()
+
+    def test_server_timing_header(self):
+        """Test queries, db, serializer and total time are reported"""
+        for fast in (True, False):
+            with override_settings(FAST_LIST_SERIALIZATION=fast), \
+                    CaptureQueriesContext(connection) as queries:
+                res = self.client.get(RECIPE_URL)
+
+            timings = self.get_timings(res)
+            self.assertEqual(int(timings['queries']), len(queries))
+            self.assertGreater(float(timings['serializer']), 0)
+            self.assertGreater(float(timings['db']), 0)
+            self.assertGreaterEqual(float(timings['total']),
+                                    float(timings['db']))
+
+    def test_metrics_endpoint(self):
+        """Test requests are aggregated per view in histograms"""
+        series = ('http_request_duration_seconds_count{view="RecipeViewSet.'
+                  'list",method="GET",status="200"}')
+        before = sample_value(self.client.get(METRICS_URL).content, series)
+        self.client.get(RECIPE_URL)
+        self.client.post(
+            reverse('recipe:recipe-upload-image',
+                    args=[self.user.recipe_set.get().id]), {}
+        )
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertEqual(sample_value(res.content, series), before + 1)
+        for name in ('http_request_db_duration_seconds_count',
+                     'http_request_serializer_duration_seconds_count',
+                     'http_request_queries_count'):
+            self.assertGreater(
+                sample_value(res.content,
+                             name + '{view="RecipeViewSet.list"}'), 0
+            )
+        self.assertIn(b'view="RecipeViewSet.upload_image",method="POST"',
+                      res.content)
+        self.assertIn(b'recipe_list_cache_requests_total{outcome="hit"}',
+                      res.content)
+
+    def test_metrics_token(self):
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_closed_without_token(self):
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_server_timing_header_off(self):
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_disabled(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(RECIPE_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_seconds', 'Test', ('view',), (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 5):
+            histogram.observe(value, 'a"b')
+
+        self.assertEqual(list(histogram.collect()), [
+            '# HELP test_seconds Test',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="a\\"b",le="0.1"} 2',
+            'test_seconds_bucket{view="a\\"b",le="1"} 3',
+            'test_seconds_bucket{view="a\\"b",le="+Inf"} 4',
+            'test_seconds_sum{view="a\\"b"} 5.65',
+            'test_seconds_count{view="a\\"b"} 4',
+        ])
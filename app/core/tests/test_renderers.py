@@ -0,0 +1,144 @@
+import gzip
+from decimal import Decimal
+from io import StringIO
+
+import brotli
+import msgpack
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.middleware import choose_encoding
+from core.renderers import ORJSONRenderer, MessagePackRenderer
+from recipe.tests.test_utils import create_sample_user, create_sample_tag, \
+    sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class RendererTestCases(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        recipe = sample_recipe(self.user, title='Crème brûlée', price=7.5)
+        recipe.tags.add(create_sample_tag(self.user, name='Dessert'))
+
+    def test_orjson_matches_json_renderer(self):
+        """Test orjson renders the same bytes as DRF's JSONRenderer"""
+        data = {
+            'title': 'Crème brûlée',
+            'price': Decimal('7.50'),
+            'created': timezone.now(),
+            1: [None, True, 1.5],
+            'text': 'line\u2028paragraph\u2029 1e5',
+            'floats': [1e16, 1e-7, 1e-5, -2.5e-9, 1.5e300, 0.1 + 0.2],
+        }
+        self.assertEqual(ORJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+        for value in (1e-5, 'a\u2028b', [0.0001, 1e15]):
+            self.assertEqual(ORJSONRenderer().render(value),
+                             JSONRenderer().render(value))
+
+    def test_orjson_indent_falls_back(self):
+        """Test indented output is still available"""
+        content = ORJSONRenderer().render(
+            {'a': 1}, 'application/json; indent=2'
+        )
+        self.assertEqual(content, b'{\n  "a": 1\n}')
+
+    def test_json_is_default(self):
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res.json()[0]['title'], 'Crème brûlée')
+
+    @override_settings(SHARED_CACHE=True)
+    def test_msgpack_by_accept_header(self):
+        """Test MessagePack is rendered when the client asks for it"""
+        json_res = self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(res.content, raw=False),
+                         json_res.json())
+        self.assertNotEqual(res['ETag'], json_res['ETag'])
+
+    def test_msgpack_renders_none_as_empty(self):
+        self.assertEqual(MessagePackRenderer().render(None), b'')
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class CompressionTestCases(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        for i in range(count):
+            sample_recipe(self.user, title=f'Recipe number {i}')
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(choose_encoding('gzip;q=1, br;q=0.5'), 'gzip')
+        self.assertEqual(choose_encoding('br;q=0, *'), 'gzip')
+        self.assertEqual(choose_encoding('identity'), None)
+        self.assertEqual(choose_encoding(''), None)
+
+    def test_large_list_brotli(self):
+        self.create_recipes(30)
+        plain = self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertIn('Accept-Encoding', res['Vary'])
+        self.assertEqual(brotli.decompress(res.content), plain.content)
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+
+    def test_large_list_gzip(self):
+        self.create_recipes(30)
+        plain = self.client.get(RECIPE_URL)
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+
+    def test_small_payload_not_compressed(self):
+        self.create_recipes(1)
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertLess(len(res.content), 1024)
+        self.assertNotIn('Content-Encoding', res)
+
+    @override_settings(SHARED_CACHE=True)
+    def test_compressed_etag_is_weak(self):
+        """Test conditional GETs still match compressed responses"""
+        self.create_recipes(30)
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='br')
+        self.assertTrue(res['ETag'].startswith('W/"'))
+
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='br',
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_benchmark_renderers(self):
+        out = StringIO()
+        call_command('benchmark_renderers', rows=[5], repeat=1, stdout=out)
+
+        output = out.getvalue()
+        for name in ('json', 'orjson', 'msgpack'):
+            self.assertIn(f'5  {name} ', output)
+        self.assertEqual(output.count('identity'), 3)
@@ -0,0 +1,100 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.db.routers import ReplicaRouter, reads_from
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Tag
+from recipe.tests.test_utils import create_sample_user
+
+TAG_URL = reverse('recipe:tag-list')
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTestCases(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        self.assertIsNone(self.router.db_for_read(Tag))
+        with reads_from('replica'):
+            self.assertEqual(self.router.db_for_read(Tag), 'replica')
+        self.assertIsNone(self.router.db_for_read(Tag))
+
+    def test_replica_objects_are_written_to_primary(self):
+        tag = Tag(name='Vegan')
+        self.assertIsNone(self.router.db_for_write(Tag, instance=tag))
+        tag._state.db = 'replica'
+        self.assertEqual(self.router.db_for_write(Tag, instance=tag),
+                         'default')
+
+
+@skipUnless('replica' in settings.DATABASES,
+            'needs a replica database, see app.test_settings')
+@override_settings(REPLICA_DATABASES=['replica'], SHARED_CACHE=True)
+class ReplicaRoutingTestCases(TestCase):
+    multi_db = True
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_tag_names(self, client=None):
+        res = (client or self.client).get(TAG_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [tag['name'] for tag in res.data]
+
+    def test_safe_requests_read_from_replica(self):
+        """Test rows only the primary has are not listed"""
+        Tag.objects.create(user=self.user, name='Primary')
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.assertEqual(self.get_tag_names(), [])
+        self.assertTrue(queries)
+
+    def test_writes_pin_client_to_primary(self):
+        """Test a client reads its own writes through the cookie"""
+        res = self.client.post(TAG_URL, {'name': 'Vegan'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.cookies[settings.REPLICA_PIN_COOKIE]['max-age'],
+                         settings.REPLICA_PIN_SECONDS)
+
+        other = APIClient()
+        other.force_authenticate(self.user)
+        self.assertEqual(self.get_tag_names(other), [])
+        # the replica's answer was not cached as the latest list
+        res = self.client.get(TAG_URL)
+        self.assertEqual([tag['name'] for tag in res.data], ['Vegan'])
+        self.assertIn('ETag', res)
+
+    def test_failed_writes_do_not_pin(self):
+        res = self.client.post(TAG_URL, {'name': ''})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, res.cookies)
+
+    @override_settings(REPLICA_PIN_STORE='cache')
+    def test_cache_pin_follows_credentials(self):
+        """Test clients without cookies are pinned by their token"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token first')
+        self.client.post(TAG_URL, {'name': 'Vegan'})
+        self.client.cookies.clear()
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token second')
+        self.assertEqual(self.get_tag_names(), [])
+        self.client.credentials(HTTP_AUTHORIZATION='Token first')
+        self.assertEqual(self.get_tag_names(), ['Vegan'])
+
+    @override_settings(REPLICA_PIN_STORE='cache', SHARED_CACHE=False)
+    def test_cache_pin_needs_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ReplicaRoutingMiddleware(lambda request: None)
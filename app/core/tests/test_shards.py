@@ -0,0 +1,164 @@
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db.routers import ShardMoving, ShardRouter, pick_shard, \
+    user_shard, using_shard
+from core.models import Recipe, Tag, User
+from recipe.tests.test_utils import create_sample_user, \
+    create_sample_tag, create_sample_ingredient, sample_recipe
+from user.authentication import CachedTokenAuthentication
+
+TAG_URL = reverse('recipe:tag-list')
+
+
+@override_settings(SHARD_DATABASES=['default', 'shard1'],
+                   NEW_USER_SHARDS=['default', 'shard1'])
+class ShardRouterTestCases(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ShardRouter()
+
+    def test_pick_shard(self):
+        """Test new users are spread over NEW_USER_SHARDS by email"""
+        shards = {pick_shard(f'user{i}@example.com') for i in range(20)}
+        self.assertEqual(shards, {'default', 'shard1'})
+        self.assertEqual(pick_shard('User@Example.com'),
+                         pick_shard('user@example.com'))
+
+    def test_user_shard(self):
+        self.assertEqual(user_shard(User(shard='')), 'default')
+        self.assertEqual(user_shard(User(shard='shard1')), 'shard1')
+        with self.assertRaises(ImproperlyConfigured):
+            user_shard(User(shard='shard9'))
+
+    def test_user_models_follow_shard(self):
+        user = User(pk=1, shard='shard1')
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertEqual(self.router.db_for_read(Tag), 'default')
+        tag = Tag(user=user)
+        self.assertEqual(self.router.db_for_write(Tag, instance=tag),
+                         'shard1')
+        with using_shard(lambda: user):
+            self.assertEqual(self.router.db_for_read(Tag), 'shard1')
+            self.assertEqual(self.router.db_for_read(Recipe.tags.through),
+                             'shard1')
+
+    def test_writes_blocked_while_moving(self):
+        user = User(pk=1, shard='shard1', shard_moving=True)
+        with using_shard(lambda: user):
+            self.assertEqual(self.router.db_for_read(Tag), 'shard1')
+            with self.assertRaises(ShardMoving):
+                self.router.db_for_write(Tag)
+
+
+@skipUnless('shard1' in settings.DATABASES,
+            'needs a second shard, see app.test_settings')
+@override_settings(SHARD_DATABASES=['default', 'shard1'])
+class ShardingTestCases(TestCase):
+    multi_db = True
+
+    def setUp(self):
+        with self.settings(NEW_USER_SHARDS=['shard1']):
+            self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rows_written_to_user_shard(self):
+        """Test the API keeps the rows of a user on the user's shard"""
+        res = self.client.post(TAG_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(Tag.objects.using('default').exists())
+        tag = Tag.objects.using('shard1').get()
+        self.assertGreaterEqual(tag.id, settings.SHARD_ID_SPAN)
+        res = self.client.get(TAG_URL)
+        self.assertEqual([tag['name'] for tag in res.data], ['Vegan'])
+
+    def test_move_user_shard(self):
+        """Test rows keep their ids and links on the new shard"""
+        user = create_sample_user(email='other@example.com')
+        with using_shard('default'):
+            tag = create_sample_tag(user)
+            recipe = sample_recipe(user)
+            recipe.tags.add(tag)
+            recipe.ingredients.add(create_sample_ingredient(user))
+
+        call_command('move_user_shard', user.email, 'shard1', drain=0,
+                     stdout=StringIO())
+
+        user.refresh_from_db()
+        self.assertEqual(user.shard, 'shard1')
+        self.assertFalse(user.shard_moving)
+        self.assertFalse(Recipe.objects.using('default').exists())
+        self.assertFalse(Recipe.history.using('default').exists())
+        moved = Recipe.objects.using('shard1').get(user=user)
+        self.assertEqual(moved.id, recipe.id)
+        self.assertEqual(list(moved.tags.all()), [tag])
+        self.assertEqual(moved.ingredients.count(), 1)
+        self.assertEqual(moved.tag_ids, [tag.id])
+        self.assertEqual(Recipe.history.using('shard1').count(), 1)
+
+    def test_writes_fail_while_moving(self):
+        """Test writes are refused with Retry-After during a move"""
+        self.user.shard_moving = True
+        self.user.save()
+
+        res = self.client.post(TAG_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(self.client.get(TAG_URL).status_code,
+                         status.HTTP_200_OK)
+
+    @override_settings(SHARED_CACHE=True,
+                       TOKEN_AUTH_CACHE={'TTL': 300, 'MAX_SIZE': 10,
+                                         'SHARED': False})
+    def test_cached_token_follows_move(self):
+        """Test a cached token resolution sees the freeze and new shard"""
+        cache.clear()
+        CachedTokenAuthentication.local_cache.clear()
+        user = create_sample_user(email='other@example.com')
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(client.get(TAG_URL).status_code, status.HTTP_200_OK)
+
+        # as in a process that missed the token version bump
+        with patch('user.signals.bump_token_version'):
+            user.shard_moving = True
+            user.save()
+            res = client.post(TAG_URL, {'name': 'Vegan'})
+            self.assertEqual(res.status_code,
+                             status.HTTP_503_SERVICE_UNAVAILABLE)
+            user.shard_moving = False
+            user.save()
+
+            call_command('move_user_shard', user.email, 'shard1', drain=0,
+                         stdout=StringIO())
+            res = client.post(TAG_URL, {'name': 'Vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(CachedTokenAuthentication.local_cache), 1)
+        self.assertTrue(Tag.objects.using('shard1').filter(
+            user=user, name='Vegan').exists())
+        self.assertFalse(Tag.objects.using('default').exists())
+
+    def test_delete_user_deletes_shard_rows(self):
+        with using_shard('shard1'):
+            sample_recipe(self.user).tags.add(create_sample_tag(self.user))
+
+        self.user.delete()
+
+        self.assertFalse(Recipe.objects.using('shard1').exists())
+        self.assertFalse(Tag.objects.using('shard1').exists())
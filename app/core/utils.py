@@ -0,0 +1,38 @@
+from django.db import connections
+from django.db.models import Case, Value, When
+from django.db.models.functions import Cast
+
+
+def bulk_update(queryset, objs, fields, batch_size=None):
+    """
+    Save `fields` of objs with one UPDATE per batch.
+
+    Backport of `QuerySet.bulk_update` from Django 2.2: every field is set
+    through a `CASE WHEN pk = ... THEN ...` expression.
+    """
+    objs = [obj for obj in objs if obj.pk is not None]
+    if not objs or not fields:
+        return
+    model = queryset.model
+    fields = [model._meta.get_field(name) for name in fields]
+    connection = connections[queryset.db]
+    requires_casting = connection.vendor == 'postgresql'
+    max_batch_size = connection.ops.bulk_batch_size(
+        ['pk', 'pk'] + fields, objs
+    )
+    batch_size = min(batch_size or max_batch_size, max_batch_size)
+
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        updates = {}
+        for field in fields:
+            whens = [
+                When(pk=obj.pk, then=Value(getattr(obj, field.attname),
+                                           output_field=field))
+                for obj in batch
+            ]
+            case = Case(*whens, output_field=field)
+            if requires_casting:
+                case = Cast(case, output_field=field)
+            updates[field.attname] = case
+        queryset.filter(pk__in=[obj.pk for obj in batch]).update(**updates)
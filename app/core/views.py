@@ -0,0 +1,186 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, \
+    HttpResponseForbidden, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+
+from recipe.cache import get_cache_stats
+
+from .metrics import HISTOGRAMS
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+def media_path(path):
+    """Return the absolute path of a servable media file or raise 404"""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Media not found')
+    # Unfinished chunked uploads live below MEDIA_ROOT but are not public
+    partial_root = os.path.join(
+        os.path.abspath(settings.CHUNKED_UPLOAD_ROOT), ''
+    )
+    if full_path.startswith(partial_root):
+        raise Http404('Media not found')
+    return full_path
+
+
+def parse_range(header, size):
+    """
+    Return the (start, end) of a single byte range, None to ignore it
+
+    Raises ValueError for an unsatisfiable range.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end) if end else size - 1, size - 1)
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def iter_file(path, start, length):
+    with open(path, 'rb') as media:
+        media.seek(start)
+        while length > 0:
+            block = media.read(min(BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file below MEDIA_ROOT.
+
+    With MEDIA_SERVE_MODE set to 'x-accel-redirect' or 'x-sendfile' the
+    front proxy is told which file to send and no bytes pass through
+    Python. In 'direct' mode whole files are sent as a FileResponse, so
+    the server can use wsgi.file_wrapper (sendfile), with strong ETags,
+    conditional GET and single byte-range support; ranges are streamed.
+    """
+    full_path = media_path(path)
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = \
+            settings.MEDIA_ACCEL_PREFIX + quote(path)
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404('Media not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Media not found')
+
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag,
+                                        last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, full_path, stat.st_size, etag,
+                                  last_modified, content_type)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True,
+                        max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+def _file_response(request, full_path, size, etag, last_modified,
+                   content_type):
+    start, end = 0, size - 1
+    status = 200
+    if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _if_range_passes(if_range, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            status = 206
+
+    length = end - start + 1 if size else 0
+    if request.method != 'GET':
+        response = StreamingHttpResponse((), status=status,
+                                         content_type=content_type)
+    elif status == 200:
+        response = FileResponse(open(full_path, 'rb'),
+                                content_type=content_type)
+    else:
+        response = StreamingHttpResponse(iter_file(full_path, start, length),
+                                         status=status,
+                                         content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def _if_range_passes(if_range, etag, last_modified):
+    """Ranges only apply while the If-Range validator still matches"""
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+@require_safe
+def metrics_view(request):
+    """
+    Serve the request histograms in the Prometheus text format.
+
+    Histograms live in process memory, so every worker process is scraped
+    as its own target. The scraper has to send METRICS_TOKEN as a bearer
+    token; without one configured the endpoint is closed.
+    """
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponseForbidden()
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.collect())
+    lines.append('# HELP recipe_list_cache_requests_total '
+                 'Tag and ingredient list cache lookups')
+    lines.append('# TYPE recipe_list_cache_requests_total counter')
+    for outcome, count in get_cache_stats().items():
+        lines.append(
+            f'recipe_list_cache_requests_total{{outcome="{outcome}"}} {count}'
+        )
+    return HttpResponse('\n'.join(lines) + '\n',
+                        content_type='text/plain; version=0.0.4')
@@ -0,0 +1,221 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+from simple_history.utils import bulk_create_with_history
+
+from core.models import Tag, Ingredient, Recipe
+from core.utils import bulk_update
+
+from . import stats
+from .cache import bump_list_version, bump_versions
+
+# Related fields of bulk recipe items and the column of their through table
+RELATED_FIELDS = {
+    'tags': (Tag, 'tag_id'),
+    'ingredients': (Ingredient, 'ingredient_id'),
+}
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _ints(values):
+    """Return the values that can be used as ids, skipping invalid ones"""
+    return {pk for pk in map(_int_or_none, values) if pk is not None}
+
+
+def validate_batch(data):
+    """Return request data as a list of items or raise a 400"""
+    if not isinstance(data, list):
+        raise ValidationError(
+            {'non_field_errors': ['Expected a list of items.']}
+        )
+    if len(data) > settings.BULK_MAX_ITEMS:
+        raise ValidationError({'non_field_errors': [
+            f'At most {settings.BULK_MAX_ITEMS} items are accepted.'
+        ]})
+    return data
+
+
+def get_context(model, user, items, partial):
+    """
+    Return the ids owned by user that the batch refers to.
+
+    One query per model regardless of the number of items.
+    """
+    items = [item for item in items if isinstance(item, dict)]
+    context = {'ids': set()}
+    if partial:
+        context['ids'] = set(
+            model.objects.filter(
+                user=user, id__in=_ints(item.get('id') for item in items)
+            ).values_list('id', flat=True)
+        )
+    if model is Recipe:
+        for field, (related, _) in RELATED_FIELDS.items():
+            requested = _ints(
+                pk for item in items
+                if isinstance(item.get(field), list) for pk in item[field]
+            )
+            context[field] = set(
+                related.objects.filter(user=user, id__in=requested)
+                .values_list('id', flat=True)
+            ) if requested else set()
+    return context
+
+
+def _insert(model, objs, user):
+    """Insert objs with their history and return them with ids"""
+    for obj in objs:
+        obj._history_user = user
+    if not connection.features.can_return_ids_from_bulk_insert:
+        # Ids are needed for the history and through rows
+        for obj in objs:
+            obj.save(force_insert=True)
+        return objs
+    if hasattr(model, 'history'):
+        return bulk_create_with_history(
+            objs, model, batch_size=settings.BULK_BATCH_SIZE,
+            default_user=user
+        )
+    return model.objects.bulk_create(objs,
+                                     batch_size=settings.BULK_BATCH_SIZE)
+
+
+def _pop_related(model, items):
+    """Remove related ids from items, keyed by field then item index"""
+    if model is not Recipe:
+        return {}
+    return {
+        field: {index: item.pop(field) for index, item in enumerate(items)
+                if field in item}
+        for field in RELATED_FIELDS
+    }
+
+
+def _set_related(recipes, related, replace):
+    """
+    Write recipe assignments with one INSERT per through table and
+    adjust the recipe counts of the tags and ingredients
+    """
+    for field, assigned in related.items():
+        if not assigned:
+            continue
+        through = getattr(Recipe, field).through
+        model, column = RELATED_FIELDS[field]
+        counts = Counter()
+        if replace:
+            replaced = through.objects.filter(
+                recipe_id__in={recipes[index].pk for index in assigned}
+            )
+            counts.subtract(replaced.values_list(column, flat=True))
+            replaced.delete()
+        rows = {
+            (recipes[index].pk, pk): through(recipe_id=recipes[index].pk,
+                                             **{column: pk})
+            for index, ids in assigned.items() for pk in ids
+        }
+        through.objects.bulk_create(rows.values(),
+                                    batch_size=settings.BULK_BATCH_SIZE)
+        counts.update(pk for _, pk in rows)
+        model.objects.adjust_recipe_counts(counts)
+
+
+def _sync_renamed(model, pks):
+    """
+    Rebuild the search vectors of the recipes of renamed tags or
+    ingredients, as the post_save receiver does for single saves
+    """
+    column = f'{model._meta.model_name}_id'
+    recipe_ids = model.recipe_set.through.objects \
+        .filter(**{f'{column}__in': pks}).values_list('recipe_id', flat=True)
+    Recipe.objects.sync_search_vectors(recipe_ids)
+
+
+def _synced(model, user, objs, stats_before=None):
+    """
+    Refresh denormalized recipe data and cached lists after a write,
+    stats_before being the stats contributions of the updated recipes
+    """
+    if model is Recipe:
+        recipe_ids = [obj.pk for obj in objs]
+        Recipe.objects.sync_related_ids(recipe_ids)
+        Recipe.objects.sync_search_vectors(recipe_ids)
+        stats.apply(stats_before or {},
+                    stats.recipe_contributions(recipe_ids))
+        bump_versions(Recipe, user.id, recipe_ids)
+        bump_list_version(Tag, user.id)
+        bump_list_version(Ingredient, user.id)
+    else:
+        bump_list_version(model, user.id)
+    return objs
+
+
+def create(model, user, items):
+    """Create validated items and return the new objects in order"""
+    related = _pop_related(model, items)
+    objs = _insert(model, [model(user=user, **attrs) for attrs in items],
+                   user)
+    stats_before = None
+    if model is Recipe and \
+            not connection.features.can_return_ids_from_bulk_insert:
+        # saved one by one, so post_save has counted them already
+        stats_before = stats.recipe_contributions([obj.pk for obj in objs])
+    _set_related(objs, related, replace=False)
+    return _synced(model, user, objs, stats_before)
+
+
+def update(model, user, items):
+    """Apply validated partial updates and return the objects in order"""
+    related = _pop_related(model, items)
+    existing = model.objects.filter(user=user) \
+        .in_bulk([attrs['id'] for attrs in items])
+    stats_before = stats.recipe_contributions(existing) \
+        if model is Recipe else None
+    objs = []
+    fields = set()
+    for attrs in items:
+        obj = existing[attrs.pop('id')]
+        for name, value in attrs.items():
+            setattr(obj, name, value)
+        fields.update(attrs)
+        objs.append(obj)
+
+    unique = list({obj.pk: obj for obj in objs}.values())
+    bulk_update(model.objects.all(), unique, sorted(fields),
+                batch_size=settings.BULK_BATCH_SIZE)
+    _set_related(objs, related, replace=True)
+    if hasattr(model, 'history'):
+        model.history.bulk_history_create(
+            unique, batch_size=settings.BULK_BATCH_SIZE, update=True,
+            default_user=user
+        )
+    if model is not Recipe and 'name' in fields:
+        _sync_renamed(model, [obj.pk for obj in unique])
+    return _synced(model, user, objs, stats_before)
+
+
+def delete(model, user, ids):
+    """
+    Delete the objects with ids, reporting unknown ids per item.
+
+    Rows go through `QuerySet.delete()` so cascades, files and the
+    deletion history are handled by the usual signals.
+    """
+    owned = set(
+        model.objects.filter(user=user, id__in=_ints(ids))
+        .values_list('id', flat=True)
+    )
+    errors = [{} if pk in owned else {'id': ['Not found.']}
+              for pk in map(_int_or_none, ids)]
+    if any(errors):
+        raise ValidationError(errors)
+    model.objects.filter(user=user, id__in=owned).delete()
+    if model is not Recipe:
+        bump_list_version(model, user.id)
@@ -0,0 +1,108 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'recipe:list-version:{label}:{user_id}'
+OBJECT_VERSION_KEY = 'recipe:object-version:{label}:{pk}'
+LIST_KEY = 'recipe:list:{label}:{user_id}:v{version}:{params}'
+STATS_KEY = 'recipe:list-cache:{outcome}'
+
+
+def _incr(key):
+    """Increment a counter in the cache, creating it when missing"""
+    if cache.add(key, 1, timeout=None):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def _new_version():
+    """
+    Return a version for a changed (or evicted) key.
+
+    Versions are the time of the change in nanoseconds: a re-created key
+    never repeats an older value, and replica_may_lag can tell how
+    recent the change is.
+    """
+    return time.time_ns()
+
+
+def get_version_key(model, user_id):
+    return VERSION_KEY.format(label=model._meta.label_lower, user_id=user_id)
+
+
+def get_object_version_key(model, pk):
+    return OBJECT_VERSION_KEY.format(label=model._meta.label_lower, pk=pk)
+
+
+def get_versions(keys):
+    """
+    Return the versions stored under keys, creating missing ones.
+
+    The versions of an unshared cache (SHARED_CACHE) miss the writes of
+    other processes, every call gets fresh ones instead.
+    """
+    if not settings.SHARED_CACHE:
+        return [_new_version() for key in keys]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), timeout=None)
+        versions.update(cache.get_many(missing))
+    # Without a working cache every request gets a fresh version
+    return [versions.get(key) or _new_version() for key in keys]
+
+
+def get_list_version(model, user_id):
+    """Return the current list cache version of model for user"""
+    return get_versions([get_version_key(model, user_id)])[0]
+
+
+def bump_list_version(model, user_id):
+    """Invalidate every cached list of model for user"""
+    cache.set(get_version_key(model, user_id), _new_version(), timeout=None)
+
+
+def bump_versions(model, user_id, pks):
+    """Invalidate the lists of model for user and the objects with pks"""
+    version = _new_version()
+    keys = [get_version_key(model, user_id)]
+    keys.extend(get_object_version_key(model, pk) for pk in pks)
+    cache.set_many({key: version for key in keys}, timeout=None)
+
+
+def get_list_key(model, user_id, params):
+    """Return the cache key of a list response"""
+    params = '&'.join(f'{name}={value}'
+                      for name, value in sorted(params.items()))
+    return LIST_KEY.format(label=model._meta.label_lower,
+                           user_id=user_id,
+                           version=get_list_version(model, user_id),
+                           params=params)
+
+
+def get_cached_list(key):
+    """Return a cached list response and record the hit or miss"""
+    if not settings.SHARED_CACHE:
+        return None
+    cached = cache.get(key)
+    _incr(STATS_KEY.format(outcome='miss' if cached is None else 'hit'))
+    return cached
+
+
+def set_cached_list(key, data, headers):
+    if settings.SHARED_CACHE:
+        cache.set(key, (data, headers), settings.LIST_CACHE_TIMEOUT)
+
+
+def get_cache_stats():
+    """Return the list cache hit and miss counters"""
+    return {
+        outcome: cache.get(STATS_KEY.format(outcome=outcome), 0)
+        for outcome in ('hit', 'miss')
+    }
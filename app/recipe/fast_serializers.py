@@ -0,0 +1,133 @@
+from collections import defaultdict
+
+from core.metrics import timed
+from core.models import Recipe, RecipeImageVariant
+
+from .serializers import TagSerializer, IngredientSerializer, \
+    RecipeSerializer, RecipeImageVariantSerializer
+
+
+class ValuesListSerializer:
+    """
+    Read only list serializer rendering `values()` rows.
+
+    Produces the same data as `serializer_class` for list responses
+    without building model instances or running DRF field machinery.
+    Keys follow `Meta.fields` so the rendered JSON is byte identical.
+    `columns` maps output fields to the `values()` column read for them
+    and `get_converters` returns functions turning a column into output.
+    """
+    serializer_class = None
+    columns = {}
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def supports(self):
+        """Return whether the request can be answered from values()"""
+        return True
+
+    def get_fields(self):
+        requested = self.context.get('fields')
+        return [name for name in self.serializer_class.Meta.fields
+                if requested is None or name in requested]
+
+    def get_converters(self):
+        return {}
+
+    def get_queryset(self, queryset, ordering):
+        """Return queryset as rows holding the output and ordering columns"""
+        columns = [self.columns.get(name, name) for name in self.get_fields()]
+        columns += [field.lstrip('-') for field in ordering]
+        return queryset.prefetch_related(None) \
+            .values(*dict.fromkeys(['id'] + columns))
+
+    def to_representation(self, rows):
+        with timed('serializer'):
+            return self.render_rows(rows)
+
+    def render_rows(self, rows):
+        converters = self.get_converters()
+        fields = [
+            (name, self.columns.get(name, name), converters.get(name))
+            for name in self.get_fields()
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in fields:
+                value = row[column]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+    def file_url(self, model_field):
+        """Return a converter from a stored file name to its url"""
+        storage = model_field.storage
+        request = self.context.get('request')
+
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            if request is not None:
+                return request.build_absolute_uri(url)
+            return url
+        return convert
+
+
+class TagValuesSerializer(ValuesListSerializer):
+    serializer_class = TagSerializer
+
+
+class IngredientValuesSerializer(ValuesListSerializer):
+    serializer_class = IngredientSerializer
+
+
+class RecipeValuesSerializer(ValuesListSerializer):
+    """
+    Recipe list rows built from the denormalized tag/ingredient id arrays
+
+    Image variants are read with one extra values() query per page.
+    """
+    serializer_class = RecipeSerializer
+    columns = {
+        'tags': 'tag_ids',
+        'ingredients': 'ingredient_ids',
+        'image_variants': 'id',
+    }
+
+    def supports(self):
+        return not self.context.get('expand')
+
+    def get_converters(self):
+        price = RecipeSerializer().fields['price']
+        return {
+            'price': price.to_representation,
+            'image': self.file_url(Recipe._meta.get_field('image')),
+            'tags': list,
+            'ingredients': list,
+            'image_variants': lambda pk: self.variants.get(pk, []),
+        }
+
+    def render_rows(self, rows):
+        self.variants = {}
+        if 'image_variants' in self.get_fields():
+            self.variants = self.get_variants([row['id'] for row in rows])
+        return super().render_rows(rows)
+
+    def get_variants(self, recipe_ids):
+        """Return the rendered image variants of recipes keyed by id"""
+        fields = RecipeImageVariantSerializer.Meta.fields
+        image_url = self.file_url(RecipeImageVariant._meta.get_field('image'))
+        variants = defaultdict(list)
+        rows = RecipeImageVariant.objects.filter(recipe_id__in=recipe_ids) \
+            .order_by(*RecipeImageVariant._meta.ordering) \
+            .values_list('recipe_id', *fields)
+        for recipe_id, *values in rows:
+            variant = dict(zip(fields, values))
+            variant['image'] = image_url(variant['image'])
+            variants[recipe_id].append(variant)
+        return variants
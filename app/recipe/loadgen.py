@@ -0,0 +1,74 @@
+"""
+Minimal asyncio HTTP/1.1 load generator.
+
+Kept free of Django imports so it can run in a spawned process, away
+from the GIL of the servers being measured.
+"""
+import asyncio
+import time
+
+
+async def fetch(host, port, request, client_delay, timeout):
+    """Send one request and return its status code, None on failure"""
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(host, port), timeout
+    )
+    try:
+        if client_delay:
+            # a slow client: the request line first, headers later
+            line, rest = request.split(b'\r\n', 1)
+            writer.write(line + b'\r\n')
+            await writer.drain()
+            await asyncio.sleep(client_delay)
+            request = rest
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status_line = response.split(b'\r\n', 1)[0].split()
+    return int(status_line[1]) if len(status_line) > 1 else None
+
+
+async def worker(deadline, options, latencies, errors, index):
+    paths = options['paths']
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        request = (
+            f'GET {path} HTTP/1.1\r\n'
+            f'Host: {options["host_header"]}\r\n'
+            f'Authorization: Token {options["token"]}\r\n'
+            f'Connection: close\r\n\r\n'
+        ).encode('latin1')
+        start = time.monotonic()
+        try:
+            status = await fetch(options['host'], options['port'], request,
+                                 options['client_delay'], options['timeout'])
+        except (OSError, asyncio.TimeoutError):
+            status = None
+        if status == 200:
+            latencies.append(time.monotonic() - start)
+        else:
+            errors.append(status)
+
+
+def run_load(options):
+    """
+    Keep `concurrency` connections busy for `duration` seconds.
+
+    Returns the sorted latencies of successful requests, the failure
+    count and the elapsed time.
+    """
+    latencies, errors = [], []
+
+    async def main():
+        deadline = time.monotonic() + options['duration']
+        await asyncio.gather(*(
+            worker(deadline, options, latencies, errors, index)
+            for index in range(options['concurrency'])
+        ))
+
+    start = time.monotonic()
+    asyncio.run(main())
+    return sorted(latencies), len(errors), time.monotonic() - start
@@ -0,0 +1,270 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.db.routers import user_shard
+from core.models import Tag, Ingredient
+from recipe.seed import seed_users, seed_user
+
+PASSWORD = 'bench-password'
+
+
+def recipe_payload(state, i):
+    return {'title': f'bench recipe {i}', 'time_minutes': 10,
+            'price': '5.00', 'tags': state['tag_ids'][:2],
+            'ingredients': state['ingredient_ids'][:2]}
+
+
+def head_id(state, i):
+    """Recipes read and updated, disjoint from the deleted ones"""
+    ids = state['recipe_ids']
+    return ids[i % max(len(ids) // 2, 1)]
+
+
+# name, method and a function of (state, request index) returning
+# (url, data); deletes come last and consume recipes from the tail
+ENDPOINTS = (
+    ('user create', 'post', lambda state, i: (
+        reverse('user:create'),
+        {'email': f'{state["prefix"]}-new-{i}@example.com',
+         'password': PASSWORD, 'name': 'bench'})),
+    ('user token', 'post', lambda state, i: (
+        reverse('user:token'),
+        {'email': state['email'], 'password': PASSWORD})),
+    ('user manage', 'get', lambda state, i: (reverse('user:manage'), None)),
+    ('tag list', 'get', lambda state, i: (reverse('recipe:tag-list'), None)),
+    ('tag list assigned', 'get', lambda state, i: (
+        reverse('recipe:tag-list'), {'assigned_only': 1})),
+    ('tag create', 'post', lambda state, i: (
+        reverse('recipe:tag-list'), {'name': f'bench tag {i}'})),
+    ('tag bulk', 'post', lambda state, i: (
+        reverse('recipe:tag-bulk'),
+        [{'name': f'bench bulk tag {i}-{n}'} for n in range(10)])),
+    ('ingredient list', 'get', lambda state, i: (
+        reverse('recipe:ingredient-list'), None)),
+    ('ingredient create', 'post', lambda state, i: (
+        reverse('recipe:ingredient-list'),
+        {'name': f'bench ingredient {i}'})),
+    ('recipe list', 'get', lambda state, i: (
+        reverse('recipe:recipe-list'), None)),
+    ('recipe list ?tags', 'get', lambda state, i: (
+        reverse('recipe:recipe-list'),
+        {'tags': ','.join(map(str, state['tag_ids'][:3]))})),
+    ('recipe list ?search', 'get', lambda state, i: (
+        reverse('recipe:recipe-list'), {'search': f'recipe {i}'})),
+    ('recipe detail', 'get', lambda state, i: (
+        reverse('recipe:recipe-detail', args=[head_id(state, i)]), None)),
+    ('recipe create', 'post', lambda state, i: (
+        reverse('recipe:recipe-list'), recipe_payload(state, i))),
+    ('recipe update', 'patch', lambda state, i: (
+        reverse('recipe:recipe-detail', args=[head_id(state, i)]),
+        {'time_minutes': i % 100 + 1})),
+    ('recipe bulk', 'post', lambda state, i: (
+        reverse('recipe:recipe-bulk'),
+        [recipe_payload(state, i) for _ in range(10)])),
+    ('history list', 'get', lambda state, i: (
+        reverse('recipe:historicalrecipe-list'), None)),
+    ('history detail', 'get', lambda state, i: (
+        reverse('recipe:historicalrecipe-detail',
+                args=[head_id(state, i)]), None)),
+    ('recipe delete', 'delete', lambda state, i: (
+        reverse('recipe:recipe-detail',
+                args=[state['recipe_ids'][-1 - i]]), None)),
+)
+
+
+def percentile(values, percent):
+    """Nearest rank percentile of sorted values"""
+    index = max(int(round(percent / 100 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+class Command(BaseCommand):
+    """Load test the API endpoints in process and compare to a baseline."""
+    help = 'Drive every recipe and user endpoint and report latencies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100,
+                            help='requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='recipes seeded for the benchmark user')
+        parser.add_argument('--endpoints', nargs='+',
+                            help='only run the named endpoints')
+        parser.add_argument('--baseline',
+                            help='JSON results to compare against')
+        parser.add_argument('--save-baseline',
+                            help='write the results as JSON to this file')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='allowed p95 and throughput regression '
+                                 'in percent')
+        parser.add_argument('--query-threshold', type=float, default=0.5,
+                            help='allowed increase of queries per request')
+
+    def handle(self, *args, **options):
+        """Seed a benchmark user, run the endpoints and clean up"""
+        endpoints = ENDPOINTS
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - {e[0] for e in ENDPOINTS}
+            if unknown:
+                raise CommandError(f'Unknown endpoints: {sorted(unknown)}')
+            endpoints = [e for e in ENDPOINTS
+                         if e[0] in options['endpoints']]
+        if options['recipes'] < 2 * options['requests']:
+            raise CommandError('--recipes must be at least twice --requests')
+
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        prefix = f'bench-{uuid.uuid4().hex[:12]}'
+        user, = seed_users([f'{prefix}@example.com'], PASSWORD)
+        shard = user_shard(user)
+        try:
+            state = {
+                'prefix': prefix,
+                'email': user.email,
+                'token': Token.objects.create(user=user).key,
+                'recipe_ids': seed_user(user, options['recipes'], tags=50,
+                                        ingredients=200, per_recipe=5,
+                                        versions=2),
+                'tag_ids': list(Tag.objects.using(shard).filter(user=user)
+                                .values_list('id', flat=True)),
+                'ingredient_ids': list(Ingredient.objects.using(shard)
+                                       .filter(user=user)
+                                       .values_list('id', flat=True)),
+            }
+            results = {}
+            for name, method, build in endpoints:
+                results[name] = self.run(state, method, build, options)
+        finally:
+            get_user_model().objects \
+                .filter(email__startswith=prefix).delete()
+
+        regressions = self.report(results, baseline, options)
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump(results, baseline_file, indent=2, sort_keys=True)
+        if regressions:
+            raise CommandError(
+                'Regressions against the baseline: ' + ', '.join(regressions)
+            )
+
+    def get_client(self, state):
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if '*' not in host), 'localhost')
+        return APIClient(SERVER_NAME=host,
+                         HTTP_AUTHORIZATION=f'Token {state["token"]}')
+
+    def run_requests(self, state, method, build, indices):
+        """Send the requests of indices and return their measurements"""
+        client = self.get_client(state)
+        samples = []
+        try:
+            for i in indices:
+                url, data = build(state, i)
+                kwargs = {} if method == 'get' else {'format': 'json'}
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    try:
+                        response = getattr(client, method)(url, data,
+                                                           **kwargs)
+                        failed = response.status_code >= 400
+                    except Exception:
+                        # the test client re-raises errors of the view
+                        failed = True
+                    elapsed = time.perf_counter() - start
+                samples.append((elapsed, len(queries), failed))
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+        return samples
+
+    def run(self, state, method, build, options):
+        """Run one endpoint with the requested concurrency"""
+        workers = max(options['concurrency'], 1)
+        chunks = [range(n, options['requests'], workers)
+                  for n in range(workers)]
+        start = time.perf_counter()
+        if workers == 1:
+            samples = self.run_requests(state, method, build, chunks[0])
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(self.run_requests, state, method, build,
+                                    chunk)
+                    for chunk in chunks
+                ]
+                samples = [sample for future in futures
+                           for sample in future.result()]
+        wall = time.perf_counter() - start
+
+        latencies = sorted(sample[0] * 1e3 for sample in samples)
+        return {
+            'requests': len(samples),
+            'errors': sum(sample[2] for sample in samples),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'queries': sum(sample[1] for sample in samples) / len(samples),
+            'throughput': len(samples) / wall,
+        }
+
+    def report(self, results, baseline, options):
+        """Print the results table and return the regressed endpoints"""
+        regressions = []
+        self.stdout.write(
+            f'{"endpoint":<22}{"reqs":>6}{"errors":>7}{"p50 ms":>9}'
+            f'{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"req/s":>9}'
+            f'  baseline'
+        )
+        for name, result in results.items():
+            line = (
+                f'{name:<22}{result["requests"]:>6}{result["errors"]:>7}'
+                f'{result["p50"]:>9.2f}{result["p95"]:>9.2f}'
+                f'{result["p99"]:>9.2f}{result["queries"]:>9.1f}'
+                f'{result["throughput"]:>9.1f}'
+            )
+            base = (baseline or {}).get(name)
+            if base is not None:
+                problems = self.compare(result, base, options)
+                if problems:
+                    regressions.append(name)
+                    line += '  REGRESSED ' + ', '.join(problems)
+                else:
+                    line += (f'  p95 {self.change(result, base, "p95"):+.0f}%'
+                             ' ok')
+            self.stdout.write(line)
+        return regressions
+
+    def change(self, result, base, metric):
+        return (result[metric] / base[metric] - 1) * 100 if base[metric] \
+            else 0
+
+    def compare(self, result, base, options):
+        """Return the metrics of result worse than base beyond thresholds"""
+        problems = []
+        threshold = options['threshold']
+        if self.change(result, base, 'p95') > threshold:
+            problems.append(f'p95 {self.change(result, base, "p95"):+.0f}%')
+        if self.change(result, base, 'throughput') < -threshold:
+            problems.append(
+                f'req/s {self.change(result, base, "throughput"):+.0f}%'
+            )
+        if result['queries'] - base['queries'] > options['query_threshold']:
+            problems.append(
+                f'queries {base["queries"]:.1f} -> {result["queries"]:.1f}'
+            )
+        return problems
@@ -0,0 +1,183 @@
+import multiprocessing
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+import uvicorn
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.asgi import ASGIHandler
+from recipe import loadgen
+from recipe.seed import seed_users, seed_user
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    WSGI server with a fixed number of threads, each accepting and
+    handling one connection at a time like sync workers do.
+    """
+    request_queue_size = 4096
+
+    def __init__(self, *args, workers, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.workers = workers
+        self.stopped = threading.Event()
+        self.socket.settimeout(0.5)
+
+    def serve_forever(self):
+        threads = [threading.Thread(target=self.accept_loop)
+                   for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def accept_loop(self):
+        while not self.stopped.is_set():
+            try:
+                request, client_address = self.get_request()
+            except socket.timeout:
+                continue
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def shutdown(self):
+        self.stopped.set()
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    """Compare the read endpoints under pooled WSGI and ASGI serving."""
+    help = 'Benchmark sync WSGI against ASGI throughput on read endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+',
+                            default=[100, 300, 1000],
+                            help='concurrent client connections')
+        parser.add_argument('--duration', type=float, default=10,
+                            help='seconds per measurement')
+        parser.add_argument('--workers', type=int, default=16,
+                            help='worker threads of both servers')
+        parser.add_argument('--client-delay', type=float, default=0.05,
+                            help='seconds a client pauses mid request')
+        parser.add_argument('--recipes', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Seed a user, start both servers and load them in turn"""
+        prefix = f'bench-{uuid.uuid4().hex[:12]}'
+        user, = seed_users([f'{prefix}@example.com'], 'bench-password')
+        try:
+            recipe_ids = seed_user(user, options['recipes'], tags=50,
+                                   ingredients=200, per_recipe=5, versions=2)
+            load = {
+                'host': '127.0.0.1',
+                'host_header': next(
+                    (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+                     if '*' not in host), 'localhost'
+                ),
+                'token': Token.objects.create(user=user).key,
+                'paths': [
+                    reverse('recipe:recipe-list'),
+                    reverse('recipe:recipe-detail', args=[recipe_ids[0]]),
+                    reverse('recipe:tag-list'),
+                    reverse('recipe:ingredient-list'),
+                    reverse('recipe:historicalrecipe-list'),
+                ],
+                'duration': options['duration'],
+                'client_delay': options['client_delay'],
+                'timeout': 30,
+            }
+            self.stdout.write(
+                f'{"server":<8}{"conns":>7}{"ok":>8}{"failed":>8}'
+                f'{"req/s":>9}{"p50 ms":>9}{"p99 ms":>10}'
+            )
+            for name, serve in (('wsgi', self.serve_wsgi),
+                                ('asgi', self.serve_asgi)):
+                load['port'] = free_port()
+                with serve(load['port'], options['workers']):
+                    for concurrency in options['concurrency']:
+                        self.measure(name, dict(load,
+                                                concurrency=concurrency))
+        finally:
+            get_user_model().objects.filter(email__startswith=prefix) \
+                .delete()
+
+    def measure(self, name, load):
+        # the client runs in its own process to keep it off our GIL
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(1) as pool:
+            latencies, failed, elapsed = pool.apply(loadgen.run_load,
+                                                    (load,))
+        p50 = latencies[len(latencies) // 2] * 1e3 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1e3 \
+            if latencies else 0
+        self.stdout.write(
+            f'{name:<8}{load["concurrency"]:>7}{len(latencies):>8}'
+            f'{failed:>8}{len(latencies) / elapsed:>9.1f}'
+            f'{p50:>9.1f}{p99:>10.1f}'
+        )
+
+    def serve_wsgi(self, port, workers):
+        server = PooledWSGIServer(('127.0.0.1', port), QuietRequestHandler,
+                                  workers=workers)
+        server.set_app(WSGIHandler())
+        return ServerThread(server.serve_forever, server.shutdown,
+                            on_exit=server.server_close)
+
+    def serve_asgi(self, port, workers):
+        config = uvicorn.Config(
+            ASGIHandler(ThreadPoolExecutor(max_workers=workers)),
+            host='127.0.0.1', port=port, lifespan='off',
+            log_level='warning', backlog=4096, access_log=False,
+        )
+        server = uvicorn.Server(config)
+
+        def stop():
+            server.should_exit = True
+        return ServerThread(server.run, stop,
+                            ready=lambda: server.started)
+
+
+class ServerThread:
+    """Run a server in a daemon thread for the duration of a with block"""
+
+    def __init__(self, run, stop, ready=None, on_exit=None):
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.stop = stop
+        self.ready = ready
+        self.on_exit = on_exit
+
+    def __enter__(self):
+        self.thread.start()
+        while self.ready is not None and not self.ready():
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        self.thread.join()
+        if self.on_exit is not None:
+            self.on_exit()
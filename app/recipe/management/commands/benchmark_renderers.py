@@ -0,0 +1,80 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.middleware import compress
+from core.models import Recipe
+from core.renderers import ORJSONRenderer, MessagePackRenderer
+from recipe.seed import seed_user
+from recipe.serializers import RecipeDetailSerializer
+
+RENDERERS = (
+    ('json', JSONRenderer),
+    ('orjson', ORJSONRenderer),
+    ('msgpack', MessagePackRenderer),
+)
+
+
+class Command(BaseCommand):
+    """Compare encode time and size of the API renderers."""
+    help = 'Time the renderers and encodings on recipe detail lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+',
+                            default=[100, 1000])
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='runs per measurement, the best is kept')
+
+    def handle(self, *args, **options):
+        """Seed rows in a rolled back transaction and time each renderer"""
+        sizes = sorted(options['rows'])
+        with transaction.atomic():
+            # kept on the default database, which the transaction rolls back
+            user = get_user_model().objects.create_user(
+                email=f'benchmark-{uuid.uuid4().hex}@example.com',
+                shard=DEFAULT_DB_ALIAS
+            )
+            self.stdout.write(f'Seeding {sizes[-1]} recipes...')
+            seed_user(user, sizes[-1], tags=50, ingredients=500,
+                      per_recipe=5)
+            queryset = Recipe.objects.filter(user=user).order_by('-id') \
+                .prefetch_related('tags', 'ingredients', 'image_variants')
+
+            self.stdout.write(
+                f'{"rows":>8}  {"renderer":<10}{"encoding":<10}'
+                f'{"ms":>10}{"bytes":>12}'
+            )
+            for size in sizes:
+                data = RecipeDetailSerializer(queryset[:size], many=True).data
+                for name, renderer_class in RENDERERS:
+                    renderer = renderer_class()
+                    elapsed, body = self.measure(
+                        renderer.render, data, repeat=options['repeat']
+                    )
+                    self.report(size, name, 'identity', elapsed, body)
+                    for coding in ('gzip', 'br'):
+                        elapsed, encoded = self.measure(
+                            compress, body, coding, repeat=options['repeat']
+                        )
+                        self.report(size, name, coding, elapsed, encoded)
+            transaction.set_rollback(True)
+
+    def measure(self, func, *args, repeat):
+        """Return the best time of repeat calls and the result"""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(*args)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def report(self, size, renderer, coding, elapsed, body):
+        self.stdout.write(
+            f'{size:>8}  {renderer:<10}{coding:<10}'
+            f'{elapsed * 1e3:>10.2f}{len(body):>12}'
+        )
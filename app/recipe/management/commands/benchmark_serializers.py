@@ -0,0 +1,75 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Prefetch
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.fast_serializers import RecipeValuesSerializer
+from recipe.seed import seed_user
+from recipe.serializers import RecipeSerializer
+
+
+class Command(BaseCommand):
+    """Compare the per row cost of the recipe list serializers."""
+    help = 'Time RecipeSerializer against RecipeValuesSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+',
+                            default=[1000, 10000, 100000])
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='runs per measurement, the best is kept')
+
+    def handle(self, *args, **options):
+        """Seed rows in a rolled back transaction and time both paths"""
+        sizes = sorted(options['rows'])
+        with transaction.atomic():
+            # kept on the default database, which the transaction rolls back
+            user = get_user_model().objects.create_user(
+                email=f'benchmark-{uuid.uuid4().hex}@example.com',
+                shard=DEFAULT_DB_ALIAS
+            )
+            self.stdout.write(f'Seeding {sizes[-1]} recipes...')
+            seed_user(user, sizes[-1], tags=50, ingredients=500,
+                      per_recipe=5)
+
+            self.stdout.write(
+                f'{"rows":>8}  {"serializer":<16}{"total ms":>10}'
+                f'{"us/row":>10}'
+            )
+            for size in sizes:
+                for name, run in (('ModelSerializer', self.model_path),
+                                  ('values()', self.values_path)):
+                    elapsed = min(self.measure(run, user, size)
+                                  for _ in range(options['repeat']))
+                    self.stdout.write(
+                        f'{size:>8}  {name:<16}{elapsed * 1e3:>10.1f}'
+                        f'{elapsed / size * 1e6:>10.2f}'
+                    )
+            transaction.set_rollback(True)
+
+    def measure(self, run, user, size):
+        start = time.perf_counter()
+        run(user, size)
+        return time.perf_counter() - start
+
+    def model_path(self, user, size):
+        """Fetch and serialize like the regular recipe list"""
+        queryset = Recipe.objects.filter(user=user).order_by('-id') \
+            .prefetch_related(
+                Prefetch('tags',
+                         queryset=Tag.objects.only('id').order_by('id')),
+                Prefetch('ingredients',
+                         queryset=Ingredient.objects.only('id')
+                         .order_by('id')),
+                'image_variants',
+            )
+        return RecipeSerializer(queryset[:size], many=True).data
+
+    def values_path(self, user, size):
+        serializer = RecipeValuesSerializer()
+        rows = serializer.get_queryset(Recipe.objects.filter(user=user),
+                                       ('-id',)).order_by('-id')
+        return serializer.to_representation(list(rows[:size]))
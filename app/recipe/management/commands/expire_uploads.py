@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from core.models import RecipeImageUpload
+from recipe.uploads import discard
+
+
+class Command(BaseCommand):
+    """Django command to delete abandoned chunked image uploads."""
+    help = ('Delete unfinished image uploads older than '
+            'UPLOAD_EXPIRY_HOURS and their partial files')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float,
+                            default=settings.UPLOAD_EXPIRY_HOURS)
+
+    def handle(self, *args, **options):
+        """handles every shard, the uploads live with their recipes"""
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        count = 0
+        for alias in settings.SHARD_DATABASES:
+            expired = RecipeImageUpload.objects.using(alias) \
+                .filter(created_at__lt=cutoff)
+            for upload in expired.iterator():
+                discard(upload)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {count} expired uploads'
+        ))
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+
+from core.db.routers import user_shard, using_shard
+from core.models import Tag, Recipe
+from recipe.pagination import KeysetPagination
+from recipe.seed import seed_user
+from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet
+
+
+class Command(BaseCommand):
+    """Seed a dataset and print the query plan of each list endpoint."""
+    help = 'Seed a user and print EXPLAIN (ANALYZE) of endpoint queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', default='explain@example.com')
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--per-recipe', type=int, default=5,
+                            help='tags and ingredients linked per recipe')
+        parser.add_argument('--no-seed', action='store_true',
+                            help='explain against the existing data')
+
+    def handle(self, *args, **options):
+        """handles seeding and printing query plans"""
+        user, created = get_user_model().objects.get_or_create(
+            email=options['email']
+        )
+        if created or not options['no_seed']:
+            self.seed(user, options)
+        with using_shard(user_shard(user)):
+            self.explain_endpoints(user)
+
+    def explain_endpoints(self, user):
+        """Print the plans of the list and detail queries of user"""
+        tag_ids = ','.join(
+            str(pk) for pk in Tag.objects.filter(user=user)
+            .values_list('id', flat=True)[:3]
+        )
+        recipe = Recipe.objects.filter(user=user).first()
+        endpoints = [
+            ('recipe list', RecipeViewSet, 'list', {}),
+            ('recipe list ?tags', RecipeViewSet, 'list', {'tags': tag_ids}),
+            ('recipe list ?search', RecipeViewSet, 'list',
+             {'search': 'recipe tag'}),
+            ('tag list', TagViewSet, 'list', {}),
+            ('tag list ?assigned_only', TagViewSet, 'list',
+             {'assigned_only': 1}),
+            ('ingredient list', IngredientViewSet, 'list', {}),
+            ('ingredient list ?assigned_only', IngredientViewSet, 'list',
+             {'assigned_only': 1}),
+        ]
+
+        for name, viewset, action, params in endpoints:
+            view = self.get_view(viewset, user, action, params)
+            ordering = KeysetPagination().get_ordering(view)
+            queryset = view.get_queryset().order_by(*ordering)
+            self.explain(name, queryset[:api_settings.PAGE_SIZE])
+        if recipe is not None:
+            view = self.get_view(RecipeViewSet, user, 'retrieve', {})
+            self.explain('recipe detail',
+                         view.get_queryset().filter(pk=recipe.pk))
+
+    def get_view(self, viewset, user, action, params):
+        """Return a viewset instance bound to a fake request of user"""
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = user
+        return viewset(request=request, action=action,
+                       format_kwarg=None, kwargs={})
+
+    def explain(self, name, queryset):
+        if connection.vendor == 'postgresql':
+            plan = queryset.explain(analyze=True, buffers=True)
+        else:
+            plan = queryset.explain()
+        self.stdout.write(self.style.SUCCESS(f'== {name}'))
+        self.stdout.write(plan)
+        self.stdout.write('')
+
+    def seed(self, user, options):
+        self.stdout.write(f'Seeding {options["recipes"]} recipes...')
+        seed_user(user, options['recipes'], options['tags'],
+                  options['ingredients'], options['per_recipe'])
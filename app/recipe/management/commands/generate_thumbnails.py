@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from core.models import Recipe
+from recipe.thumbnails import generate_variants
+
+
+class Command(BaseCommand):
+    """Django command to generate missing recipe image variants."""
+    help = 'Generate resized variants of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='regenerate existing variants too')
+
+    def handle(self, *args, **options):
+        """handles generating variants one recipe at a time"""
+        count = 0
+        for alias in settings.SHARD_DATABASES:
+            recipes = Recipe.objects.using(alias) \
+                .exclude(image='').exclude(image=None)
+            if not options['all']:
+                recipes = recipes.filter(image_variants=None)
+
+            for recipe_id in recipes.values_list('id', flat=True).iterator():
+                generate_variants(recipe_id, alias)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {count} recipes'
+        ))
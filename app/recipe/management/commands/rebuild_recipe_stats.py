@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from core.db.routers import user_shard
+from core.models import Recipe, RecipeStat
+from recipe.stats import rebuild
+
+
+class Command(BaseCommand):
+    """Django command to recompute the recipe stats from the recipes."""
+    help = 'Rebuild the recipe stats of every user, or of the given ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('emails', nargs='*')
+
+    def handle(self, *args, **options):
+        """handles rebuilding one user at a time in its own transaction"""
+        if options['emails']:
+            users = get_user_model().objects \
+                .filter(email__in=options['emails'])
+            if len(users) != len(set(options['emails'])):
+                raise CommandError('Unknown users in '
+                                   f'{", ".join(options["emails"])}')
+            targets = [(user_shard(user), [user.pk]) for user in users]
+        else:
+            targets = [
+                (alias, self.user_ids(alias))
+                for alias in settings.SHARD_DATABASES
+            ]
+
+        count = 0
+        for alias, user_ids in targets:
+            for user_id in user_ids:
+                with transaction.atomic(using=alias):
+                    rebuild(user_id, alias)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the recipe stats of {count} users'
+        ))
+
+    def user_ids(self, alias):
+        """Ids of the users with recipes or stats on alias"""
+        return sorted(
+            set(Recipe.objects.using(alias)
+                .values_list('user_id', flat=True).distinct()) |
+            set(RecipeStat.objects.using(alias)
+                .values_list('user_id', flat=True).distinct())
+        )
@@ -0,0 +1,53 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+
+from recipe.seed import seed_users, seed_user
+
+
+class Command(BaseCommand):
+    """Bulk generate users with tags, ingredients, recipes and history."""
+    help = 'Seed synthetic users and their recipe data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='recipes per user')
+        parser.add_argument('--tags', type=int, default=50,
+                            help='tags per user')
+        parser.add_argument('--ingredients', type=int, default=200,
+                            help='ingredients per user')
+        parser.add_argument('--per-recipe', type=int, default=5,
+                            help='tags and ingredients linked per recipe')
+        parser.add_argument('--versions', type=int, default=1,
+                            help='history rows per recipe')
+        parser.add_argument('--prefix', default='seed',
+                            help='users are named <prefix>-<n>@example.com')
+        parser.add_argument('--password', default='password')
+
+    def handle(self, *args, **options):
+        """handles creating the users and seeding each of them"""
+        emails = [f'{options["prefix"]}-{i}@example.com'
+                  for i in range(options['users'])]
+        if get_user_model().objects.filter(email__in=emails).exists():
+            raise CommandError(
+                f'Users with prefix "{options["prefix"]}" already exist'
+            )
+
+        start = time.perf_counter()
+        users = seed_users(emails, options['password'])
+        for user in users:
+            seed_user(user, options['recipes'], options['tags'],
+                      options['ingredients'], options['per_recipe'],
+                      versions=options['versions'])
+            self.stdout.write(f'Seeded {user.email}')
+
+        count = len(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {count} users, {count * options["recipes"]} recipes, '
+            f'{count * options["tags"]} tags, '
+            f'{count * options["ingredients"]} ingredients and '
+            f'{count * options["recipes"] * options["versions"]} history '
+            f'rows in {time.perf_counter() - start:.1f}s'
+        ))
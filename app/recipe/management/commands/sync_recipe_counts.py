@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from core.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """Django command to recount the recipes of tags and ingredients."""
+    help = 'Repair recipe_count of every tag and ingredient on every shard'
+
+    def handle(self, *args, **options):
+        """handles recounting in id batches, one transaction per batch"""
+        batch_size = settings.BULK_BATCH_SIZE
+        for model in (Tag, Ingredient):
+            count = 0
+            for alias in settings.SHARD_DATABASES:
+                manager = model.objects.db_manager(alias)
+                pks = list(manager.order_by('pk')
+                           .values_list('pk', flat=True))
+                for start in range(0, len(pks), batch_size):
+                    with transaction.atomic(using=alias):
+                        count += manager.sync_recipe_counts(
+                            pks[start:start + batch_size]
+                        )
+            self.stdout.write(self.style.SUCCESS(
+                f'Recounted {count} {model._meta.verbose_name_plural}'
+            ))
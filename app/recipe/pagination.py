@@ -0,0 +1,187 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    """Encode datetimes with full precision so seeks stay exact"""
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not a cursor value')
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the view ordering.
+
+    Each page is fetched with a `WHERE (ordering) > (last row)` filter
+    instead of an OFFSET, so the cost of a page does not depend on how
+    deep into the result set it is. The ordering must end with a unique
+    field. Cursors are returned in the `Link` header so the response body
+    keeps its plain list shape.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    ordering = ('-pk',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(view)
+        page_size = self.get_page_size(request)
+
+        values, reverse = self.decode_cursor(request, queryset)
+        queryset = queryset.order_by(*self._ordering_for(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, reverse))
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_values = self.previous_values = None
+        if results:
+            first, last = results[0], results[-1]
+            if has_more or reverse:
+                self.next_values = self._row_values(last)
+            if values is not None and (has_more or not reverse):
+                self.previous_values = self._row_values(first)
+        return results
+
+    def get_paginated_response(self, data):
+        links = []
+        next_link = self.get_next_link()
+        previous_link = self.get_previous_link()
+        if next_link:
+            links.append(f'<{next_link}>; rel="next"')
+        if previous_link:
+            links.append(f'<{previous_link}>; rel="previous"')
+
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(data, headers=headers)
+
+    def get_next_link(self):
+        if self.next_values is None:
+            return None
+        return self.encode_cursor(self.next_values, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_values is None:
+            return None
+        return self.encode_cursor(self.previous_values, reverse=True)
+
+    def get_ordering(self, view):
+        """Return the keyset ordering declared on the view"""
+        if hasattr(view, 'get_ordering'):
+            ordering = view.get_ordering()
+        else:
+            ordering = getattr(view, 'ordering', None)
+        return tuple(ordering or self.ordering)
+
+    def get_page_size(self, request):
+        """Return the requested page size capped at `MAX_PAGE_SIZE`"""
+        default = api_settings.PAGE_SIZE
+        try:
+            page_size = int(
+                request.query_params[self.page_size_query_param]
+            )
+        except (KeyError, ValueError):
+            return default
+        if page_size <= 0:
+            return default
+        return min(page_size, settings.MAX_PAGE_SIZE)
+
+    def decode_cursor(self, request, queryset):
+        """
+        Return the seek values and direction from the request cursor,
+        converted to the types of the ordering fields of queryset
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+
+        try:
+            decoded = json.loads(
+                force_str(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            )
+            values, reverse = decoded['v'], bool(decoded['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or \
+                len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            values = [
+                self._ordering_field(queryset, name).to_python(value)
+                for (name, _), value in zip(self._fields(), values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def encode_cursor(self, values, reverse):
+        """Return the url for the page after/before `values`"""
+        payload = json.dumps({'v': values, 'r': int(reverse)},
+                             separators=(',', ':'), default=_encode_value)
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8'))
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param,
+                                   encoded.decode('ascii'))
+
+    def _ordering_field(self, queryset, name):
+        """Return the model field or annotation ordering by name"""
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        opts = queryset.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _fields(self):
+        return [(field.lstrip('-'), field.startswith('-'))
+                for field in self.ordering]
+
+    def _ordering_for(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(field[1:] if field.startswith('-') else '-' + field
+                     for field in self.ordering)
+
+    def _seek_filter(self, values, reverse):
+        """
+        Build `(f1, f2, ...) > (v1, v2, ...)` honouring per-field direction
+        """
+        seek = Q()
+        equal = Q()
+        for (name, descending), value in zip(self._fields(), values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            seek |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return seek
+
+    def _row_values(self, instance):
+        if isinstance(instance, dict):
+            # values() rows
+            return [instance[name] for name, _ in self._fields()]
+        return [getattr(instance, name) for name, _ in self._fields()]
+
+    def get_results(self, data):
+        return data
+
+    def get_schema_fields(self, view):
+        return []
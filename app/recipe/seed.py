@@ -0,0 +1,111 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.db.routers import pick_shard, user_shard, using_shard
+from core.models import Tag, Ingredient, Recipe
+
+from . import stats
+from .cache import bump_list_version, bump_versions
+
+
+def seed_users(emails, password):
+    """Bulk create users sharing one password hash and return them"""
+    password = make_password(password)
+    User = get_user_model()
+    # bulk_create skips save(), which places new users on a shard
+    User.objects.bulk_create(
+        (User(email=email, password=password, shard=pick_shard(email))
+         for email in emails),
+        batch_size=settings.BULK_BATCH_SIZE
+    )
+    return list(User.objects.filter(email__in=emails).order_by('id'))
+
+
+def seed_user(user, recipes, tags, ingredients, per_recipe, versions=0):
+    """
+    Bulk create tags, ingredients and linked recipes for user on the
+    user's shard.
+
+    Each recipe gets `versions` history rows: its creation followed by
+    updates a minute apart. Returns the ids of the new recipes.
+    """
+    alias = user_shard(user)
+    with using_shard(alias), transaction.atomic(using=alias):
+        return _seed_user(user, recipes, tags, ingredients, per_recipe,
+                          versions)
+
+
+def _seed_user(user, recipes, tags, ingredients, per_recipe, versions):
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'tag {i}') for i in range(tags)
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'ingredient {i}')
+        for i in range(ingredients)
+    )
+    last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id']
+    Recipe.objects.bulk_create(
+        (Recipe(user=user, title=f'recipe {i}',
+                time_minutes=random.randint(5, 180),
+                price=random.randint(100, 99999) / 100)
+         for i in range(recipes)),
+        batch_size=settings.BULK_BATCH_SIZE
+    )
+    recipe_ids = list(
+        Recipe.objects.filter(user=user, id__gt=last_id or 0)
+        .values_list('id', flat=True)
+    )
+    tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+    ingredient_ids = list(
+        Ingredient.objects.filter(user=user).values_list('id', flat=True)
+    )
+
+    TagLink = Recipe.tags.through
+    IngredientLink = Recipe.ingredients.through
+    tag_links, ingredient_links = [], []
+    for recipe_id in recipe_ids:
+        for tag_id in random.sample(tag_ids, min(per_recipe, len(tag_ids))):
+            tag_links.append(TagLink(recipe_id=recipe_id, tag_id=tag_id))
+        for ingredient_id in random.sample(
+                ingredient_ids, min(per_recipe, len(ingredient_ids))):
+            ingredient_links.append(
+                IngredientLink(recipe_id=recipe_id,
+                               ingredient_id=ingredient_id)
+            )
+    batch_size = settings.BULK_BATCH_SIZE
+    TagLink.objects.bulk_create(tag_links, batch_size=batch_size)
+    IngredientLink.objects.bulk_create(ingredient_links, batch_size=batch_size)
+    Tag.objects.sync_recipe_counts(tag_ids)
+    Ingredient.objects.sync_recipe_counts(ingredient_ids)
+
+    # bulk_create sends no signals, so sync and invalidate by hand
+    Recipe.objects.sync_related_ids(recipe_ids)
+    Recipe.objects.sync_search_vectors(recipe_ids)
+    stats.apply({}, stats.recipe_contributions(recipe_ids))
+    bump_versions(Recipe, user.id, ())
+    bump_list_version(Tag, user.id)
+    bump_list_version(Ingredient, user.id)
+    if versions:
+        seed_history(user, recipe_ids, versions)
+    return recipe_ids
+
+
+def seed_history(user, recipe_ids, versions):
+    """Bulk create `versions` history rows for each recipe"""
+    recipes = list(Recipe.objects.filter(id__in=recipe_ids))
+    start = timezone.now() - timedelta(minutes=versions)
+    for version in range(versions):
+        history_date = start + timedelta(minutes=version)
+        for recipe in recipes:
+            recipe._history_date = history_date
+        Recipe.history.bulk_history_create(
+            recipes, batch_size=settings.BULK_BATCH_SIZE,
+            update=version > 0, default_user=user
+        )
@@ -1 +1 @@
-from rest_framework import serializersfrom core.models import Tag, Ingredient, Recipefrom simple_history.models import HistoricalRecordsclass TagSerializer(serializers.ModelSerializer):    class Meta:        model = Tag        fields = ('name', 'id')        read_only_fields = ('id',)class IngredientSerializer(serializers.ModelSerializer):    class Meta:        model = Ingredient        fields = ('name', 'id')        read_only_fields = ('id',)class RecipeHistorySerializer(serializers.ModelSerializer):    class Meta:        model = Recipe.history.model        queryset = Recipe.history.all()        fields = '__all__'class RecipeSerializer(serializers.ModelSerializer):    ingredients = serializers.PrimaryKeyRelatedField(        many=True,        queryset=Ingredient.objects.all()    )    tags = serializers.PrimaryKeyRelatedField(        many=True,        queryset=Tag.objects.all()    )    class Meta:        model = Recipe        fields = [            'id',            'title',            'ingredients',            'tags',            'time_minutes',            'price',            'image',            'link']        read_only_fields = ('id',)class RecipeDetailSerializer(RecipeSerializer):    """Serialize Recipe Details"""    tags = TagSerializer(many=True, read_only=True)    ingredients = IngredientSerializer(many=True, read_only=True)class RecipeImageSerializer(serializers.ModelSerializer):    """Serialize to upload Recipe Images"""    class Meta:        model = Recipe        fields = ('id', 'image')        read_only = ('id',)
\ No newline at end of file
+from rest_framework import serializersfrom django.conf import settingsfrom core.metrics import TimedSerializerMixinfrom core.models import Tag, Ingredient, Recipe, RecipeImageVariant, \    RecipeImageUploadfrom simple_history.models import HistoricalRecordsclass TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):    class Meta:        model = Tag        fields = ('name', 'id', 'recipe_count')        read_only_fields = ('id', 'recipe_count')class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):    class Meta:        model = Ingredient        fields = ('name', 'id', 'recipe_count')        read_only_fields = ('id', 'recipe_count')class RecipeHistorySerializer(TimedSerializerMixin,                              serializers.ModelSerializer):    class Meta:        model = Recipe.history.model        queryset = Recipe.history.all()        fields = '__all__'class RecipeImageVariantSerializer(TimedSerializerMixin,                                   serializers.ModelSerializer):    """Serialize resized recipe images"""    class Meta:        model = RecipeImageVariant        fields = ('width', 'format', 'image')        read_only_fields = fieldsclass DynamicFieldsMixin:    """    Render only the `fields` passed in the context and nest the relations    named in `expand` with their `expandable_fields` serializer.    """    expandable_fields = {}    def __init__(self, *args, **kwargs):        super().__init__(*args, **kwargs)        fields = self.context.get('fields')        if fields is not None:            for name in set(self.fields) - set(fields):                self.fields.pop(name)        for name in self.context.get('expand', ()):            if name in self.fields:                self.fields[name] = self.expandable_fields[name](                    many=True, read_only=True                )class RecipeSerializer(TimedSerializerMixin, DynamicFieldsMixin,                       serializers.ModelSerializer):    ingredients = serializers.PrimaryKeyRelatedField(        many=True,        queryset=Ingredient.objects.all()    )    tags = serializers.PrimaryKeyRelatedField(        many=True,        queryset=Tag.objects.all()    )    image_variants = RecipeImageVariantSerializer(many=True, read_only=True)    expandable_fields = {        'tags': TagSerializer,        'ingredients': IngredientSerializer,    }    class Meta:        model = Recipe        fields = [            'id',            'title',            'ingredients',            'tags',            'time_minutes',            'price',            'image',            'image_variants',            'link']        read_only_fields = ('id',)class RecipeDetailSerializer(RecipeSerializer):    """Serialize Recipe Details"""    tags = TagSerializer(many=True, read_only=True)    ingredients = IngredientSerializer(many=True, read_only=True)class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):    """Serialize to upload Recipe Images"""    class Meta:        model = Recipe        fields = ('id', 'image')        read_only = ('id',)class RecipeImageUploadSerializer(TimedSerializerMixin,                                  serializers.ModelSerializer):    """Serialize resumable recipe image uploads"""    class Meta:        model = RecipeImageUpload        fields = ('id', 'size', 'offset')        read_only_fields = ('id', 'offset')    def validate_size(self, value):        """Reject uploads larger than MAX_IMAGE_UPLOAD_SIZE up front"""        if not 0 < value <= settings.MAX_IMAGE_UPLOAD_SIZE:            raise serializers.ValidationError(                f'Size must be between 1 and '                f'{settings.MAX_IMAGE_UPLOAD_SIZE} bytes.'            )        return valueclass BulkItemSerializerMixin:    """    Validate one item of a bulk write without per-item queries.    The ids the user owns are looked up once for the whole batch and    passed in the context: `ids` for the model itself and one set per    related field. Updates (partial) must carry the id of the object.    """    def validate(self, attrs):        if self.partial:            if 'id' not in attrs:                raise serializers.ValidationError(                    {'id': ['This field is required.']}                )            if attrs['id'] not in self.context['ids']:                raise serializers.ValidationError({'id': ['Not found.']})        else:            attrs.pop('id', None)        return super().validate(attrs)    def validate_owned(self, field_name, value):        unknown = set(value) - self.context[field_name]        if unknown:            raise serializers.ValidationError(                f'Invalid pk "{min(unknown)}" - object does not exist.'            )        return list(dict.fromkeys(value))class BulkTagSerializer(BulkItemSerializerMixin, TagSerializer):    id = serializers.IntegerField(required=False)class BulkIngredientSerializer(BulkItemSerializerMixin, IngredientSerializer):    id = serializers.IntegerField(required=False)class BulkRecipeSerializer(BulkItemSerializerMixin, RecipeSerializer):    """Serialize one recipe of a bulk create or update"""    id = serializers.IntegerField(required=False)    ingredients = serializers.ListField(child=serializers.IntegerField())    tags = serializers.ListField(child=serializers.IntegerField())    class Meta(RecipeSerializer.Meta):        fields = ['id', 'title', 'ingredients', 'tags', 'time_minutes',                  'price', 'link']        read_only_fields = ()    def validate_ingredients(self, value):        return self.validate_owned('ingredients', value)    def validate_tags(self, value):        return self.validate_owned('tags', value)
\ No newline at end of file
@@ -0,0 +1,238 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, \
+    pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from core.db.routers import user_shard
+from core.db.shards import delete_user_rows
+from core.models import Tag, Ingredient, Recipe, RecipeImageVariant, \
+    RecipeStat, User
+
+from . import stats
+from .cache import bump_list_version, bump_versions
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_attr_list(sender, instance, **kwargs):
+    """Invalidate cached lists when a tag or ingredient changes"""
+    bump_list_version(sender, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_assigned_list(sender, instance, action, reverse, model,
+                             **kwargs):
+    """Invalidate cached lists when recipe assignments change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_list_version(type(instance) if reverse else model,
+                          instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    bump_versions(Recipe, instance.user_id, [instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe_lists(sender, instance, **kwargs):
+    """Deleting a recipe drops its assignments without m2m_changed"""
+    bump_versions(Recipe, instance.user_id, [instance.pk])
+    bump_list_version(Tag, instance.user_id)
+    bump_list_version(Ingredient, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def sync_recipe_related_ids(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    """Keep Recipe.tag_ids/ingredient_ids in step with the M2M tables"""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    else:
+        recipe_ids = pk_set
+    recipes = Recipe.objects.db_manager(instance._state.db)
+    recipes.sync_related_ids(recipe_ids)
+    recipes.sync_search_vectors(recipe_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_assigned_recipes(sender, instance, **kwargs):
+    """Cascading through rows are deleted without m2m_changed"""
+    instance._assigned_recipe_ids = list(
+        instance.recipe_set.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def sync_unassigned_recipes(sender, instance, **kwargs):
+    recipe_ids = instance.__dict__.pop('_assigned_recipe_ids', [])
+    if recipe_ids:
+        recipes = Recipe.objects.db_manager(instance._state.db)
+        recipes.sync_related_ids(recipe_ids)
+        recipes.sync_search_vectors(recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def sync_renamed_search_vectors(sender, instance, created, **kwargs):
+    """Renaming a tag or ingredient changes the text of its recipes"""
+    if not created:
+        Recipe.objects.db_manager(instance._state.db).sync_search_vectors(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def sync_recipe_search_vector(sender, instance, **kwargs):
+    Recipe.objects.db_manager(instance._state.db) \
+        .sync_search_vectors([instance.pk])
+
+
+@receiver(post_delete, sender=RecipeImageVariant)
+def delete_variant_file(sender, instance, using, **kwargs):
+    """Remove the file of a deleted variant once the delete commits"""
+    storage, name = instance.image.storage, instance.image.name
+    if name:
+        transaction.on_commit(lambda: storage.delete(name), using=using)
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_rows(sender, instance, using, **kwargs):
+    """The cascade only reaches rows on the database of the user"""
+    shard = user_shard(instance)
+    if shard != using:
+        delete_user_rows(instance.pk, shard)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_assigned_recipes(sender, instance, action, reverse, model, pk_set,
+                           using, **kwargs):
+    """Keep Tag/Ingredient.recipe_count in step with the M2M tables"""
+    attr_model = type(instance) if reverse else model
+    column = f'{attr_model._meta.model_name}_id'
+    if action in ('pre_remove', 'pre_clear'):
+        # pk_set of a removal may name rows that were never assigned.
+        # The links are locked until the delete commits, so a concurrent
+        # removal waits and then only counts the links still there.
+        links = sender.objects.using(using).select_for_update()
+        if reverse:
+            links = links.filter(**{column: instance.pk})
+            if pk_set is not None:
+                links = links.filter(recipe_id__in=pk_set)
+            instance._count_deltas = {
+                instance.pk: -len(links.values_list('pk', flat=True))
+            }
+        else:
+            links = links.filter(recipe_id=instance.pk)
+            if pk_set is not None:
+                links = links.filter(**{f'{column}__in': pk_set})
+            instance._count_deltas = {
+                pk: -1 for pk in links.values_list(column, flat=True)
+            }
+    elif action in ('post_remove', 'post_clear'):
+        attr_model.objects.db_manager(using).adjust_recipe_counts(
+            instance.__dict__.pop('_count_deltas', {})
+        )
+    elif action == 'post_add':
+        # pk_set only holds the newly assigned rows here
+        deltas = {instance.pk: len(pk_set)} if reverse else \
+            {pk: 1 for pk in pk_set}
+        attr_model.objects.db_manager(using).adjust_recipe_counts(deltas)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_recipe_assignments(sender, instance, using, **kwargs):
+    """Cascading through rows are deleted without m2m_changed"""
+    instance._assigned = {
+        model: list(getattr(Recipe, field).through.objects.using(using)
+                    .select_for_update().filter(recipe_id=instance.pk)
+                    .values_list(f'{model._meta.model_name}_id', flat=True))
+        for field, model in (('tags', Tag), ('ingredients', Ingredient))
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, using, **kwargs):
+    for model, pks in instance.__dict__.pop('_assigned', {}).items():
+        model.objects.db_manager(using) \
+            .adjust_recipe_counts({pk: -1 for pk in pks})
+
+
+# The stats receivers are connected after the ones above so that the
+# tag_ids/ingredient_ids arrays they read are synced by then.
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_stats(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._stats_before = stats.recipe_contributions(
+            [instance.pk], instance._state.db
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_stats(sender, instance, **kwargs):
+    """Apply the change of time and price, or count a new recipe"""
+    stats.apply(instance.__dict__.pop('_stats_before', {}),
+                stats.recipe_contributions([instance.pk], instance._state.db),
+                instance._state.db)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_deleted_recipe_stats(sender, instance, using, **kwargs):
+    instance._stats_before = stats.recipe_contributions([instance.pk], using)
+
+
+@receiver(post_delete, sender=Recipe)
+def update_deleted_recipe_stats(sender, instance, using, **kwargs):
+    stats.apply(instance.__dict__.pop('_stats_before', {}), {}, using)
+
+
+def assigned_recipe_ids(instance, reverse, pk_set):
+    """Return the ids of the recipes an M2M change is about"""
+    if not reverse:
+        return [instance.pk]
+    if pk_set is None:
+        return list(instance.recipe_set.values_list('id', flat=True))
+    return pk_set
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_assigned_stats(sender, instance, action, reverse, pk_set,
+                          using, **kwargs):
+    """Move the recipes of an M2M change between tag/ingredient totals"""
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        recipe_ids = assigned_recipe_ids(instance, reverse, pk_set)
+        instance._stats_before = (
+            recipe_ids, stats.recipe_contributions(recipe_ids, using)
+        )
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        recipe_ids, before = instance.__dict__.pop('_stats_before',
+                                                   ([], {}))
+        stats.apply(before, stats.recipe_contributions(recipe_ids, using),
+                    using)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def delete_attr_stats(sender, instance, using, **kwargs):
+    """The recipes of a deleted tag or ingredient no longer count for it"""
+    kind = RecipeStat.TAG if sender is Tag else RecipeStat.INGREDIENT
+    RecipeStat.objects.using(using) \
+        .filter(user_id=instance.user_id, kind=kind, key=instance.pk) \
+        .delete()
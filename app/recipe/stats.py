@@ -0,0 +1,120 @@
+"""
+Per user recipe statistics kept in core.models.RecipeStat.
+
+Every write takes the contributions of the recipes it touches before
+and after, and adds the difference to the running totals, so reading
+the stats of a user costs one row per tag, ingredient and price range
+however many recipes they have.
+"""
+import bisect
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+
+from core.models import Tag, Ingredient, Recipe, RecipeStat
+
+
+def price_bucket(price):
+    """Return the index of the price range price falls in"""
+    return bisect.bisect_right(settings.RECIPE_STATS_PRICE_BUCKETS, price)
+
+
+def contributions(recipes):
+    """
+    Return what a queryset of recipes adds to the stats as
+    {(user_id, kind, key): [recipes, minutes, price]}
+    """
+    totals = defaultdict(lambda: [0, 0, Decimal(0)])
+    rows = recipes.values_list('user_id', 'time_minutes', 'price',
+                               'tag_ids', 'ingredient_ids')
+    for user_id, minutes, price, tag_ids, ingredient_ids in rows.iterator():
+        keys = [(RecipeStat.TOTAL, 0),
+                (RecipeStat.PRICE, price_bucket(price))]
+        keys.extend((RecipeStat.TAG, pk) for pk in tag_ids)
+        keys.extend((RecipeStat.INGREDIENT, pk) for pk in ingredient_ids)
+        for kind, key in keys:
+            total = totals[user_id, kind, key]
+            total[0] += 1
+            total[1] += minutes
+            total[2] += price
+    return totals
+
+
+def recipe_contributions(recipe_ids, using=None):
+    """Return the contributions of the recipes with recipe_ids"""
+    if not recipe_ids:
+        return {}
+    return contributions(
+        Recipe.objects.using(using).filter(pk__in=set(recipe_ids))
+    )
+
+
+def apply(before, after, using=None):
+    """Add the change from the before to the after contributions"""
+    zero = (0, 0, 0)
+    deltas = {}
+    for key in before.keys() | after.keys():
+        delta = tuple(new - old for new, old in
+                      zip(after.get(key, zero), before.get(key, zero)))
+        if any(delta):
+            deltas[key] = delta
+    RecipeStat.objects.db_manager(using).add(deltas)
+
+
+def rebuild(user_id, using):
+    """Recompute the stats of a user from their recipes"""
+    RecipeStat.objects.using(using).filter(user_id=user_id).delete()
+    totals = contributions(
+        Recipe.objects.using(using).filter(user_id=user_id)
+    )
+    RecipeStat.objects.using(using).bulk_create(
+        (RecipeStat(user_id=user_id, kind=kind, key=key, recipe_count=count,
+                    time_minutes=minutes, price=price)
+         for (_, kind, key), (count, minutes, price) in totals.items()),
+        batch_size=settings.BULK_BATCH_SIZE
+    )
+
+
+def format_price(price):
+    """Render a price like the API's decimal fields do"""
+    if price is None:
+        return None
+    return str(Decimal(price).quantize(Decimal('0.01')))
+
+
+def get_stats(user):
+    """Return the recipe totals of user, overall and per group"""
+    rows = {(stat.kind, stat.key): stat
+            for stat in RecipeStat.objects.filter(user=user)}
+
+    def summary(kind, key):
+        stat = rows.get((kind, key)) or RecipeStat()
+        count = stat.recipe_count
+        return {
+            'recipe_count': count,
+            'average_time_minutes':
+                stat.time_minutes / count if count else None,
+            'average_price':
+                format_price(stat.price / count) if count else None,
+        }
+
+    def groups(model, kind):
+        """Every tag or ingredient of user, most used first"""
+        names = model.objects.filter(user=user).values_list('id', 'name')
+        items = [dict(id=pk, name=name, **summary(kind, pk))
+                 for pk, name in names]
+        items.sort(key=lambda item: (-item['recipe_count'], item['name']))
+        return items
+
+    bounds = [None, *settings.RECIPE_STATS_PRICE_BUCKETS, None]
+    return dict(
+        summary(RecipeStat.TOTAL, 0),
+        price_distribution=[
+            {'min': format_price(low), 'max': format_price(high),
+             'recipe_count': summary(RecipeStat.PRICE, index)['recipe_count']}
+            for index, (low, high) in enumerate(zip(bounds, bounds[1:]))
+        ],
+        tags=groups(Tag, RecipeStat.TAG),
+        ingredients=groups(Ingredient, RecipeStat.INGREDIENT),
+    )
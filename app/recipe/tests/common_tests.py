@@ -1,3 +1,5 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APIClient
 
@@ -21,3 +23,42 @@ class PublicAPIAccessTest:
     def test_model_create_access(self):
         res = self.client.post(self.endpoint, self.payload)
         self.assertEquals(res.status_code, self.expected_status_code)
+
+
+class QueryBudgetTest:
+    """
+    Mixin asserting an endpoint runs a bounded number of queries.
+
+    Subclasses declare `endpoint`, `query_budget` and implement
+    `create_objects(count)`; the query count must not exceed the budget
+    and must not grow with the number of objects returned.
+    """
+
+    @property
+    def endpoint(self):
+        raise NotImplementedError()
+
+    query_budget = None
+
+    def create_objects(self, count):
+        raise NotImplementedError()
+
+    def assertMaxQueries(self, budget, func, *args, **kwargs):
+        """Call func and fail when it runs more than `budget` queries"""
+        with CaptureQueriesContext(connection) as context:
+            func(*args, **kwargs)
+        self.assertLessEqual(
+            len(context), budget,
+            f'{len(context)} queries exceed the budget of {budget}:\n' +
+            '\n'.join(query['sql'] for query in context.captured_queries)
+        )
+        return len(context)
+
+    def test_query_budget(self):
+        self.create_objects(1)
+        few = self.assertMaxQueries(self.query_budget,
+                                    self.client.get, self.endpoint)
+        self.create_objects(10)
+        many = self.assertMaxQueries(self.query_budget,
+                                     self.client.get, self.endpoint)
+        self.assertEqual(few, many)
@@ -0,0 +1,202 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+
+from .test_utils import create_sample_user, create_sample_tag, \
+    create_sample_ingredient, sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+TAG_BULK_URL = reverse('recipe:tag-bulk')
+INGREDIENT_BULK_URL = reverse('recipe:ingredient-bulk')
+
+
+class BulkApiTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = create_sample_tag(self.user, name='Vegan')
+        self.ingredient = create_sample_ingredient(self.user, name='Salt')
+
+    def recipe_payload(self, index):
+        return {
+            'title': f'Recipe {index}',
+            'time_minutes': 10,
+            'price': '5.00',
+            'tags': [self.tag.id],
+            'ingredients': [self.ingredient.id],
+        }
+
+    def test_bulk_create_recipes(self):
+        """Test recipes, assignments and history are created in order"""
+        payload = [self.recipe_payload(i) for i in range(3)]
+
+        res = self.client.post(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['title'] for item in res.data],
+                         ['Recipe 0', 'Recipe 1', 'Recipe 2'])
+        for item in res.data:
+            recipe = Recipe.objects.get(id=item['id'])
+            self.assertEqual(recipe.user, self.user)
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(recipe.tag_ids, [self.tag.id])
+            self.assertEqual(recipe.ingredient_ids, [self.ingredient.id])
+            self.assertEqual(recipe.history.get().history_type, '+')
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test an invalid item rejects the batch with per item errors"""
+        other_tag = create_sample_tag(
+            create_sample_user(email='other@example.com')
+        )
+        invalid = self.recipe_payload(1)
+        invalid['tags'] = [other_tag.id]
+        del invalid['title']
+
+        res = self.client.post(RECIPE_BULK_URL,
+                               [self.recipe_payload(0), invalid],
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertEqual(set(res.data[1]), {'title', 'tags'})
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update_recipes(self):
+        """Test partial updates replace assignments and record history"""
+        recipes = [sample_recipe(self.user, title=f'old {i}')
+                   for i in range(2)]
+        new_tag = create_sample_tag(self.user, name='Quick')
+        payload = [
+            {'id': recipes[0].id, 'title': 'new 0', 'tags': [new_tag.id]},
+            {'id': recipes[1].id, 'price': '9.50'},
+        ]
+
+        res = self.client.patch(RECIPE_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for recipe in recipes:
+            recipe.refresh_from_db()
+        self.assertEqual(recipes[0].title, 'new 0')
+        self.assertEqual(recipes[0].tag_ids, [new_tag.id])
+        self.assertEqual(str(recipes[1].price), '9.50')
+        self.assertEqual(recipes[1].title, 'old 1')
+        self.assertEqual(recipes[0].history.latest().history_type, '~')
+
+    def test_bulk_update_requires_owned_id(self):
+        other = sample_recipe(create_sample_user(email='other@example.com'))
+
+        res = self.client.patch(RECIPE_BULK_URL,
+                                [{'title': 'no id'},
+                                 {'id': other.id, 'title': 'not mine'}],
+                                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {'id': ['This field is required.']})
+        self.assertEqual(res.data[1], {'id': ['Not found.']})
+
+    def test_bulk_delete_recipes(self):
+        recipes = [sample_recipe(self.user) for _ in range(3)]
+
+        res = self.client.delete(RECIPE_BULK_URL,
+                                 [recipes[0].id, recipes[1].id],
+                                 format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Recipe.objects.all()), [recipes[2]])
+
+    def test_bulk_delete_unknown_id(self):
+        recipe = sample_recipe(self.user)
+
+        res = self.client.delete(RECIPE_BULK_URL, [recipe.id, 0, 'x'],
+                                 format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertEqual(res.data[1], {'id': ['Not found.']})
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_bulk_tags_and_ingredients(self):
+        res = self.client.post(TAG_BULK_URL,
+                               [{'name': 'Dessert'}, {'name': 'Main'}],
+                               format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Tag.objects.filter(user=self.user, name__in=['Dessert', 'Main'])
+            .count(), 2
+        )
+
+        res = self.client.patch(
+            INGREDIENT_BULK_URL,
+            [{'id': self.ingredient.id, 'name': 'Sea salt'}], format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Ingredient.objects.get(id=self.ingredient.id).name,
+                         'Sea salt')
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs full text search')
+    def test_bulk_rename_updates_search(self):
+        """Test recipes are found by the new name of a renamed tag"""
+        recipe = sample_recipe(self.user, title='Curry')
+        recipe.tags.add(self.tag)
+
+        res = self.client.patch(TAG_BULK_URL,
+                                [{'id': self.tag.id, 'name': 'Spicy'}],
+                                format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        for text, expected in (('spicy', [recipe.id]), ('vegan', [])):
+            res = self.client.get(RECIPE_URL, {'search': text})
+            self.assertEqual([item['id'] for item in res.data], expected)
+
+    def test_bulk_ignores_list_filters(self):
+        """Test list query params do not filter the bulk response"""
+        res = self.client.post(f'{TAG_BULK_URL}?assigned_only=1',
+                               [{'name': 'Dessert'}], format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['name'] for item in res.data], ['Dessert'])
+
+        res = self.client.post(
+            f'{RECIPE_BULK_URL}?tags=0&search=nothing',
+            [self.recipe_payload(0)], format='json'
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data[0]['tags'], [self.tag.id])
+
+    def test_bulk_requires_list(self):
+        res = self.client.post(TAG_BULK_URL, {'name': 'Dessert'},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BULK_MAX_ITEMS=2)
+    def test_bulk_max_items(self):
+        res = self.client.post(TAG_BULK_URL, [{'name': 'Tag'}] * 3,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.filter(name='Tag').exists())
+
+    @skipUnless(connection.features.can_return_ids_from_bulk_insert,
+                'needs ids returned from bulk inserts')
+    def test_bulk_create_query_count_is_constant(self):
+        """Test the number of queries does not grow with the batch"""
+        counts = []
+        for size in (2, 20):
+            payload = [self.recipe_payload(i) for i in range(size)]
+            with CaptureQueriesContext(connection) as context:
+                res = self.client.post(RECIPE_BULK_URL, payload,
+                                       format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(context))
+
+        self.assertEqual(counts[0], counts[1])
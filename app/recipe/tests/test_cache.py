@@ -0,0 +1,83 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from recipe.cache import get_cache_stats
+from .test_utils import create_sample_user, create_sample_tag, \
+    create_sample_ingredient, sample_recipe
+
+TAG_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+@override_settings(SHARED_CACHE=True)
+class ListCacheTestCases(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_is_served_from_cache(self):
+        """Test the second identical list request runs no list query"""
+        create_sample_tag(self.user, name='Vegan')
+        self.client.get(TAG_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(TAG_URL)
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Vegan'])
+        self.assertEqual(get_cache_stats(), {'hit': 1, 'miss': 1})
+
+    def test_create_and_delete_invalidate_list(self):
+        """Test saving or deleting a tag refreshes the cached list"""
+        tag = create_sample_tag(self.user, name='Vegan')
+        self.client.get(TAG_URL)
+
+        create_sample_tag(self.user, name='Dessert')
+        res = self.client.get(TAG_URL)
+        self.assertEqual(len(res.data), 2)
+
+        tag.delete()
+        res = self.client.get(TAG_URL)
+        self.assertEqual([tag['name'] for tag in res.data], ['Dessert'])
+
+    def test_assignment_invalidates_assigned_only_list(self):
+        """Test adding and removing recipe ingredients refreshes the list"""
+        ingredient = create_sample_ingredient(self.user, name='Salt')
+        recipe = sample_recipe(self.user)
+        params = {'assigned_only': 1}
+        self.assertEqual(self.client.get(INGREDIENT_URL, params).data, [])
+
+        recipe.ingredients.add(ingredient)
+        res = self.client.get(INGREDIENT_URL, params)
+        self.assertEqual(len(res.data), 1)
+
+        recipe.delete()
+        res = self.client.get(INGREDIENT_URL, params)
+        self.assertEqual(res.data, [])
+
+    def test_cache_is_per_user(self):
+        """Test cached lists are not shared between users"""
+        create_sample_tag(self.user, name='Vegan')
+        self.client.get(TAG_URL)
+        other = create_sample_user(email='other@example.com')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(res.data, [])
+
+    @override_settings(SHARED_CACHE=False)
+    def test_unshared_cache_is_not_used(self):
+        """Test lists are not cached where other processes miss writes"""
+        create_sample_tag(self.user, name='Vegan')
+        self.client.get(TAG_URL)
+
+        res = self.client.get(TAG_URL)
+
+        self.assertEqual(len(res.data), 1)
+        self.assertNotIn('ETag', res)
+        self.assertEqual(get_cache_stats(), {'hit': 0, 'miss': 0})
@@ -0,0 +1,100 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .test_utils import create_sample_user, create_sample_tag, sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+
+
+def get_recipe_details_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(SHARED_CACHE=True)
+class ConditionalGetTestCases(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(0):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_recipe_list_not_modified(self):
+        """Test a current ETag is answered without any query"""
+        sample_recipe(self.user)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', res)
+        self.assertNotModified(RECIPE_URL, res['ETag'])
+
+    def test_recipe_list_etag_changes_on_write(self):
+        recipe = sample_recipe(self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        recipe.tags.add(create_sample_tag(self.user))
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_if_modified_since_is_ignored(self):
+        """Test a write in the same second is never answered with 304"""
+        sample_recipe(self.user)
+
+        res = self.client.get(RECIPE_URL,
+                              HTTP_IF_MODIFIED_SINCE=http_date(2 ** 32))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_user_and_query(self):
+        sample_recipe(self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        self.assertNotEqual(
+            self.client.get(RECIPE_URL, {'page_size': 1})['ETag'], etag
+        )
+        self.client.force_authenticate(
+            create_sample_user(email='other@example.com')
+        )
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_tag_list_not_modified_until_tag_created(self):
+        create_sample_tag(self.user, name='Vegan')
+        etag = self.client.get(TAG_URL)['ETag']
+        self.assertNotModified(TAG_URL, etag)
+
+        create_sample_tag(self.user, name='Dessert')
+        res = self.client.get(TAG_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+
+    def test_recipe_detail_has_per_object_etag(self):
+        """Test only changes to the recipe itself refresh its ETag"""
+        recipe = sample_recipe(self.user, title='Soup')
+        other = sample_recipe(self.user, title='Stew')
+        url = get_recipe_details_url(recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        other.title = 'Curry'
+        other.save()
+        self.assertNotModified(url, etag)
+
+        recipe.title = 'Broth'
+        recipe.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Broth')
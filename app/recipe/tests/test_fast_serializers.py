@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import RecipeImageVariant
+
+from .test_utils import create_sample_user, create_sample_tag, \
+    create_sample_ingredient, sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+class ValuesListSerializerTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        tags = [create_sample_tag(self.user, name=f'tag {i}')
+                for i in range(3)]
+        ingredients = [create_sample_ingredient(self.user, name=f'ing {i}')
+                       for i in range(2)]
+        first = sample_recipe(self.user, title='Soup', price=4.5,
+                              link='https://example.com/soup')
+        first.tags.add(tags[2], tags[0])
+        first.ingredients.add(*ingredients)
+        first.image = 'uploads/recipe/soup.jpg'
+        first.save()
+        RecipeImageVariant.objects.create(
+            recipe=first, width=320, format='webp',
+            image='uploads/recipe/variants/soup.webp'
+        )
+        RecipeImageVariant.objects.create(
+            recipe=first, width=160, format='jpeg',
+            image='uploads/recipe/variants/soup.jpg'
+        )
+        sample_recipe(self.user, title='Stew', price=12)
+
+    def assertSameContent(self, url, params=None):
+        """Test both list paths render byte identical responses"""
+        responses = []
+        for fast in (True, False):
+            cache.clear()
+            with override_settings(FAST_LIST_SERIALIZATION=fast):
+                responses.append(self.client.get(url, params))
+        fast, regular = responses
+        self.assertEqual(fast.status_code, regular.status_code)
+        self.assertEqual(fast.content, regular.content)
+        self.assertEqual(fast.get('Link'), regular.get('Link'))
+
+    def test_recipe_list_is_identical(self):
+        self.assertSameContent(RECIPE_URL)
+
+    def test_recipe_list_page_is_identical(self):
+        self.assertSameContent(RECIPE_URL, {'page_size': 1})
+
+    def test_recipe_sparse_fields_are_identical(self):
+        self.assertSameContent(RECIPE_URL,
+                               {'fields': 'id,price,tags,image_variants'})
+
+    def test_recipe_search_is_identical(self):
+        self.assertSameContent(RECIPE_URL, {'search': 'soup'})
+
+    def test_tag_and_ingredient_lists_are_identical(self):
+        self.assertSameContent(TAG_URL)
+        self.assertSameContent(TAG_URL, {'assigned_only': 1})
+        self.assertSameContent(INGREDIENT_URL)
+
+    def test_benchmark_serializers(self):
+        out = StringIO()
+        call_command('benchmark_serializers', rows=[5, 10], repeat=1,
+                     stdout=out)
+
+        output = out.getvalue()
+        self.assertEqual(output.count('ModelSerializer'), 2)
+        self.assertEqual(output.count('values()'), 2)
@@ -0,0 +1,100 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .test_pagination import get_link
+from .test_utils import create_sample_user, sample_recipe
+
+HISTORY_URL = reverse('recipe:historicalrecipe-list')
+
+
+def get_history_detail_url(recipe_id):
+    return reverse('recipe:historicalrecipe-detail', args=[recipe_id])
+
+
+class PublicRecipeHistoryTestCase(TestCase):
+
+    def test_login_required(self):
+        res = APIClient().get(HISTORY_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(REST_FRAMEWORK={
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': 2,
+})
+class PrivateRecipeHistoryTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_history_limited_to_user(self):
+        """Test history only lists versions of the user's recipes"""
+        other = create_sample_user(email='other@londonappdev.com')
+        sample_recipe(other, title='Not mine')
+        recipe = sample_recipe(self.user, title='Mine')
+
+        res = self.client.get(HISTORY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+
+    def test_history_detail_of_other_user_not_found(self):
+        other = create_sample_user(email='other@londonappdev.com')
+        recipe = sample_recipe(other)
+
+        res = self.client.get(get_history_detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_history_detail_pages_newest_first(self):
+        """Test the versions of a recipe are walked with cursors"""
+        recipe = sample_recipe(self.user, title='v0')
+        for i in range(1, 5):
+            recipe.title = f'v{i}'
+            recipe.save()
+
+        titles = []
+        url = get_history_detail_url(recipe.id)
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data), 2)
+            titles.extend(item['title'] for item in res.data)
+            url = get_link(res, 'next')
+
+        self.assertEqual(titles, ['v4', 'v3', 'v2', 'v1', 'v0'])
+
+    def test_history_diff_returns_changed_fields(self):
+        """Test diff mode only returns fields changed from the parent"""
+        recipe = sample_recipe(self.user, title='Soup', price=5)
+        recipe.title = 'Stew'
+        recipe.save()
+        recipe.price = 7
+        recipe.save()
+
+        res = self.client.get(get_history_detail_url(recipe.id),
+                              {'diff': 1})
+        older = self.client.get(get_link(res, 'next'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['changes'],
+                         {'price': {'old': '5.00', 'new': '7.00'}})
+        self.assertEqual(res.data[1]['changes'],
+                         {'title': {'old': 'Soup', 'new': 'Stew'}})
+        self.assertEqual(res.data[1]['history_type'], '~')
+        created = older.data[0]
+        self.assertEqual(created['history_type'], '+')
+        self.assertEqual(created['changes']['title'],
+                         {'old': None, 'new': 'Soup'})
+
+    def test_history_invalid_diff(self):
+        recipe = sample_recipe(self.user)
+
+        res = self.client.get(get_history_detail_url(recipe.id),
+                              {'diff': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -75,6 +75,7 @@ class PrivateIngredientTestCases(TestCase):
         ingredient = create_sample_ingredient(self.user, name='Cheese')
         create_sample_ingredient(self.user, name='Ghee')
         recipe.ingredients.add(ingredient)
+        ingredient.refresh_from_db()
         serializer = IngredientSerializer(ingredient)
 
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
@@ -92,6 +93,7 @@ class PrivateIngredientTestCases(TestCase):
         ingredient = create_sample_ingredient(self.user, name='Cheese')
         recipe1.ingredients.add(ingredient)
         recipe2.ingredients.add(ingredient)
+        ingredient.refresh_from_db()
         serializer = IngredientSerializer(ingredient)
 
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
@@ -0,0 +1,103 @@
+import base64
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from .test_utils import create_sample_user, create_sample_tag, sample_recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+
+
+def get_link(res, rel):
+    """Return the `rel` url from the response Link header"""
+    for link in res.get('Link', '').split(', '):
+        if link.endswith(f'rel="{rel}"'):
+            return link[1:link.index('>')]
+    return None
+
+
+@override_settings(REST_FRAMEWORK={
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': 2,
+}, MAX_PAGE_SIZE=3)
+class KeysetPaginationTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_pages_follow_next_cursor(self):
+        """Test recipe pages are walked newest first without overlap"""
+        recipes = [sample_recipe(self.user, title=f'recipe {i}')
+                   for i in range(5)]
+
+        ids = []
+        url = RECIPE_URL
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(res.data), 2)
+            ids.extend(item['id'] for item in res.data)
+            url = get_link(res, 'next')
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Test following previous link returns the earlier page"""
+        for i in range(5):
+            sample_recipe(self.user, title=f'recipe {i}')
+        first = self.client.get(RECIPE_URL)
+        second = self.client.get(get_link(first, 'next'))
+
+        res = self.client.get(get_link(second, 'previous'))
+
+        self.assertEqual(res.data, first.data)
+        self.assertIsNone(get_link(first, 'previous'))
+
+    def test_tag_pages_ordered_by_name_with_ties(self):
+        """Test tags with the same name are split across pages by id"""
+        create_sample_tag(self.user, name='b')
+        create_sample_tag(self.user, name='a')
+        create_sample_tag(self.user, name='b')
+        create_sample_tag(self.user, name='c')
+
+        first = self.client.get(TAG_URL)
+        second = self.client.get(get_link(first, 'next'))
+
+        names = [tag['name'] for tag in first.data + second.data]
+        self.assertEqual(names, ['c', 'b', 'b', 'a'])
+        self.assertEqual(len({tag['id'] for tag in first.data + second.data}),
+                         4)
+        self.assertIsNone(get_link(second, 'next'))
+
+    def test_page_size_is_capped(self):
+        """Test page_size query param is limited to MAX_PAGE_SIZE"""
+        for i in range(5):
+            sample_recipe(self.user, title=f'recipe {i}')
+
+        res = self.client.get(RECIPE_URL, {'page_size': 50})
+
+        self.assertEqual(len(res.data), 3)
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        res = self.client.get(RECIPE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_of_wrong_type(self):
+        """Test cursor values not matching the ordering are rejected"""
+        for values in (['abc'], [['x']], [None], [{}]):
+            cursor = base64.urlsafe_b64encode(
+                json.dumps({'v': values, 'r': 0}).encode()
+            ).decode()
+
+            res = self.client.get(RECIPE_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND,
+                             values)
@@ -1,9 +1,12 @@
 import os
 import tempfile
+from unittest import skipUnless
 
 from PIL import Image
 from core.models import Recipe
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 from rest_framework import status
@@ -12,7 +15,7 @@ from rest_framework.test import APIClient
 from .test_utils import create_sample_user, sample_recipe, \
     create_sample_tag, create_sample_ingredient
 
-from .common_tests import PublicAPIAccessTest
+from .common_tests import PublicAPIAccessTest, QueryBudgetTest
 
 RECIPE_URL = reverse('recipe:recipe-list')
 
@@ -168,6 +171,49 @@ class PrivateTapRecipeTestCases(TestCase):
         self.assertEqual(recipe.tags.count(), 0)
 
 
+class RecipeListQueryBudgetTestCase(QueryBudgetTest, TestCase):
+    """Test recipe list queries do not grow with the number of recipes"""
+    endpoint = RECIPE_URL
+    query_budget = 4
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_objects(self, count):
+        for i in range(count):
+            recipe = sample_recipe(self.user)
+            recipe.tags.add(create_sample_tag(self.user, name=f'tag {i}'))
+            recipe.ingredients.add(
+                create_sample_ingredient(self.user, name=f'ingredient {i}')
+            )
+
+
+class RecipeDetailQueryBudgetTestCase(QueryBudgetTest, TestCase):
+    """Test recipe detail queries do not grow with tags and ingredients"""
+    query_budget = 4
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.recipe = sample_recipe(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @property
+    def endpoint(self):
+        return get_recipe_details_url(self.recipe.id)
+
+    def create_objects(self, count):
+        for i in range(count):
+            self.recipe.tags.add(
+                create_sample_tag(self.user, name=f'tag {i}')
+            )
+            self.recipe.ingredients.add(
+                create_sample_ingredient(self.user, name=f'ingredient {i}')
+            )
+
+
 class RecipeImageUploadTestCases(TestCase):
 
     def setUp(self):
@@ -239,3 +285,129 @@ class RecipeImageUploadTestCases(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer1.data, res.data)
+
+
+class RecipeFilterTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.veg = create_sample_tag(self.user, name='Veg')
+        self.lunch = create_sample_tag(self.user, name='Lunch')
+        self.both = sample_recipe(self.user, title='Veg thali')
+        self.both.tags.add(self.veg, self.lunch)
+        self.veg_only = sample_recipe(self.user, title='Salad')
+        self.veg_only.tags.add(self.veg)
+
+    def test_filter_match_any_has_no_duplicates(self):
+        """Test a recipe matching several tags is listed once"""
+        res = self.client.get(
+            RECIPE_URL, {'tags': f'{self.veg.id},{self.lunch.id}'}
+        )
+
+        ids = [recipe['id'] for recipe in res.data]
+        self.assertEqual(sorted(ids), sorted([self.both.id,
+                                              self.veg_only.id]))
+
+    def test_filter_match_all(self):
+        """Test match=all only returns recipes having every tag"""
+        res = self.client.get(RECIPE_URL, {
+            'tags': f'{self.veg.id},{self.lunch.id}',
+            'match': 'all',
+        })
+
+        self.assertEqual([recipe['id'] for recipe in res.data],
+                         [self.both.id])
+
+    def test_filter_invalid_match(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': self.veg.id,
+                                           'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSearchTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.curry = sample_recipe(self.user, title='Thai vegetable curry')
+        self.curry.tags.add(create_sample_tag(self.user, name='Spicy'))
+        self.lasagna = sample_recipe(self.user, title='Lasagna')
+        self.lasagna.ingredients.add(
+            create_sample_ingredient(self.user, name='Mozzarella')
+        )
+
+    def search(self, text):
+        res = self.client.get(RECIPE_URL, {'search': text})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data]
+
+    def test_search_title(self):
+        """Test recipes are found by title words"""
+        self.assertEqual(self.search('curry'), [self.curry.id])
+
+    def test_search_related_names(self):
+        """Test recipes are found by tag and ingredient names"""
+        self.assertEqual(self.search('spicy'), [self.curry.id])
+        self.assertEqual(self.search('mozzarella'), [self.lasagna.id])
+
+    def test_search_is_scoped_to_user(self):
+        """Test other users' recipes are not searched"""
+        sample_recipe(create_sample_user(email='other@example.com'),
+                      title='Green curry')
+        self.assertEqual(self.search('curry'), [self.curry.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs pg_trgm')
+    def test_search_tolerates_typos(self):
+        """Test trigram similarity matches misspelled titles"""
+        self.assertEqual(self.search('lasagne'), [self.lasagna.id])
+
+
+class RecipeSparseFieldsTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = create_sample_tag(self.user, name='Veg')
+        self.recipe = sample_recipe(self.user, title='Salad')
+        self.recipe.tags.add(self.tag)
+
+    def test_list_renders_and_selects_requested_fields(self):
+        """Test unrequested fields are left out of the JSON and the SQL"""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': self.recipe.id,
+                                     'title': 'Salad'}])
+        self.assertEqual(len(context), 1)
+        self.assertNotIn('"price"', context.captured_queries[0]['sql'])
+
+    def test_list_expand_nests_tags(self):
+        res = self.client.get(RECIPE_URL,
+                              {'fields': 'id,tags', 'expand': 'tags'})
+
+        self.assertEqual(res.data[0]['tags'],
+                         [{'id': self.tag.id, 'name': 'Veg',
+                           'recipe_count': 1}])
+
+    def test_detail_expands_by_default(self):
+        url = get_recipe_details_url(self.recipe.id)
+
+        self.assertEqual(self.client.get(url).data['tags'],
+                         [{'id': self.tag.id, 'name': 'Veg',
+                           'recipe_count': 1}])
+        res = self.client.get(url, {'expand': ''})
+        self.assertEqual(res.data['tags'], [self.tag.id])
+
+    def test_unknown_fields_rejected(self):
+        res = self.client.get(RECIPE_URL, {'fields': 'id,secret'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(RECIPE_URL, {'expand': 'image'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
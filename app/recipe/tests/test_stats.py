@@ -0,0 +1,136 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeStat
+
+from .test_utils import create_sample_user, create_sample_tag, \
+    create_sample_ingredient, sample_recipe
+
+STATS_URL = reverse('recipe:recipe-stats')
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def stored_stats():
+    return {(stat.user_id, stat.kind, stat.key):
+            (stat.recipe_count, stat.time_minutes, stat.price)
+            for stat in RecipeStat.objects.exclude(recipe_count=0)}
+
+
+class RecipeStatsTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = create_sample_tag(self.user, name='Vegan')
+        self.dinner = create_sample_tag(self.user, name='Dinner')
+        self.salt = create_sample_ingredient(self.user, name='Salt')
+
+    def assertStatsCurrent(self):
+        """Assert the incremental totals equal a rebuild"""
+        incremental = stored_stats()
+        call_command('rebuild_recipe_stats', stdout=StringIO())
+        self.assertEqual(incremental, stored_stats())
+
+    def test_stats_follow_writes(self):
+        """Test saves, deletes and assignment changes update the stats"""
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Curry', 'time_minutes': 30, 'price': '7.00',
+            'tags': [self.vegan.id, self.dinner.id],
+            'ingredients': [self.salt.id],
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        curry = Recipe.objects.get(id=res.data['id'])
+        soup = sample_recipe(self.user, time_minutes=10, price=3)
+        soup.tags.add(self.vegan)
+        self.assertStatsCurrent()
+
+        self.client.patch(reverse('recipe:recipe-detail', args=[curry.id]),
+                          {'price': '25.00', 'tags': [self.dinner.id]})
+        self.vegan.recipe_set.add(curry)
+        self.dinner.recipe_set.clear()
+        self.assertStatsCurrent()
+
+        self.salt.delete()
+        soup.delete()
+        self.assertStatsCurrent()
+
+    def test_bulk_writes_update_stats(self):
+        payload = [{'title': f'Recipe {i}', 'time_minutes': 10 * i,
+                    'price': f'{i}.00', 'tags': [self.vegan.id],
+                    'ingredients': [self.salt.id]}
+                   for i in range(1, 4)]
+        res = self.client.post(RECIPE_BULK_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertStatsCurrent()
+
+        res = self.client.patch(RECIPE_BULK_URL, [
+            {'id': item['id'], 'price': '60.00', 'tags': [self.dinner.id]}
+            for item in res.data[:2]
+        ], format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertStatsCurrent()
+
+    def test_get_stats(self):
+        for minutes, price in ((10, 3), (20, 8), (60, 8)):
+            recipe = sample_recipe(self.user, time_minutes=minutes,
+                                   price=price)
+            recipe.tags.add(self.vegan)
+        recipe.ingredients.add(self.salt)
+        sample_recipe(create_sample_user(email='other@example.com'))
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 3)
+        self.assertEqual(res.data['average_time_minutes'], 30)
+        self.assertEqual(res.data['average_price'], '6.33')
+        self.assertEqual(
+            [(bucket['min'], bucket['max'], bucket['recipe_count'])
+             for bucket in res.data['price_distribution']],
+            [(None, '5.00', 1), ('5.00', '10.00', 2), ('10.00', '20.00', 0),
+             ('20.00', '50.00', 0), ('50.00', None, 0)]
+        )
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count']) for tag in res.data['tags']],
+            [('Vegan', 3), ('Dinner', 0)]
+        )
+        self.assertEqual(res.data['tags'][1]['average_price'], None)
+        self.assertEqual(res.data['ingredients'], [{
+            'id': self.salt.id, 'name': 'Salt', 'recipe_count': 1,
+            'average_time_minutes': 60, 'average_price': '8.00',
+        }])
+
+    def test_stats_queries_independent_of_recipes(self):
+        """Test reads cost the same however many recipes there are"""
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(STATS_URL)
+            return len(queries)
+
+        sample_recipe(self.user).tags.add(self.vegan)
+        few = count_queries()
+        for _ in range(10):
+            sample_recipe(self.user).tags.add(self.vegan, self.dinner)
+        self.assertEqual(count_queries(), few)
+
+    def test_rebuild_recipe_stats(self):
+        sample_recipe(self.user).tags.add(self.vegan)
+        RecipeStat.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_recipe_stats', self.user.email, stdout=out)
+
+        self.assertIn('1 users', out.getvalue())
+        self.assertEqual(
+            RecipeStat.objects.get(kind=RecipeStat.TAG,
+                                   key=self.vegan.id).recipe_count, 1
+        )
@@ -1,15 +1,23 @@
-from django.test import TestCase
+import threading
+import time
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Tag
+from core.models import Tag, Ingredient
 from ..serializers import TagSerializer
 from .test_utils import create_sample_user, create_sample_tag, \
-    sample_recipe
+    create_sample_ingredient, sample_recipe
 
 from .common_tests import PublicAPIAccessTest
 
 LIST_TAG_URL = reverse('recipe:tag-list')
+RECIPE_BULK_URL = reverse('recipe:recipe-bulk')
 
 
 class PublicApiTestCase(PublicAPIAccessTest, TestCase):
@@ -65,6 +73,7 @@ class PrivateTapApiTestCases(TestCase):
         create_sample_tag(self.user, name="Vegan")
         recipe = sample_recipe(self.user, title="Veg Pulav")
         recipe.tags.add(tag)
+        tag.refresh_from_db()
         res = self.client.get(LIST_TAG_URL, {'assigned_only': 1})
         serializer = TagSerializer(tag)
         self.assertIn(serializer.data, res.data)
@@ -77,7 +86,128 @@ class PrivateTapApiTestCases(TestCase):
         recipe2 = sample_recipe(self.user, title='Dal Fry')
         recipe.tags.add(tag)
         recipe2.tags.add(tag)
+        tag.refresh_from_db()
         serializer = TagSerializer(tag)
         res = self.client.get(LIST_TAG_URL, {'assigned_only': 1})
         self.assertEqual(len(res.data), 1)
         self.assertIn(serializer.data, res.data)
+
+
+class RecipeCountTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = create_sample_tag(self.user, name='Vegan')
+        self.dinner = create_sample_tag(self.user, name='Dinner')
+
+    def assertCounts(self, vegan, dinner):
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'recipe_count')),
+            {'Vegan': vegan, 'Dinner': dinner}
+        )
+
+    def test_count_follows_assignments(self):
+        """Test adding, removing and clearing tags updates the counts"""
+        curry = sample_recipe(self.user, title='Curry')
+        soup = sample_recipe(self.user, title='Soup')
+        curry.tags.add(self.vegan, self.dinner)
+        curry.tags.add(self.vegan)
+        self.vegan.recipe_set.add(soup)
+        self.assertCounts(2, 1)
+
+        curry.tags.remove(self.dinner, self.dinner)
+        soup.tags.remove(self.dinner)
+        self.assertCounts(2, 0)
+
+        self.vegan.recipe_set.clear()
+        self.assertCounts(0, 0)
+
+        curry.tags.set([self.dinner])
+        soup.delete()
+        curry.delete()
+        self.assertCounts(0, 0)
+
+    def test_saving_stale_tag_keeps_count(self):
+        tag = Tag.objects.get(pk=self.vegan.pk)
+        sample_recipe(self.user).tags.add(self.vegan)
+
+        tag.name = 'Vegetarian'
+        tag.save()
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+
+    def test_bulk_writes_update_counts(self):
+        salt = create_sample_ingredient(self.user, name='Salt')
+        payload = [{'title': f'Recipe {i}', 'time_minutes': 10,
+                    'price': '5.00', 'tags': [self.vegan.id],
+                    'ingredients': [salt.id]}
+                   for i in range(3)]
+        res = self.client.post(RECIPE_BULK_URL, payload, format='json')
+        self.assertCounts(3, 0)
+
+        self.client.patch(RECIPE_BULK_URL, [
+            {'id': item['id'], 'tags': [self.dinner.id]}
+            for item in res.data[:2]
+        ], format='json')
+
+        self.assertCounts(1, 2)
+        salt.refresh_from_db()
+        self.assertEqual(salt.recipe_count, 3)
+
+    def test_assigned_only_uses_count(self):
+        sample_recipe(self.user).tags.add(self.vegan)
+        Tag.objects.filter(pk=self.dinner.pk).update(recipe_count=1)
+
+        res = self.client.get(LIST_TAG_URL, {'assigned_only': 1})
+
+        self.assertEqual({tag['name'] for tag in res.data},
+                         {'Vegan', 'Dinner'})
+
+    def test_sync_recipe_counts(self):
+        """Test the repair command recounts drifted rows"""
+        sample_recipe(self.user).tags.add(self.vegan)
+        Tag.objects.update(recipe_count=5)
+        Ingredient.objects.create(user=self.user, name='Salt',
+                                  recipe_count=0)
+
+        out = StringIO()
+        call_command('sync_recipe_counts', stdout=out)
+
+        self.assertCounts(1, 0)
+        self.assertIn('Recounted 2 tags', out.getvalue())
+        self.assertIn('Recounted 1 ingredients', out.getvalue())
+
+
+@skipUnless(connection.features.has_select_for_update,
+            'needs row locks')
+class ConcurrentRecipeCountTestCases(TransactionTestCase):
+
+    def test_concurrent_removals_count_once(self):
+        """Test a removal waiting on another one does not count it again"""
+        user = create_sample_user()
+        vegan = create_sample_tag(user, name='Vegan')
+        curry = sample_recipe(user, title='Curry')
+        curry.tags.add(vegan)
+        removed = threading.Event()
+
+        def remove_waiting():
+            try:
+                removed.wait()
+                curry.tags.remove(vegan)
+            finally:
+                connections.close_all()
+
+        other = threading.Thread(target=remove_waiting)
+        other.start()
+        with transaction.atomic():
+            curry.tags.remove(vegan)
+            removed.set()
+            # let the other removal block on the link before committing
+            time.sleep(0.5)
+        other.join()
+
+        vegan.refresh_from_db()
+        self.assertEqual(vegan.recipe_count, 0)
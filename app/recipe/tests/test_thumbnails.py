@@ -0,0 +1,105 @@
+import tempfile
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import RecipeImageVariant
+from recipe.thumbnails import generate_variants, get_formats
+from .test_utils import create_sample_user, sample_recipe
+
+
+def image_file(width, height, fmt='JPEG'):
+    """Return an encoded image of the given size"""
+    with tempfile.TemporaryFile() as tmp:
+        Image.new('RGB', (width, height)).save(tmp, format=fmt)
+        tmp.seek(0)
+        return ContentFile(tmp.read())
+
+
+@override_settings(THUMBNAIL_WIDTHS=(20, 40, 80), THUMBNAIL_WORKERS=0)
+class ThumbnailTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.recipe = sample_recipe(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for variant in RecipeImageVariant.objects.all():
+            variant.image.delete(save=False)
+        self.recipe.image.delete(save=False)
+
+    def test_generate_variants(self):
+        """Test variants are created for widths up to the original"""
+        self.recipe.image.save('test.png', image_file(50, 25, 'PNG'))
+
+        variants = generate_variants(self.recipe.id)
+
+        formats = {fmt.lower() for fmt in get_formats()}
+        self.assertEqual({(v.width, v.format) for v in variants},
+                         {(w, f) for w in (20, 40) for f in formats})
+        variant = self.recipe.image_variants.get(width=20, format='jpeg')
+        with variant.image.open('rb') as image:
+            self.assertEqual(Image.open(image).size, (20, 10))
+
+    def test_generate_variants_replaces_previous(self):
+        """Test regenerating drops variants of the previous image"""
+        self.recipe.image.save('test.jpg', image_file(50, 50))
+        generate_variants(self.recipe.id)
+        self.recipe.image.save('test.jpg', image_file(30, 30))
+
+        generate_variants(self.recipe.id)
+
+        self.assertEqual(
+            set(self.recipe.image_variants.values_list('width', flat=True)),
+            {20}
+        )
+
+    @patch('recipe.views.schedule_variants')
+    def test_upload_schedules_variants(self, schedule):
+        """Test image upload returns before variants are generated"""
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        upload = image_file(50, 50)
+        upload.name = 'upload.jpg'
+
+        res = self.client.post(url, {'image': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        schedule.assert_called_once_with(self.recipe.id, 'default')
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image_variants.exists())
+
+    def test_variants_exposed_on_recipe(self):
+        """Test generated variant urls are listed on the recipe"""
+        self.recipe.image.save('test.jpg', image_file(50, 50))
+        generate_variants(self.recipe.id)
+
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+
+        widths = {v['width'] for v in res.data['image_variants']}
+        self.assertEqual(widths, {20, 40})
+        self.assertTrue(all(v['image'].startswith('http')
+                            for v in res.data['image_variants']))
+
+    @patch('recipe.signals.transaction.on_commit',
+           lambda func, using=None: func())
+    def test_variant_files_deleted_with_rows(self):
+        """Test replaced variants and those of deleted recipes lose files"""
+        self.recipe.image.save('test.jpg', image_file(50, 50))
+        old = generate_variants(self.recipe.id)
+        self.recipe.image.save('test.jpg', image_file(30, 30))
+        new = generate_variants(self.recipe.id)
+
+        self.recipe.delete()
+
+        storage = old[0].image.storage
+        self.assertFalse(any(storage.exists(variant.image.name)
+                             for variant in old + new))
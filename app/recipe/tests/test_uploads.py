@@ -0,0 +1,137 @@
+import os
+from datetime import timedelta
+from io import BytesIO, StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import RecipeImageUpload
+from .test_utils import create_sample_user, sample_recipe
+
+
+def upload_url(recipe_id, upload_id=None):
+    """Returns the chunked image upload url"""
+    url = reverse('recipe:recipe-create-image-upload', args=[recipe_id])
+    return f'{url}{upload_id}/' if upload_id else url
+
+
+def sample_image_bytes(fmt='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', (50, 50), color='red').save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class ChunkedImageUploadTestCases(TestCase):
+
+    def setUp(self):
+        self.user = create_sample_user()
+        self.recipe = sample_recipe(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.data = sample_image_bytes()
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        self.recipe.image.delete()
+
+    def start(self, size):
+        res = self.client.post(upload_url(self.recipe.id), {'size': size})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def send(self, upload_id, chunk, offset):
+        return self.client.patch(
+            upload_url(self.recipe.id, upload_id), chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunked_upload_finalizes_into_recipe_image(self):
+        """Test chunks are appended and moved into the recipe image"""
+        upload_id = self.start(len(self.data))
+        half = len(self.data) // 2
+
+        res = self.send(upload_id, self.data[:half], 0)
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['offset'], half)
+        res = self.send(upload_id, self.data[half:], half)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        with self.recipe.image.open('rb') as image:
+            self.assertEqual(image.read(), self.data)
+        self.assertFalse(RecipeImageUpload.objects.exists())
+
+    def test_resume_from_reported_offset(self):
+        """Test the stored offset is reported and enforced"""
+        upload_id = self.start(len(self.data))
+        self.send(upload_id, self.data[:100], 0)
+
+        res = self.client.get(upload_url(self.recipe.id, upload_id))
+        self.assertEqual(res.data['offset'], 100)
+
+        res = self.send(upload_id, self.data[50:], 50)
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        res = self.send(upload_id, self.data[100:], 100)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_declared_size_is_bounded(self):
+        """Test uploads over MAX_IMAGE_UPLOAD_SIZE are refused up front"""
+        with self.settings(MAX_IMAGE_UPLOAD_SIZE=10):
+            res = self.client.post(upload_url(self.recipe.id), {'size': 11})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunk_over_declared_size(self):
+        """Test chunks may not exceed the declared size"""
+        upload_id = self.start(10)
+
+        res = self.send(upload_id, self.data[:20], 0)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_image_rejected_on_first_chunk(self):
+        """Test the upload is discarded once the header is not an image"""
+        upload_id = self.start(1000)
+
+        res = self.send(upload_id, b'x' * 16, 0)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RecipeImageUpload.objects.exists())
+        self.assertFalse(os.path.exists(
+            RecipeImageUpload(id=upload_id).path
+        ))
+
+    def test_other_users_recipe(self):
+        """Test uploads cannot target another user's recipe"""
+        other = sample_recipe(create_sample_user(email='o@example.com'))
+
+        res = self.client.post(upload_url(other.id), {'size': 10})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expire_uploads(self):
+        """Test abandoned uploads are deleted with their partial files"""
+        stale_id = self.start(len(self.data))
+        self.send(stale_id, self.data[:100], 0)
+        RecipeImageUpload.objects.filter(pk=stale_id) \
+            .update(created_at=timezone.now() - timedelta(hours=25))
+        fresh_id = self.start(len(self.data))
+
+        out = StringIO()
+        call_command('expire_uploads', stdout=out)
+
+        self.assertIn('Deleted 1 expired uploads', out.getvalue())
+        self.assertEqual(
+            [str(upload.id) for upload in RecipeImageUpload.objects.all()],
+            [fresh_id]
+        )
+        self.assertFalse(os.path.exists(
+            RecipeImageUpload(id=stale_id).path
+        ))
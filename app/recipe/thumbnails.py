@@ -0,0 +1,119 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from PIL import Image, features
+
+from core.db.routers import using_shard
+from core.models import Recipe, RecipeImageVariant
+
+from .cache import bump_versions
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+_executor = None
+
+
+def get_executor():
+    """Return the shared thumbnail thread pool"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def get_formats():
+    """Return the configured formats this Pillow build can encode"""
+    return [fmt for fmt in settings.THUMBNAIL_FORMATS
+            if fmt != 'WEBP' or features.check('webp')]
+
+
+def encode_variant(image, width, fmt):
+    """Return image resized to width and encoded as fmt"""
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.LANCZOS)
+    if fmt == 'JPEG' and resized.mode != 'RGB':
+        resized = resized.convert('RGB')
+
+    buffer = BytesIO()
+    resized.save(buffer, format=fmt, quality=settings.THUMBNAIL_QUALITY,
+                 optimize=fmt == 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+def generate_variants(recipe_id, using=DEFAULT_DB_ALIAS):
+    """
+    Replace the image variants of a recipe with freshly encoded ones
+
+    using is the shard holding the recipe.
+    """
+    with using_shard(using), transaction.atomic(using=using):
+        return _generate_variants(recipe_id)
+
+
+def _generate_variants(recipe_id):
+    # concurrent runs for one recipe queue on the row lock instead of
+    # racing on the unique (recipe, width, format)
+    recipe = Recipe.objects.select_for_update().filter(pk=recipe_id).first()
+    if recipe is None:
+        return []
+
+    bump_versions(Recipe, recipe.user_id, [recipe.pk])
+    # the files go once the delete commits, see recipe.signals
+    recipe.image_variants.all().delete()
+    if not recipe.image:
+        return []
+
+    with recipe.image.open('rb') as source:
+        image = Image.open(source)
+        image.load()
+
+    variants = []
+    for width in sorted(settings.THUMBNAIL_WIDTHS):
+        if width > image.width:
+            break
+        for fmt in get_formats():
+            variant = RecipeImageVariant(recipe=recipe, width=width,
+                                         format=fmt.lower())
+            variant.image.save(f'{recipe_id}.{FORMAT_EXTENSIONS[fmt]}',
+                               encode_variant(image, width, fmt),
+                               save=False)
+            variants.append(variant)
+    variants = RecipeImageVariant.objects.bulk_create(variants)
+    bump_versions(Recipe, recipe.user_id, [recipe.pk])
+    return variants
+
+
+def _run(recipe_id, using):
+    try:
+        generate_variants(recipe_id, using)
+    except Exception:
+        logger.exception('Generating variants of recipe %s failed',
+                         recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_variants(recipe_id, using=DEFAULT_DB_ALIAS):
+    """
+    Generate the variants of a recipe once the transaction of its shard
+    (using) commits
+
+    With THUMBNAIL_WORKERS set to 0 the variants are generated inline.
+    """
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(_run, recipe_id, using),
+            using=using
+        )
+    else:
+        transaction.on_commit(lambda: generate_variants(recipe_id, using),
+                              using=using)
@@ -0,0 +1,128 @@
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.models import RecipeImageUpload
+
+BLOCK_SIZE = 64 * 1024
+# Leading bytes of the image formats uploads may have, matched against
+# the first chunk; finalize verifies the whole file
+SIGNATURES = {
+    'JPEG': re.compile(b'\xff\xd8\xff'),
+    'PNG': re.compile(b'\x89PNG\r\n\x1a\n'),
+    'GIF': re.compile(b'GIF8[79]a'),
+    'WEBP': re.compile(b'RIFF.{4}WEBP', re.DOTALL),
+}
+SNIFF_SIZE = 12
+
+
+class PartialUploadFile(File):
+    """Completed upload file that storage can move instead of copying"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class InvalidImage(ValidationError):
+    """Upload content is not an accepted image; the upload is discarded"""
+
+
+class OffsetConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Chunk does not start at the upload offset.'
+    default_code = 'offset_conflict'
+
+
+def sniff_format(data):
+    """Return the image format of the leading bytes of an upload"""
+    for fmt in settings.ALLOWED_IMAGE_FORMATS:
+        if fmt in SIGNATURES and SIGNATURES[fmt].match(data):
+            return fmt
+    raise InvalidImage({'image': 'Upload is not a supported image.'})
+
+
+def append_chunk(upload, stream, offset):
+    """
+    Write the request stream at offset of a locked upload.
+
+    The stream is copied block by block so memory does not grow with the
+    chunk size.
+    """
+    if offset != upload.offset:
+        raise OffsetConflict(f'Expected offset {upload.offset}.')
+
+    os.makedirs(settings.CHUNKED_UPLOAD_ROOT, exist_ok=True)
+    remaining = upload.size - upload.offset
+    written = 0
+    mode = 'r+b' if os.path.exists(upload.path) else 'wb'
+    with open(upload.path, mode) as part:
+        part.seek(upload.offset)
+        while stream is not None:
+            block = stream.read(BLOCK_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if written > remaining:
+                raise ValidationError(
+                    {'size': f'Upload is larger than {upload.size} bytes.'}
+                )
+            part.write(block)
+        part.truncate(upload.offset + written)
+
+    upload.offset += written
+    if not upload.format and upload.offset:
+        # the first chunk must start with a known image header
+        with open(upload.path, 'rb') as part:
+            upload.format = sniff_format(part.read(SNIFF_SIZE))
+    upload.save(update_fields=['offset', 'format'])
+
+
+def finalize(upload):
+    """Verify a complete upload and move it into Recipe.image"""
+    try:
+        with open(upload.path, 'rb') as part:
+            image = Image.open(part)
+            image.verify()
+    except Exception:
+        raise InvalidImage({'image': 'Upload is not a valid image.'})
+    if image.format != upload.format:
+        raise InvalidImage({'image': 'Upload is not a valid image.'})
+
+    recipe = upload.recipe
+    extension = 'jpg' if upload.format == 'JPEG' else upload.format.lower()
+    with open(upload.path, 'rb') as part:
+        recipe.image.save(f'upload.{extension}', PartialUploadFile(part))
+    upload.delete()
+    return recipe
+
+
+def receive_chunk(upload, stream, offset):
+    """
+    Append a chunk to an upload, finalizing it once complete.
+
+    Returns the recipe when the upload was finalized, else None.
+    """
+    try:
+        with transaction.atomic(using=upload._state.db):
+            upload = RecipeImageUpload.objects.select_for_update() \
+                .get(pk=upload.pk)
+            append_chunk(upload, stream, offset)
+            if upload.offset == upload.size:
+                return finalize(upload)
+    except InvalidImage:
+        discard(upload)
+        raise
+    return None
+
+
+def discard(upload):
+    """Delete an upload and its partial file"""
+    if os.path.exists(upload.path):
+        os.remove(upload.path)
+    RecipeImageUpload.objects.filter(pk=upload.pk).delete()
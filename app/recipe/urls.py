@@ -1 +1 @@
-from django.urls import path, includefrom rest_framework.routers import DefaultRouterfrom recipe.views import TagViewSet, IngredientViewSet, \    RecipeViewSet, RecipeHistoryView, RecipeHistoryDetailViewapp_name = 'recipe'router = DefaultRouter()router.register('tags', TagViewSet)router.register('ingredients', IngredientViewSet)router.register('recipes', RecipeViewSet)router.register('history', RecipeHistoryView)router.register('history-detail/<int:pk>/', RecipeHistoryDetailView)urlpatterns = [path('', include(router.urls))]
\ No newline at end of file
+from django.urls import path, includefrom rest_framework.routers import DefaultRouterfrom recipe.views import TagViewSet, IngredientViewSet, \    RecipeViewSet, RecipeHistoryView, RecipeHistoryDetailViewapp_name = 'recipe'router = DefaultRouter()router.register('tags', TagViewSet)router.register('ingredients', IngredientViewSet)router.register('recipes', RecipeViewSet)router.register('history', RecipeHistoryView)router.register('history-detail', RecipeHistoryDetailView)urlpatterns = [path('', include(router.urls))]
\ No newline at end of file
@@ -1,25 +1,183 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, \
+    TrigramSimilarity
+from django.db import connections, router, transaction
+from django.db.models import F, Prefetch, Q
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from rest_framework import viewsets, mixins, status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
-from rest_framework.generics import ListAPIView
+from rest_framework.generics import ListAPIView, get_object_or_404
 
+from . import bulk
+from .cache import get_list_key, get_cached_list, set_cached_list, \
+    get_versions, get_version_key, get_object_version_key
+from .fast_serializers import TagValuesSerializer, \
+    IngredientValuesSerializer, RecipeValuesSerializer
 from .serializers import TagSerializer, IngredientSerializer, \
-    RecipeSerializer, RecipeDetailSerializer, RecipeImageSerializer, \
-    RecipeHistorySerializer
+    RecipeSerializer, RecipeImageSerializer, \
+    RecipeHistorySerializer, RecipeImageUploadSerializer, \
+    BulkTagSerializer, BulkIngredientSerializer, BulkRecipeSerializer
+from .stats import get_stats
+from .thumbnails import schedule_variants
+from .uploads import receive_chunk
+
+from core.db.routers import replica_may_lag
+from core.models import Tag, Ingredient, Recipe, RecipeImageUpload
+from user.authentication import CachedTokenAuthentication
+
+
+class ConditionalGetMixin:
+    """
+    Answer list and retrieve with 304 while the client's copy is current.
+
+    ETags are derived from the per user versions bumped on every write
+    (see recipe.cache), so a matching If-None-Match returns before the
+    queryset or the serializer run. Views wrap their `list` and `retrieve`
+    handlers in `conditional`; detail responses are keyed on the version
+    of the object itself. There is no Last-Modified: whole seconds would
+    hide a second write within the same second. Without SHARED_CACHE
+    the versions of other processes are unknown and nothing is tagged.
+    """
+    # Models, besides the viewset's own, whose writes change the payload
+    related_version_models = ()
+    # Set when a replica may not have the latest write yet
+    stale_read = False
+
+    def get_version_keys(self):
+        user_id = self.request.user.id
+        model = self.queryset.model
+        if self.detail:
+            keys = [get_object_version_key(model,
+                                           self.kwargs[self.lookup_field])]
+        else:
+            keys = [get_version_key(model, user_id)]
+        keys.extend(get_version_key(related, user_id)
+                    for related in self.related_version_models)
+        return keys
+
+    def conditional(self, handler, request, *args, **kwargs):
+        if not settings.SHARED_CACHE:
+            return handler(request, *args, **kwargs)
+        versions = get_versions(self.get_version_keys())
+        if replica_may_lag(max(versions)):
+            # the response must not be tagged or cached as the latest
+            self.stale_read = True
+            return handler(request, *args, **kwargs)
+        validator = ':'.join(map(str, [
+            request.user.id, request.accepted_renderer.format,
+            request.get_full_path(), *versions
+        ]))
+        etag = quote_etag(hashlib.md5(validator.encode()).hexdigest())
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ValuesListMixin:
+    """
+    List through `values_serializer_class` when it supports the request.
 
-from core.models import Tag, Ingredient, Recipe
+    Rows are fetched with values() and rendered without model instances
+    or DRF fields; the output is identical to the regular serializer.
+    Disabled with FAST_LIST_SERIALIZATION.
+    """
+    values_serializer_class = None
 
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class(
+            context=self.get_serializer_context()
+        )
+        if not settings.FAST_LIST_SERIALIZATION or not serializer.supports():
+            return super().list(request, *args, **kwargs)
+
+        if hasattr(self, 'get_ordering'):
+            ordering = self.get_ordering()
+        else:
+            ordering = self.ordering
+        rows = serializer.get_queryset(
+            self.filter_queryset(self.get_queryset()), ordering
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer.to_representation(page)
+            )
+        return Response(serializer.to_representation(rows))
+
+
+class BulkModelMixin:
+    """
+    Create (POST), update (PATCH) or delete (DELETE) a list of objects.
+
+    The batch is validated as a whole and written in one transaction;
+    when any item is invalid nothing is written and the response lists
+    the errors of each item in request order.
+    """
+    bulk_serializer_class = None
+
+    @action(methods=['post', 'patch', 'delete'], detail=False,
+            url_path='bulk')
+    def bulk(self, request):
+        model = self.queryset.model
+        items = bulk.validate_batch(request.data)
+        # the transaction must be opened on the user's shard
+        using = router.db_for_write(model)
+        if request.method == 'DELETE':
+            with transaction.atomic(using=using):
+                bulk.delete(model, request.user, items)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        partial = request.method == 'PATCH'
+        serializer = self.bulk_serializer_class(
+            data=items, many=True, partial=partial,
+            context=bulk.get_context(model, request.user, items, partial)
+        )
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic(using=using):
+            write = bulk.update if partial else bulk.create
+            objs = write(model, request.user, serializer.validated_data)
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+        fetched = self.get_bulk_queryset().in_bulk([obj.pk for obj in objs])
+        serializer = self.get_serializer(
+            [fetched[obj.pk] for obj in objs], many=True
+        )
+        return Response(
+            serializer.data,
+            status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+        )
+
+    def get_bulk_queryset(self):
+        """
+        The written objects are re-read without the list filters of the
+        request's query params, which they need not match
+        """
+        return self.queryset.filter(user=self.request.user)
+
+
+class BaseRecipeAttrViewSet(ConditionalGetMixin,
+                            BulkModelMixin,
+                            ValuesListMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin
                             ):
     """Base viewset for user owned recipe"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    ordering = ('-name', 'id')
 
     def get_queryset(self):
         """Filter query set by authenticated user"""
@@ -29,49 +187,138 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
             int(self.request.query_params.get('assigned_only', '0'))
         )
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            # served by the partial index on recipe_count > 0
+            queryset = queryset.filter(recipe_count__gt=0)
         return queryset.filter(user=self.request.user) \
-            .order_by('-name') \
-            .distinct()
+            .order_by(*self.ordering)
 
     def perform_create(self, serializer):
         """set authenticated user to user field"""
         return serializer.save(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.cached_list, request, *args, **kwargs)
+
+    def cached_list(self, request, *args, **kwargs):
+        """List from the per user cache, populating it on a miss"""
+        params = {
+            name: request.query_params.get(name, '')
+            for name in ('assigned_only', 'cursor', 'page_size')
+        }
+        key = get_list_key(self.queryset.model, request.user.id, params)
+        cached = get_cached_list(key)
+        if cached is not None:
+            data, headers = cached
+            return Response(data, headers=headers)
+
+        response = super().list(request, *args, **kwargs)
+        headers = {'Link': response['Link']} if response.has_header('Link') \
+            else None
+        if not self.stale_read:
+            set_cached_list(key, response.data, headers)
+        return response
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    bulk_serializer_class = BulkTagSerializer
+    values_serializer_class = TagValuesSerializer
 
 
-class RecipeHistoryView(viewsets.GenericViewSet,
-                        ListModelMixin):
+class BaseRecipeHistoryViewSet(viewsets.GenericViewSet):
+    """Base viewset for the recipe versions of the authenticated user"""
     serializer_class = RecipeHistorySerializer
     queryset = Recipe.history.all()
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
 
+    def get_queryset(self):
+        """Filter history by the owner of the recipe version"""
+        return self.queryset.filter(user=self.request.user)
 
-class RecipeHistoryDetailView(viewsets.GenericViewSet,
-                        RetrieveModelMixin):
-    serializer_class = RecipeHistorySerializer
-    queryset = Recipe.history.all()
+
+class RecipeHistoryView(BaseRecipeHistoryViewSet, ListModelMixin):
+    """List all recipe versions of the user, newest first"""
+    ordering = ('-history_id',)
+
+
+class RecipeHistoryDetailView(BaseRecipeHistoryViewSet, RetrieveModelMixin):
+    """
+    List the versions of one recipe, newest first.
+
+    With `?diff=1` each version only carries the fields that changed
+    since the version before it.
+    """
+    ordering = ('-history_date', '-history_id')
+    history_fields = ('id', 'history_id', 'history_date', 'history_type',
+                      'history_user', 'history_change_reason')
 
     def retrieve(self, request, pk=None):
-        records = self.get_queryset().filter(id=pk)
-        serializer = self.get_serializer(records, many=True)
-        return Response(serializer.data)
+        try:
+            diff = bool(int(request.query_params.get('diff', '0')))
+        except ValueError:
+            raise ValidationError({'diff': 'Expected 0 or 1.'})
+
+        queryset = self.get_queryset().filter(id=pk)
+        versions = self.paginate_queryset(queryset)
+        if not versions and 'cursor' not in request.query_params:
+            raise NotFound()
+
+        if diff:
+            data = self.diff_versions(queryset, versions)
+        else:
+            data = self.get_serializer(versions, many=True).data
+        return self.get_paginated_response(data)
+
+    def diff_versions(self, queryset, versions):
+        """Return the changed fields of each version against its parent"""
+        if not versions:
+            return []
+        last = versions[-1]
+        parent = queryset.filter(
+            Q(history_date__lt=last.history_date) |
+            Q(history_date=last.history_date,
+              history_id__lt=last.history_id)
+        ).order_by(*self.ordering).first()
+
+        rows = self.get_serializer(
+            versions + ([parent] if parent else []), many=True
+        ).data
+        diffs = []
+        for index, row in enumerate(rows[:len(versions)]):
+            before = rows[index + 1] if index + 1 < len(rows) else {}
+            diff = {field: row[field] for field in self.history_fields}
+            diff['changes'] = {
+                field: {'old': before.get(field), 'new': value}
+                for field, value in row.items()
+                if field not in self.history_fields and
+                (field not in before or before[field] != value)
+            }
+            diffs.append(diff)
+        return diffs
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
+    bulk_serializer_class = BulkIngredientSerializer
+    values_serializer_class = IngredientValuesSerializer
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, BulkModelMixin, ValuesListMixin,
+                    viewsets.ModelViewSet):
     """Manage recipes in database"""
     serializer_class = RecipeSerializer
+    bulk_serializer_class = BulkRecipeSerializer
+    values_serializer_class = RecipeValuesSerializer
+    related_version_models = (Tag, Ingredient)
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    ordering = ('-id',)
+    # Actions honouring ?fields= and ?expand=
+    read_actions = ('list', 'retrieve')
 
     def _params_to_ints(self, query_params):
         """Convert a list of strings to list of integers"""
@@ -81,26 +328,164 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create Recipe with authenticated user"""
         return serializer.save(user=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """
+        Recipe count, average time and price overall and per tag and
+        ingredient, and the number of recipes per price range
+        """
+        return self.conditional(
+            lambda request: Response(get_stats(request.user)), request
+        )
+
     def get_queryset(self):
-        """"""
+        """Filter recipes of the authenticated user and prefetch relations"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        match = self.request.query_params.get('match', 'any')
+        if match not in ('any', 'all'):
+            raise ValidationError({'match': 'Must be "any" or "all".'})
+
+        queryset = self._select_fields(self.queryset)
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(
+                queryset, 'tags', self._params_to_ints(tags), match
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = self._filter_related(
+                queryset, 'ingredients', self._params_to_ints(ingredients),
+                match
+            )
+
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = self._search(queryset, search)
 
         return queryset.filter(user=self.request.user)
 
+    def get_bulk_queryset(self):
+        return self._select_fields(self.queryset) \
+            .filter(user=self.request.user)
+
+    def get_sparse_fields(self):
+        """Return the fields a read renders, None for every field"""
+        if self.action not in self.read_actions:
+            return None
+        return self._query_names('fields', RecipeSerializer.Meta.fields)
+
+    def get_expand(self):
+        """Return the relations a read nests instead of listing their ids"""
+        if self.action not in self.read_actions:
+            return []
+        expand = self._query_names('expand',
+                                   RecipeSerializer.expandable_fields)
+        if expand is None and self.action == 'retrieve':
+            return list(RecipeSerializer.expandable_fields)
+        return expand or []
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in self.read_actions:
+            context['fields'] = self.get_sparse_fields()
+            context['expand'] = self.get_expand()
+        return context
+
+    def _query_names(self, param, allowed):
+        """Return the comma separated names of a query param, if given"""
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = [name for name in value.split(',') if name]
+        unknown = set(names) - set(allowed)
+        if unknown:
+            raise ValidationError(
+                {param: f'Unknown field(s): {", ".join(sorted(unknown))}.'}
+            )
+        return names
+
+    def _select_fields(self, queryset):
+        """Load and prefetch only what the rendered fields need"""
+        if self.action not in self.read_actions:
+            return queryset.prefetch_related(
+                'tags', 'ingredients', 'image_variants'
+            )
+
+        fields = set(self.get_sparse_fields() or RecipeSerializer.Meta.fields)
+        expand = self.get_expand()
+        columns = fields & {field.name for field in Recipe._meta.fields}
+        queryset = queryset.only('id', *sorted(columns))
+
+        lookups = []
+        for name, model in (('tags', Tag), ('ingredients', Ingredient)):
+            if name in expand:
+                lookups.append(name)
+            elif name in fields:
+                lookups.append(Prefetch(
+                    name, queryset=model.objects.only('id').order_by('id')
+                ))
+        if 'image_variants' in fields:
+            lookups.append('image_variants')
+        return queryset.prefetch_related(*lookups)
+
+    def get_ordering(self):
+        """Order full text search results by rank"""
+        if self.request.query_params.get('search') and \
+                connections[self.queryset.db].vendor == 'postgresql':
+            return ('-rank',) + self.ordering
+        return self.ordering
+
+    def _search(self, queryset, search):
+        """
+        Match recipes by title, tag and ingredient names.
+
+        Postgres ranks the stored search vector, with title trigram
+        similarity catching typos; other backends use icontains.
+        """
+        if connections[queryset.db].vendor == 'postgresql':
+            query = SearchQuery(search, config=settings.SEARCH_CONFIG)
+            return queryset.annotate(
+                rank=SearchRank(F('search_vector'), query) +
+                TrigramSimilarity('title', search)
+            ).filter(Q(search_vector=query) | Q(title__trigram_similar=search))
+
+        for term in search.split():
+            queryset = queryset.filter(
+                Q(title__icontains=term) |
+                Q(tags__name__icontains=term) |
+                Q(ingredients__name__icontains=term)
+            )
+        return queryset.distinct()
+
+    def _filter_related(self, queryset, relation, ids, match):
+        """
+        Filter recipes linked to any/all of ids.
+
+        Postgres answers from the GIN indexed id arrays without a join,
+        other backends fall back to joining the through table.
+        """
+        if connections[queryset.db].vendor == 'postgresql':
+            field = relation[:-1] + '_ids'
+            lookup = 'contains' if match == 'all' else 'overlap'
+            return queryset.filter(**{f'{field}__{lookup}': ids})
+
+        if match == 'all':
+            for pk in ids:
+                queryset = queryset.filter(**{f'{relation}__id': pk})
+            return queryset
+        return queryset.filter(**{f'{relation}__id__in': ids}).distinct()
+
     def get_serializer_class(self):
         """Return serializer based on request action"""
-        if self.action == 'retrieve':
-            return RecipeDetailSerializer
-        elif self.action == 'upload_image':
+        if self.action == 'upload_image':
             return RecipeImageSerializer
+        elif self.action in ('create_image_upload', 'image_upload'):
+            return RecipeImageUploadSerializer
         else:
             return self.serializer_class
 
@@ -113,6 +498,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         if serializer.is_valid():
             serializer.save()
+            schedule_variants(recipe.id, recipe._state.db)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -122,3 +508,53 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
         )
+
+    @action(methods=['POST'], detail=True, url_path='image-uploads')
+    def create_image_upload(self, request, pk=None):
+        """Start a resumable chunked image upload of the declared size"""
+        recipe = self.get_object()
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(recipe=recipe)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['GET', 'PATCH'], detail=True,
+            url_path=r'image-uploads/(?P<upload_id>[0-9a-f-]+)')
+    def image_upload(self, request, pk=None, upload_id=None):
+        """
+        Report the upload offset or append a raw chunk at Upload-Offset.
+
+        The upload is moved into the recipe image once complete.
+        """
+        recipe = self.get_object()
+        upload = get_object_or_404(RecipeImageUpload, pk=upload_id,
+                                   recipe=recipe)
+        if request.method == 'GET':
+            return Response(self.get_serializer(upload).data)
+
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            raise ValidationError(
+                {'offset': 'A numeric Upload-Offset header is required.'}
+            )
+        if offset + length > upload.size:
+            raise ValidationError(
+                {'size': f'Upload is larger than {upload.size} bytes.'}
+            )
+
+        if receive_chunk(upload, request.stream, offset) is None:
+            upload.refresh_from_db()
+            return Response(self.get_serializer(upload).data,
+                            status=status.HTTP_202_ACCEPTED)
+
+        recipe.refresh_from_db()
+        schedule_variants(recipe.id, recipe._state.db)
+        return Response(
+            RecipeImageSerializer(recipe,
+                                  context=self.get_serializer_context()).data,
+            status=status.HTTP_200_OK
+        )
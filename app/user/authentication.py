@@ -0,0 +1,115 @@
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from core.db.routers import refresh_shard
+
+VERSION_KEY = 'user:token-version:{user_id}'
+TOKEN_KEY = 'user:token:{digest}'
+
+
+class LRUCache:
+    """Thread safe mapping dropping the least recently used keys"""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value, max_size):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def get_token_version(user_id):
+    """
+    Return the version cached token resolutions of user must match
+
+    Versions are random rather than counters so a version evicted from
+    the cache can never come back as a value an old entry still holds.
+    """
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_token_version(user_id):
+    """Invalidate every cached token resolution of user"""
+    cache.set(VERSION_KEY.format(user_id=user_id), uuid.uuid4().hex,
+              timeout=None)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication caching the token and its user.
+
+    Resolutions are kept in a bounded in-process LRU and, with
+    `TOKEN_AUTH_CACHE['SHARED']`, in the default cache for `TTL` seconds.
+    Each entry records the user's token version, which is bumped when a
+    token is deleted or the user is saved, so revocation and deactivation
+    apply on the next request. A hit costs one cache read for the version
+    instead of a Token/User query. The versions must reach every process,
+    so nothing is cached without SHARED_CACHE. With several shards the
+    shard of a cached user is read again on every hit, so a move
+    freezes and redirects its writes at once.
+    """
+    local_cache = LRUCache()
+
+    def authenticate_credentials(self, key):
+        options = settings.TOKEN_AUTH_CACHE
+        if options['TTL'] <= 0 or not settings.SHARED_CACHE:
+            return super().authenticate_credentials(key)
+
+        shared_key = TOKEN_KEY.format(
+            digest=hashlib.sha256(key.encode()).hexdigest()
+        )
+        entry = self.local_cache.get(key)
+        if entry is None and options['SHARED']:
+            entry = cache.get(shared_key)
+            if entry is not None:
+                self.local_cache.set(key, entry, options['MAX_SIZE'])
+
+        if entry is not None:
+            token, version, expires = entry
+            if expires > time.time() and \
+                    version == get_token_version(token.user_id):
+                # Views may modify request.user, never hand out the cached one
+                token = copy.deepcopy(token)
+                if len(settings.SHARD_DATABASES) > 1:
+                    refresh_shard(token.user)
+                return token.user, token
+
+        user, token = super().authenticate_credentials(key)
+        entry = (copy.deepcopy(token), get_token_version(user.pk),
+                 time.time() + options['TTL'])
+        self.local_cache.set(key, entry, options['MAX_SIZE'])
+        if options['SHARED']:
+            cache.set(shared_key, entry, options['TTL'])
+        return user, token
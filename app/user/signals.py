@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import bump_token_version
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    bump_token_version(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_changed_user(sender, instance, created, **kwargs):
+    """Cached users go stale on any change, deactivation included"""
+    if not created:
+        bump_token_version(instance.pk)
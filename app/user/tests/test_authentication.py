@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from user.authentication import CachedTokenAuthentication
+
+TOKEN_AUTH_CACHE = {'TTL': 60, 'MAX_SIZE': 2, 'SHARED': False}
+
+
+@override_settings(TOKEN_AUTH_CACHE=TOKEN_AUTH_CACHE, SHARED_CACHE=True,
+                   SHARD_DATABASES=['default'])
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        CachedTokenAuthentication.local_cache.clear()
+        self.auth = CachedTokenAuthentication()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='password'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    def test_cached_resolution_skips_database(self):
+        """Test a cached token is resolved without queries"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    @override_settings(SHARD_DATABASES=['default', 'shard1'])
+    def test_cached_resolution_reads_shard(self):
+        """Test a cached user's shard is read again with several shards"""
+        self.auth.authenticate_credentials(self.token.key)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            shard='shard1', shard_moving=True
+        )
+
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user.shard, 'shard1')
+        self.assertTrue(user.shard_moving)
+
+    def test_cached_user_is_a_copy(self):
+        first, _ = self.auth.authenticate_credentials(self.token.key)
+        first.name = 'changed'
+
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertNotEqual(user.name, 'changed')
+
+    def test_deleted_token_is_revoked(self):
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_deactivated_user_is_revoked(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_expired_entry_is_refreshed(self):
+        self.auth.authenticate_credentials(self.token.key)
+
+        with patch('user.authentication.time.time', return_value=1e12), \
+                self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_local_cache_is_bounded(self):
+        """Test the least recently used token is evicted first"""
+        for i in range(3):
+            user = get_user_model().objects.create_user(
+                email=f'user{i}@example.com', password='password'
+            )
+            key = Token.objects.create(user=user).key
+            self.auth.authenticate_credentials(key)
+
+        self.assertEqual(len(CachedTokenAuthentication.local_cache), 2)
+
+    @override_settings(TOKEN_AUTH_CACHE=dict(TOKEN_AUTH_CACHE, SHARED=True))
+    def test_shared_cache_is_used_by_other_processes(self):
+        self.auth.authenticate_credentials(self.token.key)
+        CachedTokenAuthentication.local_cache.clear()
+
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_unshared_cache_is_not_used(self):
+        """Test revocation cannot be missed by other processes"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from rest_framework.authentication import TokenAuthentication
+from .authentication import CachedTokenAuthentication
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.generics import CreateAPIView
 from rest_framework.generics import RetrieveUpdateAPIView
@@ -21,7 +21,7 @@ class ManageUserView(RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     queryset = get_user_model().objects.all()
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def get_object(self):
         """retrieve authenticated user"""